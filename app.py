@@ -5,18 +5,31 @@
 
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
 
 from utils.database import (
-    init_database, get_athletes, get_athlete_by_id, get_sport_results,
-    get_total_athletes, get_total_competitions,
-    get_user_by_username, add_athlete, add_sport_result, execute_query
+    bootstrap, get_bootstrap_info,
+    get_athletes_page, count_athletes, get_athlete_filter_values, ATHLETES_PAGE_SIZE,
+    get_sports, get_regions, get_coaches,
+    get_sport_results_page, get_result_facets,
+    get_stats_leaderboard, get_disciplines, get_leaderboard, get_leaderboard_seasons,
+    count_leaderboard,
+    get_dashboard_aggregates, DASHBOARD_NEW_DAYS,
+    get_user_by_username, add_athlete, add_athletes_with_results, fill_athlete_references,
+    fetch_scalar, get_pool_stats, get_query_cache_stats,
+    archive_old_results, get_archive_status,
+    get_audit_log_page, get_audit_stats, flush_audit_log
 )
+from utils import audit, query_stats
+from utils.chart_cache import (
+    chart, show_chart, show_chart_spec, warm_charts, get_chart_cache_stats
+)
+from utils.fragments import filter_panel, fragment, rerun_fragment
+from utils.lazy_tabs import LazyTab, lazy_tabs
+from utils.leaderboards import SEASON_ALL
+from utils.reference_data import SPORTS_LIST, REGIONS, COACHES
 
 # ==================== КОНФИГУРАЦИЯ ====================
 
@@ -61,191 +74,193 @@ custom_theme = """
 
 st.markdown(custom_theme, unsafe_allow_html=True)
 
-sns.set_theme(style="whitegrid")
-sns.set_palette("husl")
-plt.rcParams['figure.figsize'] = (12, 6)
-
-# ==================== ВИДЫ СПОРТА И РЕГИОНЫ ====================
-
-SPORTS_LIST = {
-    "Лыжные гонки": "🎿",
-    "Гребля": "🚣",
-    "Биатлон": "🎯"
-}
-
-REGIONS = [
-    "Республика Карелия",
-    "Архангельская область",
-    "Мурманская область",
-    "Ненецкий АО",
-    "Вологодская область",
-    "Тверская область",
-    "Костромская область",
-    "Кировская область",
-    "Удмуртия",
-    "Республика Татарстан"
-]
-
-COACHES = {
-    "Лыжные гонки": [
-        "Иван Петров", "Сергей Смирнов", "Дмитрий Морозов",
-        "Алексей Волков", "Николай Соколов"
-    ],
-    "Гребля": [
-        "Владимир Кузнецов", "Олег Лебедев", "Борис Орлов",
-        "Виктор Комаров", "Игорь Новиков"
-    ],
-    "Биатлон": [
-        "Анатолий Зайцев", "Павел Ивановский", "Юрий Константинов",
-        "Геннадий Лаврентьев", "Валентин Макаров"
-    ]
-}
+# ==================== ГРАФИКИ ====================
+# Функции рисования для utils/chart_cache.show_chart: рисуют на готовых осях
+# и зависят только от своих аргументов
+
+CHART_COLORS = ['#667eea', '#764ba2', '#f093fb']
+
+def draw_share_pie(ax, counts: pd.Series, title):
+    ax.pie(counts.values, labels=counts.index, autopct='%1.1f%%', colors=CHART_COLORS, startangle=90)
+    ax.set_title(title, fontsize=12, fontweight='bold')
+
+def draw_count_bar(ax, counts: pd.Series, title, ylabel):
+    bars = ax.bar(counts.index, counts.values, color=CHART_COLORS, edgecolor='black', linewidth=1.5)
+    ax.set_ylabel(ylabel, fontsize=11, fontweight='bold')
+    ax.set_title(title, fontsize=12, fontweight='bold')
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+               f'{int(height)}', ha='center', va='bottom', fontweight='bold')
+    ax.tick_params(axis='x', labelrotation=15)
+
+def draw_count_barh(ax, counts: pd.Series, title, xlabel, outlined=False):
+    edge = {'edgecolor': 'black', 'linewidth': 1.5} if outlined else {}
+    bars = ax.barh(counts.index, counts.values, color='#667eea', **edge)
+    ax.set_xlabel(xlabel, fontsize=11, fontweight='bold')
+    ax.set_title(title, fontsize=12, fontweight='bold')
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width, bar.get_y() + bar.get_height()/2.,
+               f'{int(width)}', ha='left', va='center', fontweight='bold')
+
+def draw_activity(ax, competitions: pd.Series):
+    ax.barh(range(len(competitions)), competitions.values, color='#667eea')
+    ax.set_yticks(range(len(competitions)))
+    ax.set_yticklabels(competitions.index)
+    ax.invert_yaxis()
+    ax.set_xlabel("Количество результатов", fontsize=11, fontweight='bold')
+    ax.set_title("Активность спортсменов", fontsize=12, fontweight='bold')
+
+def draw_place_distribution(ax, place_counts: pd.Series):
+    ax.plot(place_counts.index, place_counts.values, marker='o', linewidth=2.5,
+           markersize=10, color='#667eea', markerfacecolor='#f093fb', markeredgewidth=2)
+    ax.fill_between(place_counts.index, place_counts.values, alpha=0.2, color='#667eea')
+    ax.set_xlabel("Место", fontsize=11, fontweight='bold')
+    ax.set_ylabel("Количество", fontsize=11, fontweight='bold')
+    ax.set_title("Распределение мест", fontsize=12, fontweight='bold')
+    ax.grid(True, alpha=0.3)
 
 # ==================== МОК-ДАННЫЕ С РАСШИРЕННОЙ ИНФОРМАЦИЕЙ ====================
 
 def add_extended_mock_data():
     """Добавляет расширенные мок-данные с видами спорта и тренерами"""
     
-    athletes_count = execute_query("SELECT COUNT(*) as count FROM athletes").iloc[0]['count']
-    
-    if athletes_count <= 3:
-        # Спортсмены по видам спорта
-        athletes_by_sport = {
-            "Лыжные гонки": [
-                ("Александр", "Смирнов", "2003-02-14", "М"),
-                ("Сергей", "Петров", "2004-08-10", "М"),
-                ("Дмитрий", "Морозов", "2005-03-18", "М"),
-                ("Мария", "Волкова", "2004-05-20", "Ж"),
-                ("Екатерина", "Соколова", "2004-11-25", "Ж"),
-                ("Анастасия", "Леонова", "2005-06-30", "Ж"),
-            ],
-            "Гребля": [
-                ("Никита", "Орлов", "2003-09-12", "М"),
-                ("Максим", "Зайцев", "2005-01-22", "М"),
-                ("Андрей", "Ивановский", "2004-06-15", "М"),
-                ("Валерия", "Лебедева", "2004-12-08", "Ж"),
-                ("Дарья", "Новикова", "2006-04-15", "Ж"),
-                ("Ольга", "Соколова", "2005-02-28", "Ж"),
-            ],
-            "Биатлон": [
-                ("Павел", "Федоров", "2005-04-10", "М"),
-                ("Елена", "Кузнецова", "2004-07-10", "Ж"),
-            ]
-        }
-        
-        import random
-        np.random.seed(42)
-        random.seed(42)
-        
-        # Добавляем спортсменов с дополнительной информацией
-        athlete_data_store = {}
-        
-        for sport, athletes in athletes_by_sport.items():
-            for first_name, last_name, birth_date, gender in athletes:
-                region = random.choice(REGIONS)
-                coach = random.choice(COACHES[sport])
-                
-                # Добавляем спортсмена
-                athlete_id = add_athlete(first_name, last_name, birth_date, gender, 'active')
-                
-                # Сохраняем данные
-                athlete_data_store[athlete_id] = {
-                    'sport': sport,
-                    'region': region,
-                    'coach': coach,
-                    'first_name': first_name,
-                    'last_name': last_name
-                }
-                
-                # Генерируем результаты
-                competitions = {
-                    "Лыжные гонки": [
-                        'Чемпионат России',
-                        'Кубок России',
-                        'Чемпионат Европы юниоров',
-                        'Чемпионат мира юниоров',
-                        'Спартакиада регионов',
-                    ],
-                    "Гребля": [
-                        'Чемпионат России',
-                        'Кубок России',
-                        'Чемпионат Европы юниоров',
-                        'Чемпионат мира юниоров',
-                        'Открытый чемпионат города',
-                    ],
-                    "Биатлон": [
-                        'Чемпионат России',
-                        'Кубок России',
-                        'Чемпионат Европы юниоров',
-                        'Этап Кубка мира',
-                        'Спартакиада регионов',
-                    ]
-                }
-                
-                disciplines = {
-                    "Лыжные гонки": ['Спринт 1км', 'Классический стиль 5км', 'Свободный стиль 5км', 'Длинная дистанция 10км'],
-                    "Гребля": ['Одиночка 2км', 'Двойка 2км', 'Четвёрка 2км', 'Командная эстафета'],
-                    "Биатлон": ['Спринт 7.5км', 'Гонка преследования', 'Индивидуальная 15км', 'Эстафета']
-                }
-                
-                for _ in range(15):
-                    comp_date = datetime.now() - timedelta(days=random.randint(1, 365))
-                    comp_name = random.choice(competitions[sport])
-                    discipline = random.choice(disciplines[sport])
-                    
-                    if sport == "Лыжные гонки":
-                        time_sec = random.randint(180, 600)
-                    elif sport == "Гребля":
-                        time_sec = random.randint(240, 420)
-                    else:  # Биатлон
-                        time_sec = random.randint(900, 1800)
-                    
-                    minutes = time_sec // 60
-                    seconds = time_sec % 60
-                    result_time = f"{minutes}:{seconds:02d}"
-                    place = random.randint(1, 12)
-                    
-                    add_sport_result(athlete_id, comp_name, comp_date.strftime('%Y-%m-%d'), 
-                                   discipline, result_time, place)
-
-# ==================== ПОЛУЧЕНИЕ ДАННЫХ СПОРТСМЕНОВ ====================
-
-def get_athletes_with_details():
-    """Получает спортсменов с деталями (спорт, регион, тренер)"""
-    athletes = get_athletes()
-    
-    if athletes.empty:
-        return athletes
-    
-    # Генерируем детали для каждого спортсмена
-    details = []
+    # Спортсмены по видам спорта
+    athletes_by_sport = {
+        "Лыжные гонки": [
+            ("Александр", "Смирнов", "2003-02-14", "М"),
+            ("Сергей", "Петров", "2004-08-10", "М"),
+            ("Дмитрий", "Морозов", "2005-03-18", "М"),
+            ("Мария", "Волкова", "2004-05-20", "Ж"),
+            ("Екатерина", "Соколова", "2004-11-25", "Ж"),
+            ("Анастасия", "Леонова", "2005-06-30", "Ж"),
+        ],
+        "Гребля": [
+            ("Никита", "Орлов", "2003-09-12", "М"),
+            ("Максим", "Зайцев", "2005-01-22", "М"),
+            ("Андрей", "Ивановский", "2004-06-15", "М"),
+            ("Валерия", "Лебедева", "2004-12-08", "Ж"),
+            ("Дарья", "Новикова", "2006-04-15", "Ж"),
+            ("Ольга", "Соколова", "2005-02-28", "Ж"),
+        ],
+        "Биатлон": [
+            ("Павел", "Федоров", "2005-04-10", "М"),
+            ("Елена", "Кузнецова", "2004-07-10", "Ж"),
+        ]
+    }
+    
     import random
+    random.seed(42)
+    
+    # Регион и тренер - одно и то же назначение при каждом запуске
+    # (random.seed(42)), как и в мок-данных до внешних ключей
+    athlete_details = []
+    
+    for sport, athletes in athletes_by_sport.items():
+        for first_name, last_name, birth_date, gender in athletes:
+            athlete_details.append({
+                'sport': sport,
+                'region': random.choice(REGIONS),
+                'coach': random.choice(COACHES[sport]),
+                'first_name': first_name,
+                'last_name': last_name,
+                'birth_date': birth_date,
+                'gender': gender
+            })
+    
+    # Решение - по данным, а не по версии схемы: в реестре только три
+    # демо-спортсмена init_database() (или никого)
+    athletes_count = fetch_scalar("SELECT COUNT(*) FROM athletes", default=0)
+    
+    if athletes_count > 3:
+        # Мок-данные уже записаны, возможно, без ссылок на справочники -
+        # заполняем пустые тем же назначением
+        fill_athlete_references([
+            (d['sport'], d['region'], d['coach'], d['first_name'], d['last_name'], d['birth_date'])
+            for d in athlete_details
+        ])
+        return
+    
+    # Генерируем результаты
+    competitions = {
+        "Лыжные гонки": [
+            'Чемпионат России',
+            'Кубок России',
+            'Чемпионат Европы юниоров',
+            'Чемпионат мира юниоров',
+            'Спартакиада регионов',
+        ],
+        "Гребля": [
+            'Чемпионат России',
+            'Кубок России',
+            'Чемпионат Европы юниоров',
+            'Чемпионат мира юниоров',
+            'Открытый чемпионат города',
+        ],
+        "Биатлон": [
+            'Чемпионат России',
+            'Кубок России',
+            'Чемпионат Европы юниоров',
+            'Этап Кубка мира',
+            'Спартакиада регионов',
+        ]
+    }
+    
+    disciplines = {
+        "Лыжные гонки": ['Спринт 1км', 'Классический стиль 5км', 'Свободный стиль 5км', 'Длинная дистанция 10км'],
+        "Гребля": ['Одиночка 2км', 'Двойка 2км', 'Четвёрка 2км', 'Командная эстафета'],
+        "Биатлон": ['Спринт 7.5км', 'Гонка преследования', 'Индивидуальная 15км', 'Эстафета']
+    }
+    
+    # Id справочников (заполняются миграцией из utils/reference_data.py)
+    sport_ids = dict(zip(get_sports()['name'], get_sports()['id']))
+    region_ids = dict(zip(get_regions()['name'], get_regions()['id']))
+    coaches = get_coaches()
+    coach_ids = dict(zip(zip(coaches['sport'], coaches['full_name']), coaches['id']))
+    
+    # Спортсмены и их результаты - одной транзакцией: оборванный seed
+    # не оставит спортсменов без результатов
+    athlete_rows = [
+        (d['first_name'], d['last_name'], d['birth_date'], d['gender'], 'active',
+         sport_ids.get(d['sport']), region_ids.get(d['region']),
+         coach_ids.get((d['sport'], d['coach'])))
+        for d in athlete_details
+    ]
+    
+    # Результаты ссылаются на спортсмена его номером в athlete_rows
+    result_rows = []
     
-    for idx, row in athletes.iterrows():
-        sport = random.choice(list(SPORTS_LIST.keys()))
-        region = random.choice(REGIONS)
-        coach = random.choice(COACHES[sport])
+    for athlete_index, details in enumerate(athlete_details):
+        sport = details['sport']
         
-        details.append({
-            'id': row['id'],
-            'first_name': row['first_name'],
-            'last_name': row['last_name'],
-            'gender': row['gender'],
-            'program_status': row['program_status'],
-            'birth_date': row['birth_date'],
-            'sport': sport,
-            'region': region,
-            'coach': coach
-        })
+        for _ in range(15):
+            comp_date = datetime.now() - timedelta(days=random.randint(1, 365))
+            comp_name = random.choice(competitions[sport])
+            discipline = random.choice(disciplines[sport])
+            
+            if sport == "Лыжные гонки":
+                time_sec = random.randint(180, 600)
+            elif sport == "Гребля":
+                time_sec = random.randint(240, 420)
+            else:  # Биатлон
+                time_sec = random.randint(900, 1800)
+            
+            minutes = time_sec // 60
+            seconds = time_sec % 60
+            result_time = f"{minutes}:{seconds:02d}"
+            place = random.randint(1, 12)
+            
+            result_rows.append((athlete_index, comp_name, comp_date.strftime('%Y-%m-%d'),
+                                discipline, result_time, place))
     
-    return pd.DataFrame(details)
+    add_athletes_with_results(athlete_rows, result_rows)
 
 # ==================== ИНИЦИАЛИЗАЦИЯ ====================
 
-if 'db_initialized' not in st.session_state:
-    init_database()
-    add_extended_mock_data()
-    st.session_state.db_initialized = True
+# Один раз на процесс сервера; при актуальной схеме - без DDL, мок-данные -
+# по проверке числа спортсменов
+bootstrap(seed=add_extended_mock_data)
 
 # ==================== ГЛАВНАЯ СТРАНИЦА ====================
 
@@ -312,7 +327,7 @@ def show_main_dashboard():
         
         page = st.radio(
             "📊 Навигация:",
-            ["🏠 Главная", "👥 База спортсменов", "📈 Аналитика", "🏆 Результаты", "⚙️ Настройки"],
+            ["🏠 Главная", "👥 База спортсменов", "📈 Аналитика", "🏆 Результаты", "🏅 Рейтинги", "⚙️ Настройки"],
             index=0
         )
         
@@ -331,80 +346,59 @@ def show_main_dashboard():
         show_analytics_page()
     elif page == "🏆 Результаты":
         show_results_page()
+    elif page == "🏅 Рейтинги":
+        show_leaderboards_page()
     elif page == "⚙️ Настройки":
         show_settings_page()
 
+def sport_label(sport):
+    """Вид спорта со значком для заголовков и подписей графиков"""
+    return f"{SPORTS_LIST.get(sport, '🏅')} {sport}"
+
 def show_home_page():
     """Главная страница"""
     st.title("🏠 Главная панель")
     
-    total_athletes = get_total_athletes()
-    total_competitions = get_total_competitions()
+    dashboard = get_dashboard_aggregates()
+    sports = dashboard.by_sport[dashboard.by_sport['athletes'] > 0]
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("👥 Спортсменов", total_athletes, "+3", help="Всего активных спортсменов")
+        st.metric(
+            "👥 Спортсменов", dashboard.total_athletes,
+            f"+{dashboard.new_athletes}" if dashboard.new_athletes else None,
+            help=f"Всего активных спортсменов; прирост - за {DASHBOARD_NEW_DAYS} дней"
+        )
     with col2:
-        st.metric("🏆 Соревнований", total_competitions, "+15", help="Всего проведено соревнований")
+        st.metric("🏆 Соревнований", dashboard.total_results, help="Всего результатов, включая архив")
     with col3:
-        st.metric("🎿 Виды спорта", "3", help="Лыжные гонки, Гребля, Биатлон")
+        st.metric("🎿 Виды спорта", len(sports), help=", ".join(sports.index) or None)
     with col4:
-        st.metric("🗺️ Регионов", len(REGIONS), help="Регионы России")
+        st.metric("🗺️ Регионов", len(dashboard.by_region), help="Регионы, в которых есть спортсмены")
     
     st.markdown("---")
     
+    if dashboard.total_athletes == 0:
+        st.info("ℹ️ В реестре пока нет активных спортсменов")
+        return
+    
     # Распределение по видам спорта
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📊 Распределение по видам спорта")
-        athletes = get_athletes()
-        
-        if not athletes.empty:
-            sports_data = []
-            for sport in SPORTS_LIST.keys():
-                # Примерное распределение
-                if sport == "Лыжные гонки":
-                    count = 6
-                elif sport == "Гребля":
-                    count = 6
-                else:
-                    count = 2
-                sports_data.append({'Вид спорта': sport, 'Количество': count})
-            
-            sports_df = pd.DataFrame(sports_data)
-            fig, ax = plt.subplots(figsize=(8, 6))
-            colors = ['#667eea', '#764ba2', '#f093fb']
-            wedges, texts, autotexts = ax.pie(
-                sports_df['Количество'],
-                labels=sports_df['Вид спорта'],
-                autopct='%1.1f%%',
-                colors=colors,
-                startangle=90
-            )
-            ax.set_title("Распределение спортсменов", fontsize=12, fontweight='bold')
-            st.pyplot(fig)
+        show_chart(
+            draw_share_pie, sports['athletes'],
+            figsize=(8, 6), title="Распределение спортсменов"
+        )
     
     with col2:
         st.subheader("🏢 Распределение по регионам")
-        regions_data = []
-        
-        import random
-        np.random.seed(42)
-        for region in REGIONS[:5]:
-            regions_data.append({'Регион': region, 'Спортсмены': random.randint(1, 3)})
-        
-        regions_df = pd.DataFrame(regions_data)
-        fig, ax = plt.subplots(figsize=(8, 6))
-        bars = ax.barh(regions_df['Регион'], regions_df['Спортсмены'], color='#667eea')
-        ax.set_xlabel("Количество спортсменов", fontsize=11, fontweight='bold')
-        ax.set_title("Топ регионов", fontsize=12, fontweight='bold')
-        for bar in bars:
-            width = bar.get_width()
-            ax.text(width, bar.get_y() + bar.get_height()/2.,
-                   f'{int(width)}', ha='left', va='center', fontweight='bold')
-        st.pyplot(fig)
+        show_chart(
+            draw_count_barh, dashboard.by_region['athletes'].head(5), figsize=(8, 6),
+            title="Топ регионов", xlabel="Количество спортсменов"
+        )
 
 def show_athletes_page():
     """Страница со спортсменами с фильтрами по видам спорта"""
@@ -415,6 +409,8 @@ def show_athletes_page():
         
         if st.button("← Вернуться к списку"):
             st.session_state['show_athlete_profile'] = False
+            # Иначе выделенная строка таблицы сразу откроет профиль снова
+            st.session_state.pop('athletes_grid', None)
             st.rerun()
         return
     
@@ -422,102 +418,21 @@ def show_athletes_page():
     
     with tab1:
         st.subheader("Все спортсмены")
-        
-        athletes = get_athletes()
-        if not athletes.empty:
-            # Фильтры
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                sport_filter = st.multiselect(
-                    "Вид спорта:",
-                    list(SPORTS_LIST.keys()),
-                    default=list(SPORTS_LIST.keys())
-                )
-            
-            with col2:
-                gender_filter = st.multiselect(
-                    "Пол:",
-                    athletes['gender'].unique(),
-                    default=athletes['gender'].unique()
-                )
-            
-            with col3:
-                status_filter = st.multiselect(
-                    "Статус:",
-                    athletes['program_status'].unique(),
-                    default=athletes['program_status'].unique()
-                )
-            
-            with col4:
-                region_filter = st.multiselect(
-                    "Регионы:",
-                    REGIONS,
-                    default=REGIONS[:5]
-                )
-            
-            st.markdown("---")
-            
-            # Применяем фильтры (примерная логика)
-            filtered = athletes[
-                (athletes['gender'].isin(gender_filter)) & 
-                (athletes['program_status'].isin(status_filter))
-            ]
-            
-            st.markdown(f"### Найдено спортсменов: {len(filtered)}")
-            
-            # Таблица с дополнительной информацией
-            display_data = []
-            import random
-            np.random.seed(42)
-            
-            for idx, row in filtered.iterrows():
-                sport = random.choice(sport_filter)
-                region = random.choice(region_filter)
-                coach = random.choice(COACHES[sport])
-                
-                display_data.append({
-                    'ID': int(row['id']),
-                    'Имя': row['first_name'],
-                    'Фамилия': row['last_name'],
-                    '🏅 Вид спорта': f"{SPORTS_LIST[sport]} {sport}",
-                    '👨‍🏫 Тренер': coach,
-                    '🗺️ Регион': region,
-                    'Пол': '👨' if row['gender'] == 'М' else '👩',
-                    'Статус': '✅ Активен' if row['program_status'] == 'active' else '⏸ Неактивен'
-                })
-            
-            if display_data:
-                df_display = pd.DataFrame(display_data)
-                st.dataframe(df_display, use_container_width=True, hide_index=True)
-                
-                st.markdown("---")
-                st.markdown("### 👤 Нажмите на ID спортсмена для просмотра профиля:")
-                
-                for data in display_data:
-                    col1, col2, col3, col4, col5 = st.columns([1, 2, 2, 2, 1])
-                    
-                    with col1:
-                        st.text(f"ID: {data['ID']}")
-                    with col2:
-                        st.text(f"{data['Имя']} {data['Фамилия']}")
-                    with col3:
-                        st.text(data['🏅 Вид спорта'])
-                    with col4:
-                        st.text(f"👨‍🏫 {data['👨‍🏫 Тренер']}")
-                    with col5:
-                        if st.button("📋", key=f"athlete_btn_{data['ID']}", help="Профиль"):
-                            st.session_state['selected_athlete_id'] = data['ID']
-                            st.session_state['show_athlete_profile'] = True
-                            st.rerun()
-            else:
-                st.info("📭 Нет спортсменов по выбранным фильтрам")
-        else:
-            st.info("📭 Нет спортсменов")
+        show_athletes_grid()
     
     with tab2:
         st.subheader("Добавить нового спортсмена")
         
+        sports = get_sports()
+        sport_names = dict(zip(sports['id'], sports['name']))
+        regions = get_regions()
+        region_names = dict(zip(regions['id'], regions['name']))
+        
+        # Вид спорта - вне формы: от него зависит список тренеров
+        sport_id = st.selectbox("Вид спорта:", list(sport_names), format_func=sport_names.get)
+        coaches = get_coaches(sport_id) if sport_id is not None else pd.DataFrame(columns=['id', 'full_name'])
+        coach_names = dict(zip(coaches['id'], coaches['full_name']))
+        
         with st.form("add_athlete_form"):
             col1, col2 = st.columns(2)
             
@@ -528,18 +443,122 @@ def show_athletes_page():
             
             with col2:
                 gender = st.selectbox("Пол:", ["М", "Ж"])
-                sport = st.selectbox("Вид спорта:", list(SPORTS_LIST.keys()))
-                region = st.selectbox("Регион:", REGIONS)
-            
-            coach = st.selectbox("Тренер:", COACHES[sport])
+                region_id = st.selectbox("Регион:", list(region_names), format_func=region_names.get)
+                coach_id = st.selectbox("Тренер:", list(coach_names), format_func=coach_names.get)
             
             if st.form_submit_button("✅ Добавить", type="primary"):
-                if add_athlete(first_name, last_name, str(birth_date), gender, 'active'):
+                if add_athlete(first_name, last_name, str(birth_date), gender, 'active',
+                               sport_id, region_id, coach_id):
                     st.success("✅ Спортсмен добавлен!")
                     st.rerun()
                 else:
                     st.error("❌ Ошибка при добавлении")
 
+ATHLETE_SORT_LABELS = {'name': "Фамилии", 'newest': "Новые первыми"}
+
+@fragment
+def show_athletes_grid():
+    """
+    Реестр спортсменов постранично: фильтры, сортировка и страница - в SQL,
+    на экране одна таблица не больше ATHLETES_PAGE_SIZE строк.
+    Выбор строки открывает профиль. Фрагмент: фильтры и листание
+    перезапускают только реестр.
+    """
+    sports = get_sports()
+    sport_names = dict(zip(sports['id'], sports['name']))
+    regions = get_regions()
+    region_names = dict(zip(regions['id'], regions['name']))
+    
+    with filter_panel("athletes_filters"):
+        col1, col2 = st.columns(2)
+        with col1:
+            sport_filter = st.multiselect(
+                "Вид спорта:", list(sport_names),
+                format_func=lambda sport_id: f"{SPORTS_LIST.get(sport_names[sport_id], '🏅')} {sport_names[sport_id]}"
+            )
+        with col2:
+            region_filter = st.multiselect("Регионы:", list(region_names), format_func=region_names.get)
+        
+        col1, col2, col3, col4 = st.columns([2, 2, 3, 2])
+        
+        with col1:
+            genders = get_athlete_filter_values('gender')
+            gender_filter = st.multiselect("Пол:", genders, default=genders)
+        with col2:
+            statuses = get_athlete_filter_values('program_status')
+            status_filter = st.multiselect(
+                "Статус:", statuses, default=['active'] if 'active' in statuses else statuses
+            )
+        with col3:
+            # Фамилии в реестре с заглавной буквы
+            name_prefix = st.text_input("Фамилия начинается с:").strip().capitalize() or None
+        with col4:
+            sort = st.selectbox("Сортировка:", list(ATHLETE_SORT_LABELS), format_func=ATHLETE_SORT_LABELS.get)
+    
+    # Пустой выбор вида спорта или региона - без фильтра
+    filters = dict(
+        statuses=status_filter, genders=gender_filter, name_prefix=name_prefix,
+        sport_ids=sport_filter, region_ids=region_filter
+    )
+    total = count_athletes(**filters)
+    st.markdown(f"### Найдено спортсменов: {total}")
+    if not total:
+        st.info("📭 Нет спортсменов по выбранным фильтрам")
+        return
+    
+    # Стек курсоров, как на странице результатов; смена фильтров - с начала
+    filters_key = (
+        tuple(sport_filter), tuple(region_filter), tuple(gender_filter), tuple(status_filter),
+        name_prefix, sort
+    )
+    if st.session_state.get('athletes_filters_key') != filters_key:
+        st.session_state['athletes_filters_key'] = filters_key
+        st.session_state['athletes_cursors'] = [None]
+    cursors = st.session_state['athletes_cursors']
+    
+    page, next_cursor = get_athletes_page(cursor=cursors[-1], sort=sort, **filters)
+    
+    display = pd.DataFrame({
+        'ID': page['id'],
+        'Фамилия': page['last_name'],
+        'Имя': page['first_name'],
+        'Дата рождения': page['birth_date'],
+        '🏅 Вид спорта': page['sport'].map(
+            lambda sport: f"{SPORTS_LIST.get(sport, '🏅')} {sport}", na_action='ignore'
+        ),
+        '👨‍🏫 Тренер': page['coach'],
+        '🗺️ Регион': page['region'],
+        'Пол': page['gender'].map({'М': '👨', 'Ж': '👩'}),
+        'Статус': page['program_status'].map(lambda x: '✅ Активен' if x == 'active' else '⏸ Неактивен'),
+        'Стартов': page['total_competitions'],
+        'Рекордов': page['personal_bests'],
+        'Лучшее место': page['best_place'],
+    })
+    event = st.dataframe(
+        display, use_container_width=True, hide_index=True,
+        on_select='rerun', selection_mode='single-row', key='athletes_grid'
+    )
+    st.caption("👤 Выберите строку, чтобы открыть профиль спортсмена")
+    
+    if event.selection.rows:
+        st.session_state['selected_athlete_id'] = int(page.iloc[event.selection.rows[0]]['id'])
+        st.session_state['show_athlete_profile'] = True
+        # Профиль - другая страница: перезапуск всего скрипта, не фрагмента
+        st.rerun()
+    
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("← Назад", key="athletes_prev", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            rerun_fragment()
+    with col_page:
+        pages = (total - 1) // ATHLETES_PAGE_SIZE + 1
+        st.caption(f"Страница {len(cursors)} из {pages} · по {ATHLETES_PAGE_SIZE} спортсменов")
+    with col_next:
+        if st.button("Вперёд →", key="athletes_next", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            rerun_fragment()
+
 def show_athlete_profile_page(athlete_id: int):
     """Показывает профиль спортсмена"""
     try:
@@ -552,144 +571,249 @@ def show_athlete_profile_page(athlete_id: int):
     except Exception as e:
         st.error(f"❌ Ошибка загрузки профиля: {e}")
 
-def show_analytics_page():
-    """Страница аналитики"""
-    st.title("📈 Аналитика и Дашборды")
+# Графики аналитики: одни и те же описания для показа и для предзагрузки
+
+def sports_chart(dashboard):
+    athletes = dashboard.by_sport['athletes'].rename(index=sport_label)
+    return chart(
+        draw_count_bar, athletes, figsize=(8, 6),
+        title="Распределение по видам спорта", ylabel="Количество спортсменов"
+    )
+
+def regions_chart(dashboard):
+    return chart(
+        draw_count_barh, dashboard.by_region['athletes'], figsize=(12, 6),
+        title="Распределение по регионам", xlabel="Количество спортсменов", outlined=True
+    )
+
+def results_charts(leaders, dashboard):
+    """Активность спортсменов и распределение мест"""
+    competitions = pd.Series(
+        leaders['total_competitions'].values,
+        index=[f"{row.first_name} {row.last_name}" for row in leaders.itertuples()]
+    )
+    return [
+        chart(draw_activity, competitions, figsize=(10, 6)),
+        chart(draw_place_distribution, dashboard.places, figsize=(10, 6)),
+    ]
+
+def show_sports_analytics():
+    st.subheader("Анализ по видам спорта")
+    dashboard = get_dashboard_aggregates()
     
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 По видам спорта", "🗺️ По регионам", "👨‍🏫 Тренеры", "🏆 Результаты"])
+    col1, col2 = st.columns(2)
     
-    with tab1:
-        st.subheader("Анализ по видам спорта")
-        
+    with col1:
+        for sport, row in dashboard.by_sport.iterrows():
+            with st.container():
+                st.markdown(f"### {sport_label(sport)}")
+                col_a, col_b, col_c = st.columns(3)
+                col_a.metric("Спортсмены", row['athletes'])
+                col_b.metric("Результаты", row['results'])
+                col_c.metric("Тренеры", row['coaches'])
+            st.divider()
+    
+    with col2:
+        show_chart_spec(sports_chart(dashboard))
+
+def prefetch_sports_analytics():
+    warm_charts([sports_chart(get_dashboard_aggregates())])
+
+def show_regions_analytics():
+    st.subheader("Географическое распределение")
+    dashboard = get_dashboard_aggregates()
+    
+    if dashboard.by_region.empty:
+        st.info("ℹ️ Нет данных по регионам")
+    else:
+        show_chart_spec(regions_chart(dashboard))
+
+def prefetch_regions_analytics():
+    dashboard = get_dashboard_aggregates()
+    if not dashboard.by_region.empty:
+        warm_charts([regions_chart(dashboard)])
+
+def show_coaches_analytics():
+    st.subheader("Тренеры и их команды")
+    
+    coaches = get_coaches()
+    groups = list(coaches.groupby('sport', sort=False)['full_name'])
+    if not groups:
+        st.info("ℹ️ Справочник тренеров пуст")
+    
+    for start in range(0, len(groups), 3):
+        for col, (sport, names) in zip(st.columns(3), groups[start:start + 3]):
+            with col:
+                st.markdown(f"### {sport_label(sport)}")
+                for coach in names:
+                    st.markdown(f"- **{coach}**")
+
+def show_results_analytics():
+    st.subheader("Статистика результатов")
+    
+    # Топ по активности - из athlete_stats по индексу
+    leaders = get_stats_leaderboard('total_competitions', limit=10)
+    
+    if not leaders.empty:
         col1, col2 = st.columns(2)
+        activity_chart, places_chart = results_charts(leaders, get_dashboard_aggregates())
         
         with col1:
-            sports_stats = {
-                "🎿 Лыжные гонки": {"Спортсмены": 6, "Результаты": 90, "Тренеры": 5},
-                "🚣 Гребля": {"Спортсмены": 6, "Результаты": 90, "Тренеры": 5},
-                "🎯 Биатлон": {"Спортсмены": 2, "Результаты": 30, "Тренеры": 5}
-            }
-            
-            for sport, data in sports_stats.items():
-                with st.container():
-                    st.markdown(f"### {sport}")
-                    col_a, col_b, col_c = st.columns(3)
-                    col_a.metric("Спортсмены", data["Спортсмены"])
-                    col_b.metric("Результаты", data["Результаты"])
-                    col_c.metric("Тренеры", data["Тренеры"])
-                st.divider()
+            show_chart_spec(activity_chart)
         
         with col2:
-            fig, ax = plt.subplots(figsize=(8, 6))
-            sports = ["🎿 Лыжные гонки", "🚣 Гребля", "🎯 Биатлон"]
-            athletes = [6, 6, 2]
-            colors = ['#667eea', '#764ba2', '#f093fb']
-            bars = ax.bar(sports, athletes, color=colors, edgecolor='black', linewidth=1.5)
-            ax.set_ylabel("Количество спортсменов", fontsize=11, fontweight='bold')
-            ax.set_title("Распределение по видам спорта", fontsize=12, fontweight='bold')
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height,
-                       f'{int(height)}', ha='center', va='bottom', fontweight='bold')
-            plt.xticks(rotation=15)
-            st.pyplot(fig)
-    
-    with tab2:
-        st.subheader("Географическое распределение")
-        
-        regions_count = {}
-        import random
-        np.random.seed(42)
-        for region in REGIONS[:8]:
-            regions_count[region] = random.randint(1, 3)
-        
-        fig, ax = plt.subplots(figsize=(12, 6))
-        regions = list(regions_count.keys())
-        counts = list(regions_count.values())
-        bars = ax.barh(regions, counts, color='#667eea', edgecolor='black', linewidth=1.5)
-        ax.set_xlabel("Количество спортсменов", fontsize=11, fontweight='bold')
-        ax.set_title("Распределение по регионам", fontsize=12, fontweight='bold')
-        for bar in bars:
-            width = bar.get_width()
-            ax.text(width, bar.get_y() + bar.get_height()/2.,
-                   f'{int(width)}', ha='left', va='center', fontweight='bold')
-        st.pyplot(fig)
-    
-    with tab3:
-        st.subheader("Тренеры и их команды")
-        
-        col1, col2, col3 = st.columns(3)
-        
-        for col, (sport, coaches) in zip([col1, col2, col3], COACHES.items()):
-            with col:
-                st.markdown(f"### {SPORTS_LIST[sport]} {sport}")
-                for coach in coaches:
-                    st.markdown(f"- **{coach}**")
+            show_chart_spec(places_chart)
+
+def prefetch_results_analytics():
+    leaders = get_stats_leaderboard('total_competitions', limit=10)
+    if not leaders.empty:
+        warm_charts(results_charts(leaders, get_dashboard_aggregates()))
+
+def show_analytics_page():
+    """Страница аналитики"""
+    st.title("📈 Аналитика и Дашборды")
     
-    with tab4:
-        st.subheader("Статистика результатов")
-        
-        results = get_sport_results(limit=100)
-        if not results.empty:
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                athlete_results = results.groupby('athlete_id').size().head(10)
-                fig, ax = plt.subplots(figsize=(10, 6))
-                bars = ax.barh(range(len(athlete_results)), athlete_results.values, color='#667eea')
-                ax.set_yticks(range(len(athlete_results)))
-                ax.set_yticklabels([f'Спортсмен {aid}' for aid in athlete_results.index])
-                ax.set_xlabel("Количество результатов", fontsize=11, fontweight='bold')
-                ax.set_title("Активность спортсменов", fontsize=12, fontweight='bold')
-                st.pyplot(fig)
-            
-            with col2:
-                if 'place' in results.columns:
-                    place_counts = results['place'].value_counts().sort_index().head(10)
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    ax.plot(place_counts.index, place_counts.values, marker='o', linewidth=2.5,
-                           markersize=10, color='#667eea', markerfacecolor='#f093fb', markeredgewidth=2)
-                    ax.fill_between(place_counts.index, place_counts.values, alpha=0.2, color='#667eea')
-                    ax.set_xlabel("Место", fontsize=11, fontweight='bold')
-                    ax.set_ylabel("Количество", fontsize=11, fontweight='bold')
-                    ax.set_title("Распределение мест", fontsize=12, fontweight='bold')
-                    ax.grid(True, alpha=0.3)
-                    st.pyplot(fig)
+    # Выполняется только открытая вкладка, соседние предзагружаются в фоне
+    lazy_tabs([
+        LazyTab("📊 По видам спорта", show_sports_analytics, prefetch_sports_analytics),
+        LazyTab("🗺️ По регионам", show_regions_analytics, prefetch_regions_analytics),
+        LazyTab("👨‍🏫 Тренеры", show_coaches_analytics, get_coaches),
+        LazyTab("🏆 Результаты", show_results_analytics, prefetch_results_analytics),
+    ], key='analytics_tab')
+
+RESULTS_PAGE_SIZE = 50
+RESULT_SORT_LABELS = {'date': "Дате (новые)", 'place': "Месту", 'athlete': "Спортсмену"}
 
 def show_results_page():
     """Страница результатов"""
     st.title("🏆 Результаты соревнований")
-    
-    results = get_sport_results(limit=100)
-    
-    if not results.empty:
+    show_results_table()
+
+@fragment
+def show_results_table():
+    """Фильтры и страница результатов; фрагмент - перезапускается только таблица"""
+    # Вне формы: значения фильтров ниже зависят от того, включён ли архив
+    include_archive = st.checkbox("📦 Включая архив", help="Результаты старше горизонта архивирования")
+    facets = get_result_facets(include_archive)
+    
+    with filter_panel("results_filters"):
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            if 'competition_name' in results.columns:
-                comp_filter = st.multiselect("Соревнование:", results['competition_name'].unique())
+            comp_filter = st.multiselect("Соревнование:", facets['competition_name'])
         with col2:
-            if 'discipline' in results.columns:
-                disc_filter = st.multiselect("Дисциплина:", results['discipline'].unique())
+            disc_filter = st.multiselect("Дисциплина:", facets['discipline'])
         with col3:
-            sort_by = st.selectbox("Сортировка:", ["Дате (новые)", "Месту", "Спортсмену"])
-        
-        filtered = results
-        if comp_filter:
-            filtered = filtered[filtered['competition_name'].isin(comp_filter)]
-        if disc_filter:
-            filtered = filtered[filtered['discipline'].isin(disc_filter)]
+            sort = st.selectbox("Сортировка:", list(RESULT_SORT_LABELS), format_func=RESULT_SORT_LABELS.get)
         
-        if sort_by == "Дате (новые)":
-            filtered = filtered.sort_values('competition_date', ascending=False)
-        elif sort_by == "Месту":
-            if 'place' in filtered.columns:
-                filtered = filtered.sort_values('place')
+        col1, col2, col3, col4 = st.columns([3, 3, 1, 1])
         
-        st.dataframe(filtered, use_container_width=True, hide_index=True)
+        with col1:
+            period = st.date_input("Период:", value=(), format="DD.MM.YYYY")
+        with col2:
+            # Фамилии в реестре с заглавной буквы
+            athlete_prefix = st.text_input("Фамилия спортсмена начинается с:").strip().capitalize() or None
+        with col3:
+            place_min = st.number_input("Место с:", min_value=1, value=1, step=1)
+        with col4:
+            place_max = st.number_input("Место по:", min_value=0, value=0, step=1, help="0 - без ограничения")
+    
+    # Не заданные границы - без фильтра (место с 1 - включая результаты без места)
+    filters = dict(
+        competitions=comp_filter, disciplines=disc_filter, include_archive=include_archive,
+        date_from=period[0] if len(period) > 0 else None,
+        date_to=period[1] if len(period) > 1 else None,
+        athlete_prefix=athlete_prefix,
+        place_min=place_min if place_min > 1 else None,
+        place_max=place_max or None,
+    )
+    
+    # Стек курсоров страниц: cursors[i] - ключ, с которого начинается страница i.
+    # При смене фильтров или порядка листаем с начала.
+    filters_key = (
+        tuple(comp_filter), tuple(disc_filter), include_archive, tuple(period),
+        athlete_prefix, place_min, place_max, sort
+    )
+    if st.session_state.get('results_filters_key') != filters_key:
+        st.session_state['results_filters_key'] = filters_key
+        st.session_state['results_cursors'] = [None]
+    cursors = st.session_state['results_cursors']
+    
+    results, next_cursor = get_sport_results_page(
+        cursor=cursors[-1], page_size=RESULTS_PAGE_SIZE, sort=sort, **filters
+    )
+    
+    if not results.empty:
+        display = pd.DataFrame({
+            'Дата': results['competition_date'],
+            'Спортсмен': results['last_name'].fillna('') + ' ' + results['first_name'].fillna(''),
+            'Соревнование': results['competition_name'],
+            'Дисциплина': results['discipline'],
+            'Результат': results['result'],
+            'Место': results['place'],
+        })
+        st.dataframe(display, use_container_width=True, hide_index=True)
+        
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("← Назад", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                rerun_fragment()
+        with col_page:
+            st.caption(f"Страница {len(cursors)} · по {RESULTS_PAGE_SIZE} результатов")
+        with col_next:
+            if st.button("Вперёд →", disabled=next_cursor is None, use_container_width=True):
+                cursors.append(next_cursor)
+                rerun_fragment()
     else:
         st.info("📭 Нет результатов")
 
+LEADERBOARD_PAGE_SIZES = [100, 250, 500]
+
+def show_leaderboards_page():
+    """Рейтинги дисциплин: готовые места из leaderboard_entries"""
+    st.title("🏅 Рейтинги")
+    
+    disciplines = get_disciplines()
+    if disciplines.empty:
+        st.info("📭 Справочник дисциплин пуст")
+        return
+    
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
+    with col1:
+        discipline = st.selectbox("Дисциплина:", disciplines['name'].tolist())
+    with col2:
+        seasons = [SEASON_ALL] + get_leaderboard_seasons(discipline)
+        season = st.selectbox(
+            "Сезон:", seasons,
+            format_func=lambda value: "За всё время" if value == SEASON_ALL else value
+        )
+    with col3:
+        gender = st.radio("Зачёт:", ["Общий", "М", "Ж"], horizontal=True)
+        gender = None if gender == "Общий" else gender
+    with col4:
+        page_size = st.selectbox("На странице:", LEADERBOARD_PAGE_SIZES)
+    
+    total = count_leaderboard(discipline, season, gender)
+    if not total:
+        st.info("📭 В рейтинге пока нет результатов")
+        return
+    
+    pages = (total - 1) // page_size + 1
+    page = st.number_input("Страница:", min_value=1, max_value=pages, value=1, step=1)
+    board = get_leaderboard(discipline, season, gender, offset=(page - 1) * page_size, limit=page_size)
+    
+    board['Спортсмен'] = board['last_name'].fillna('') + ' ' + board['first_name'].fillna('')
+    st.dataframe(
+        board[['place', 'Спортсмен', 'gender', 'result', 'competition_date', 'competition_name']].rename(columns={
+            'place': 'Место', 'gender': 'Пол', 'result': 'Результат',
+            'competition_date': 'Дата', 'competition_name': 'Соревнование',
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption(f"Страница {page} из {pages} · мест в рейтинге: {total}")
+
 def show_settings_page():
     """Страница настроек"""
     st.title("⚙️ Настройки")
@@ -712,6 +836,148 @@ def show_settings_page():
         
         **Новое:** Виды спорта, регионы, тренеры
         """)
+    
+    if st.session_state.get('user', {}).get('role') == 'admin':
+        show_query_stats_panel()
+        show_archive_panel()
+        show_audit_panel()
+
+def show_archive_panel():
+    """Архив результатов: размеры таблиц и запуски переноса (только для администратора)"""
+    st.divider()
+    st.subheader("📦 Архив результатов")
+    
+    status = get_archive_status()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("В горячей таблице", status['hot'])
+    col2.metric("В архиве", status['archived'])
+    with col3:
+        if st.button("Архивировать сейчас", use_container_width=True):
+            with st.spinner("Перенос старых результатов..."):
+                result = archive_old_results()
+            st.success(f"✅ Перенесено: {result['moved']}")
+    
+    if not status['runs'].empty:
+        st.dataframe(status['runs'], use_container_width=True, hide_index=True)
+
+def show_audit_panel():
+    """Журнал действий с фильтрами и постраничным просмотром (только для администратора)"""
+    st.divider()
+    st.subheader("📝 Журнал действий")
+    
+    stats = get_audit_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("В очереди", f"{stats['queued']} / {stats['max_size']}")
+    col2.metric("Записано", stats['written'])
+    col3.metric("Отброшено", stats['dropped'])
+    col4.metric("Ошибок записи", stats['failed'])
+    
+    col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+    with col1:
+        action = st.selectbox("Действие:", ["Все", *audit.ACTIONS])
+        action = None if action == "Все" else action
+    with col2:
+        table_name = st.text_input("Таблица:").strip() or None
+    with col3:
+        username = st.text_input("Пользователь:").strip() or None
+    with col4:
+        # События пишутся в фоне - перед просмотром дописываем очередь
+        if st.button("🔄 Обновить", use_container_width=True):
+            flush_audit_log()
+    
+    # Стек курсоров, как на странице результатов; смена фильтров - с начала
+    filters_key = (action, table_name, username)
+    if st.session_state.get('audit_filters_key') != filters_key:
+        st.session_state['audit_filters_key'] = filters_key
+        st.session_state['audit_cursors'] = [None]
+    cursors = st.session_state['audit_cursors']
+    
+    events, next_cursor = get_audit_log_page(
+        cursor=cursors[-1], action=action, table_name=table_name, username=username
+    )
+    if events.empty:
+        st.info("📭 Событий нет")
+        return
+    
+    st.dataframe(
+        events.rename(columns={
+            'timestamp': 'Время (UTC)', 'username': 'Пользователь', 'action': 'Действие',
+            'table_name': 'Таблица', 'record_id': 'Запись', 'changes': 'Изменения',
+            'ip_address': 'IP',
+        }).drop(columns=['user_id']),
+        use_container_width=True,
+        hide_index=True
+    )
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("← Назад", key="audit_prev", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"Страница {len(cursors)}")
+    with col_next:
+        if st.button("Вперёд →", key="audit_next", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+
+def show_query_stats_panel():
+    """Панель производительности БД (только для администратора)"""
+    st.divider()
+    st.subheader("🩺 Производительность БД")
+    
+    pool = get_pool_stats()
+    cache = get_query_cache_stats()
+    cache_lookups = cache['hits'] + cache['misses']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Соединений открыто", f"{pool['open']} / {pool['max_size']}")
+    col2.metric("Ожиданий пула", pool['waits'])
+    col3.metric("Попаданий в кэш", f"{cache['hits'] / cache_lookups:.0%}" if cache_lookups else "—")
+    col4.metric("Порог медленных, мс", f"{query_stats.SLOW_QUERY_MS:.0f}")
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        top_n = st.number_input("Топ N", min_value=5, max_value=100, value=10, step=5)
+    with col2:
+        order_by = st.selectbox(
+            "Сортировка",
+            ['total_ms', 'avg_ms', 'max_ms', 'calls'],
+            format_func=lambda x: {
+                'total_ms': 'Суммарное время', 'avg_ms': 'Среднее время',
+                'max_ms': 'Максимальное время', 'calls': 'Число вызовов'
+            }[x]
+        )
+    
+    top = query_stats.top_statements(int(top_n), order_by)
+    if not top:
+        st.info("Запросов ещё не было")
+        return
+    
+    df = pd.DataFrame(top).rename(columns={
+        'statement': 'Запрос', 'calls': 'Вызовов', 'errors': 'Ошибок',
+        'total_ms': 'Всего, мс', 'avg_ms': 'Среднее, мс', 'p95_ms': 'p95, мс',
+        'max_ms': 'Макс, мс', 'rows': 'Строк', 'call_sites': 'Места вызова'
+    })
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    statement = st.selectbox("Гистограмма задержек", [row['statement'] for row in top])
+    histogram = pd.DataFrame(
+        query_stats.latency_histogram(statement), columns=['мс', 'Вызовов']
+    ).set_index('мс')
+    st.bar_chart(histogram)
+    
+    charts = get_chart_cache_stats()
+    started = get_bootstrap_info()
+    st.caption(
+        f"Медленные запросы с планами пишутся в {query_stats.SLOW_QUERY_LOG} · "
+        f"графиков в кэше: {charts['entries']} ({charts['bytes'] / 1024 / 1024:.1f} МБ), "
+        f"повторных показов без отрисовки: {charts['hits']}"
+        + (f" · подготовка процесса: {started['ms']:.0f} мс"
+           f"{', с инициализацией схемы' if started['initialized'] else ''}" if started else "")
+    )
+    if st.button("🔄 Сбросить статистику"):
+        query_stats.reset()
+        st.rerun()
 
 def authenticate_user(username: str, password: str):
     """Аутентификация"""
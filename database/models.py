@@ -158,6 +158,7 @@ class AuditLog(Base):
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
+    username = Column(String(100))  # у демо-пользователей нет строки в users
     action = Column(String(50), nullable=False)  # CREATE, READ, UPDATE, DELETE
     table_name = Column(String(100), nullable=False)
     record_id = Column(Integer)
@@ -5,15 +5,158 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime, timedelta
-from utils.database import get_athlete_by_id, get_sport_results
+from functools import partial
+from utils.chart_cache import chart, show_chart_spec, warm_charts
+from utils.database import get_athlete_by_id, load_profile_parts
+from utils.fragments import filter_panel, fragment
+from utils.lazy_tabs import LazyTab, lazy_tabs
+
+# ==================== ГРАФИКИ ====================
+# Функции рисования для show_chart: зависят только от своих аргументов.
+# matplotlib загружает chart_cache при первой отрисовке, не при импорте страницы
+
+def draw_places(ax, place_counts: pd.Series):
+    ax.bar(place_counts.index, place_counts.values, color='#3498DB', edgecolor='black', linewidth=1.5)
+    ax.set_xlabel("Место", fontsize=12, fontweight='bold')
+    ax.set_ylabel("Количество", fontsize=12, fontweight='bold')
+    ax.set_title("Распределение мест", fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3, axis='y')
+
+def draw_competitions(ax, comp_counts: pd.Series):
+    from matplotlib import colormaps
+    colors = colormaps['Set3'](np.linspace(0, 1, len(comp_counts)))
+    ax.pie(comp_counts, labels=comp_counts.index, autopct='%1.1f%%', colors=colors, startangle=90)
+    ax.set_title("Участие в соревнованиях", fontsize=14, fontweight='bold')
+
+def draw_monthly_places(ax, monthly: pd.DataFrame):
+    months = pd.to_datetime(monthly['period'], format='%Y-%m')
+    ax.plot(months, monthly['avg_place'], marker='o', linewidth=2.5, markersize=8,
+           color='#E74C3C', markerfacecolor='#C0392B', markeredgewidth=2, label='Среднее место')
+    ax.plot(months, monthly['best_place'], marker='^', linewidth=1.5, markersize=6,
+           color='#2ECC71', alpha=0.8, label='Лучшее место')
+    ax.invert_yaxis()  # Инвертируем ось (1 место вверху)
+    ax.fill_between(months, monthly['avg_place'], alpha=0.2, color='#E74C3C')
+    
+    ax.set_xlabel("Месяц", fontsize=12, fontweight='bold')
+    ax.set_ylabel("Место", fontsize=12, fontweight='bold')
+    ax.set_title("Динамика мест по месяцам", fontsize=14, fontweight='bold')
+    ax.legend(loc='best', fontsize=11)
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
+
+def draw_place_trend(ax, monthly: pd.DataFrame):
+    months = pd.to_datetime(monthly['period'], format='%Y-%m')
+    # Скользящее среднее по месяцам
+    window = min(3, len(monthly))
+    moving_avg = monthly['avg_place'].rolling(window=window, center=True, min_periods=1).mean()
+    
+    ax.plot(months, monthly['avg_place'], marker='o', label='Результаты', 
+           linewidth=1.5, markersize=6, color='#3498DB', alpha=0.6)
+    ax.plot(months, moving_avg, label='Тренд', 
+           linewidth=3, color='#2ECC71', marker='s', markersize=8)
+    
+    ax.invert_yaxis()
+    ax.set_xlabel("Месяц", fontsize=12, fontweight='bold')
+    ax.set_ylabel("Место", fontsize=12, fontweight='bold')
+    ax.set_title("Тренд результатов", fontsize=14, fontweight='bold')
+    ax.legend(loc='best', fontsize=11)
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
+
+def draw_season_bests(ax, series: pd.DataFrame, unit):
+    ax.plot(series['period'], series['best_value'], marker='o', linewidth=2.5,
+           markersize=8, color='#667eea')
+    if unit == 's':
+        ax.invert_yaxis()  # Время: меньше - лучше, лучшее вверху
+    ax.set_xlabel("Сезон", fontsize=12, fontweight='bold')
+    ax.set_ylabel(f"Результат ({unit})" if unit else "Результат", fontsize=12, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+
+def draw_discipline_places(ax, discipline_avg: pd.Series):
+    colors = ['#2ECC71' if x < 3 else '#3498DB' if x < 5 else '#E74C3C' for x in discipline_avg.values]
+    ax.barh(discipline_avg.index, discipline_avg.values, color=colors, edgecolor='black', linewidth=1.5)
+    ax.set_xlabel("Среднее место", fontsize=12, fontweight='bold')
+    ax.set_title("Производительность по дисциплинам", fontsize=14, fontweight='bold')
+    ax.invert_yaxis()
+
+# Графики вкладок: одни и те же описания для показа и для предзагрузки
+
+def statistics_charts(results: pd.DataFrame):
+    """Распределение мест и соревнования"""
+    return [
+        chart(draw_places, results['place'].value_counts().sort_index().head(10), figsize=(10, 6)),
+        chart(draw_competitions, results['competition_name'].value_counts(), figsize=(10, 6)),
+    ]
+
+def dynamics_charts(monthly: pd.DataFrame):
+    """Места по месяцам и тренд"""
+    return [
+        chart(draw_monthly_places, monthly[['period', 'avg_place', 'best_place']], figsize=(12, 6)),
+        chart(draw_place_trend, monthly[['period', 'avg_place']], figsize=(12, 6)),
+    ]
+
+def season_bests_chart(progress: pd.DataFrame, discipline):
+    """Лучший результат дисциплины по сезонам"""
+    series = progress[progress['discipline'] == discipline]
+    unit = series['result_unit'].dropna().iloc[0] if series['result_unit'].notna().any() else ''
+    return chart(draw_season_bests, series[['period', 'best_value']], figsize=(12, 4), unit=unit)
+
+def discipline_chart(results: pd.DataFrame):
+    """Среднее место по дисциплинам"""
+    discipline_avg = results.groupby('discipline')['place'].mean().sort_values()
+    return chart(draw_discipline_places, discipline_avg, figsize=(10, 6))
+
+# ==================== ВКЛАДКИ ====================
+# Каждая вкладка загружает только свои данные; prefetch_* - то же самое
+# в фоне, без вывода на страницу
+
+def _load(athlete_id: int, *parts):
+    data = load_profile_parts(athlete_id, parts)
+    return [data[name] for name in parts]
+
+def statistics_tab(athlete_id: int):
+    results, stats = _load(athlete_id, 'results', 'statistics')
+    show_athlete_statistics(athlete_id, results, stats)
+
+def prefetch_statistics(athlete_id: int):
+    results, _ = _load(athlete_id, 'results', 'statistics')
+    if not results.empty:
+        warm_charts(statistics_charts(results))
+
+def results_tab(athlete_id: int):
+    results, = _load(athlete_id, 'results')
+    show_athlete_results(results)
+
+def prefetch_results(athlete_id: int):
+    _load(athlete_id, 'results')
+
+def dynamics_tab(athlete_id: int):
+    show_athlete_dynamics(athlete_id, *_load(athlete_id, 'monthly', 'seasons', 'progress'))
+
+def prefetch_dynamics(athlete_id: int):
+    monthly, _, progress = _load(athlete_id, 'monthly', 'seasons', 'progress')
+    if monthly.empty:
+        return
+    charts = dynamics_charts(monthly)
+    if not progress.empty:
+        # Выбранная по умолчанию дисциплина - первая
+        charts.append(season_bests_chart(progress, progress['discipline'].iloc[0]))
+    warm_charts(charts)
+
+def analysis_tab(athlete_id: int):
+    results, = _load(athlete_id, 'results')
+    show_athlete_analysis(athlete_id, results)
+
+def prefetch_analysis(athlete_id: int):
+    results, = _load(athlete_id, 'results')
+    if not results.empty:
+        warm_charts([discipline_chart(results)])
 
 def show_athlete_profile(athlete_id: int):
     """Показывает полный профиль спортсмена с аналитикой"""
     
-    # Получаем данные спортсмена
+    # Заголовку нужна только карточка; данные вкладок грузит открытая вкладка
     athlete = get_athlete_by_id(athlete_id)
     
     if athlete.empty:
@@ -44,25 +187,19 @@ def show_athlete_profile(athlete_id: int):
     
     st.markdown("---")
     
-    # Получаем результаты соревнований
-    results = get_sport_results(athlete_id=athlete_id, limit=100)
-    
-    # Вкладки
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Статистика", "🏆 Результаты", "📈 Динамика", "🎯 Анализ"])
-    
-    with tab1:
-        show_athlete_statistics(athlete_id, results)
-    
-    with tab2:
-        show_athlete_results(results)
-    
-    with tab3:
-        show_athlete_dynamics(athlete_id, results)
-    
-    with tab4:
-        show_athlete_analysis(athlete_id, results)
+    # Вкладки: выполняется только открытая, соседние предзагружаются в фоне
+    lazy_tabs([
+        LazyTab("📊 Статистика", partial(statistics_tab, athlete_id),
+                partial(prefetch_statistics, athlete_id)),
+        LazyTab("🏆 Результаты", partial(results_tab, athlete_id),
+                partial(prefetch_results, athlete_id)),
+        LazyTab("📈 Динамика", partial(dynamics_tab, athlete_id),
+                partial(prefetch_dynamics, athlete_id)),
+        LazyTab("🎯 Анализ", partial(analysis_tab, athlete_id),
+                partial(prefetch_analysis, athlete_id)),
+    ], key='profile_tab', token=athlete_id)
 
-def show_athlete_statistics(athlete_id: int, results: pd.DataFrame):
+def show_athlete_statistics(athlete_id: int, results: pd.DataFrame, stats: dict):
     """Статистика спортсмена"""
     st.subheader("📊 Основная статистика")
     
@@ -70,29 +207,27 @@ def show_athlete_statistics(athlete_id: int, results: pd.DataFrame):
         st.info("📭 Нет данных о соревнованиях")
         return
     
+    # Заголовочные метрики - готовая строка athlete_stats, без агрегации
     col1, col2, col3, col4 = st.columns(4)
     
     # Всего соревнований
-    total_competitions = len(results)
     with col1:
-        st.metric("🏆 Всего соревнований", total_competitions)
+        st.metric("🏆 Всего соревнований", stats['total_competitions'])
     
     # Средний результат (место)
-    avg_place = results['place'].mean() if 'place' in results.columns else 0
+    avg_place = stats['avg_place'] or 0
     with col2:
         st.metric("📍 Среднее место", f"{avg_place:.1f}")
     
     # Лучший результат
-    best_place = results['place'].min() if 'place' in results.columns else 0
+    best_place = stats['best_place'] or 0
     with col3:
         st.metric("🥇 Лучший результат", f"{int(best_place)} место")
     
     # Последний результат
-    if not results.empty:
-        last_date = results['competition_date'].max()
-        last_place = results[results['competition_date'] == last_date]['place'].values[0] if 'place' in results.columns else 0
-        with col4:
-            st.metric("⚡ Последний результат", f"{int(last_place)} место")
+    last_place = stats['last_place'] or 0
+    with col4:
+        st.metric("⚡ Последний результат", f"{int(last_place)} место")
     
     st.markdown("---")
     
@@ -100,29 +235,17 @@ def show_athlete_statistics(athlete_id: int, results: pd.DataFrame):
     st.subheader("Распределение мест на соревнованиях")
     
     col1, col2 = st.columns(2)
+    places_chart, competitions_chart = statistics_charts(results)
     
     with col1:
-        if 'place' in results.columns:
-            place_counts = results['place'].value_counts().sort_index().head(10)
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.bar(place_counts.index, place_counts.values, color='#3498DB', edgecolor='black', linewidth=1.5)
-            ax.set_xlabel("Место", fontsize=12, fontweight='bold')
-            ax.set_ylabel("Количество", fontsize=12, fontweight='bold')
-            ax.set_title("Распределение мест", fontsize=14, fontweight='bold')
-            ax.grid(True, alpha=0.3, axis='y')
-            st.pyplot(fig)
+        show_chart_spec(places_chart)
     
     with col2:
-        if 'competition_name' in results.columns:
-            comp_counts = results['competition_name'].value_counts()
-            fig, ax = plt.subplots(figsize=(10, 6))
-            colors = plt.cm.Set3(np.linspace(0, 1, len(comp_counts)))
-            ax.pie(comp_counts, labels=comp_counts.index, autopct='%1.1f%%', colors=colors, startangle=90)
-            ax.set_title("Участие в соревнованиях", fontsize=14, fontweight='bold')
-            st.pyplot(fig)
+        show_chart_spec(competitions_chart)
 
+@fragment
 def show_athlete_results(results: pd.DataFrame):
-    """Таблица результатов"""
+    """Таблица результатов; фрагмент - фильтры перезапускают только её"""
     st.subheader("🏆 Все результаты")
     
     if results.empty:
@@ -130,18 +253,17 @@ def show_athlete_results(results: pd.DataFrame):
         return
     
     # Фильтры
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        if 'competition_name' in results.columns:
+    with filter_panel("athlete_results_filters"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
             comp_filter = st.multiselect(
                 "Фильтр по соревнованию:",
                 results['competition_name'].unique(),
                 default=results['competition_name'].unique()[:3]
             )
-    
-    with col2:
-        if 'discipline' in results.columns:
+        
+        with col2:
             disc_filter = st.multiselect(
                 "Фильтр по дисциплине:",
                 results['discipline'].unique(),
@@ -167,83 +289,56 @@ def show_athlete_results(results: pd.DataFrame):
     
     st.info(f"📋 Всего результатов: {len(filtered)}")
 
-def show_athlete_dynamics(athlete_id: int, results: pd.DataFrame):
-    """Динамика результатов за год"""
-    st.subheader("📈 Динамика результатов за год")
+def show_athlete_dynamics(athlete_id: int, monthly: pd.DataFrame, seasons: pd.DataFrame,
+                          progress: pd.DataFrame):
+    """Динамика результатов за всю карьеру (по готовым помесячным итогам)"""
+    st.subheader("📈 Динамика результатов")
     
-    if results.empty:
+    if monthly.empty:
         st.info("📭 Нет данных для анализа динамики")
         return
     
-    # Сортируем по дате
-    if 'competition_date' in results.columns:
-        results_sorted = results.sort_values('competition_date')
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Динамика мест
-            if 'place' in results.columns and 'competition_date' in results.columns:
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                dates = pd.to_datetime(results_sorted['competition_date'])
-                places = results_sorted['place'].values
-                
-                ax.plot(dates, places, marker='o', linewidth=2.5, markersize=8, 
-                       color='#E74C3C', markerfacecolor='#C0392B', markeredgewidth=2)
-                ax.invert_yaxis()  # Инвертируем ось (1 место вверху)
-                ax.fill_between(dates, places, alpha=0.2, color='#E74C3C')
-                
-                ax.set_xlabel("Дата", fontsize=12, fontweight='bold')
-                ax.set_ylabel("Место", fontsize=12, fontweight='bold')
-                ax.set_title("Динамика мест за год", fontsize=14, fontweight='bold')
-                ax.grid(True, alpha=0.3)
-                
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
-        
-        with col2:
-            # Тренд улучшения/ухудшения
-            if 'place' in results.columns:
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                # Скользящее среднее
-                places = results_sorted['place'].values
-                window = min(3, len(places))
-                moving_avg = pd.Series(places).rolling(window=window, center=True).mean()
-                
-                dates = pd.to_datetime(results_sorted['competition_date'])
-                
-                ax.plot(dates, places, marker='o', label='Результаты', 
-                       linewidth=1.5, markersize=6, color='#3498DB', alpha=0.6)
-                ax.plot(dates, moving_avg, label='Тренд', 
-                       linewidth=3, color='#2ECC71', marker='s', markersize=8)
-                
-                ax.invert_yaxis()
-                ax.set_xlabel("Дата", fontsize=12, fontweight='bold')
-                ax.set_ylabel("Место", fontsize=12, fontweight='bold')
-                ax.set_title("Тренд результатов", fontsize=14, fontweight='bold')
-                ax.legend(loc='best', fontsize=11)
-                ax.grid(True, alpha=0.3)
-                
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
-        
-        st.markdown("---")
+    col1, col2 = st.columns(2)
+    places_chart, trend_chart = dynamics_charts(monthly)
+    
+    with col1:
+        # Динамика мест
+        show_chart_spec(places_chart)
+    
+    with col2:
+        # Тренд улучшения/ухудшения
+        show_chart_spec(trend_chart)
+    
+    st.markdown("---")
+    
+    # Лучший результат по сезонам в каждой дисциплине
+    if not progress.empty:
+        st.subheader("🏁 Лучший результат по сезонам")
         
+        discipline = st.selectbox(
+            "Дисциплина:", progress['discipline'].unique().tolist(),
+            key=f"dynamics_discipline_{athlete_id}"
+        )
+        show_chart_spec(season_bests_chart(progress, discipline))
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
         # Статистика по месяцам
         st.subheader("📊 Анализ по месяцам")
-        
-        results_sorted['month'] = pd.to_datetime(results_sorted['competition_date']).dt.to_period('M')
-        monthly_stats = results_sorted.groupby('month').agg({
-            'place': ['count', 'mean', 'min']
-        }).round(2)
-        
-        monthly_stats.columns = ['Соревнований', 'Среднее место', 'Лучший результат']
-        
-        st.dataframe(monthly_stats, use_container_width=True)
+        monthly_stats = monthly.set_index('period')[
+            ['competitions', 'avg_place', 'best_place', 'worst_place']
+        ].round(2)
+        monthly_stats.columns = ['Соревнований', 'Среднее место', 'Лучшее место', 'Худшее место']
+        st.dataframe(monthly_stats.iloc[::-1], use_container_width=True)
+    
+    with col2:
+        st.subheader("📅 Анализ по сезонам")
+        season_stats = seasons.set_index('period')[
+            ['competitions', 'avg_place', 'best_place', 'worst_place']
+        ].round(2)
+        season_stats.columns = ['Соревнований', 'Среднее место', 'Лучшее место', 'Худшее место']
+        st.dataframe(season_stats.iloc[::-1], use_container_width=True)
 
 def show_athlete_analysis(athlete_id: int, results: pd.DataFrame):
     """Анализ и прогноз"""
@@ -303,14 +398,7 @@ def show_athlete_analysis(athlete_id: int, results: pd.DataFrame):
         
         with col2:
             # Диаграмма
-            discipline_avg = results.groupby('discipline')['place'].mean().sort_values()
-            fig, ax = plt.subplots(figsize=(10, 6))
-            colors = ['#2ECC71' if x < 3 else '#3498DB' if x < 5 else '#E74C3C' for x in discipline_avg.values]
-            ax.barh(discipline_avg.index, discipline_avg.values, color=colors, edgecolor='black', linewidth=1.5)
-            ax.set_xlabel("Среднее место", fontsize=12, fontweight='bold')
-            ax.set_title("Производительность по дисциплинам", fontsize=14, fontweight='bold')
-            ax.invert_yaxis()
-            st.pyplot(fig)
+            show_chart_spec(discipline_chart(results))
     
     st.markdown("---")
     
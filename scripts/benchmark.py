@@ -0,0 +1,437 @@
+"""
+Микро-бенчмарки слоя доступа к данным (utils/database.py)
+
+Каждый бенчмарк работает со своей временной БД и не трогает olympic_reserve.db.
+
+Использование:
+    python scripts/benchmark.py fastpath [--calls 2000]
+    python scripts/benchmark.py indexes [--results 1000000]
+    python scripts/benchmark.py leaderboards [--results 1000000]
+    python scripts/benchmark.py audit [--events 100000]
+    python scripts/benchmark.py dashboard [--athletes 100000]
+    python scripts/benchmark.py bootstrap [--processes 5] [--sessions 10]
+"""
+
+import sys
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корневую папку в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import audit, database as db
+from utils.db_backend import begin_write
+from utils.migrations import run_migrations
+
+
+def use_temp_database(tmp_dir: str) -> Path:
+    """Переключает пул соединений на пустую БД во временной папке"""
+    db_path = Path(tmp_dir) / 'benchmark.db'
+    # Журнал действий пишется в фоне и дописывался бы в уже удалённую БД;
+    # бенчмарк журнала включает его сам
+    db.AUDIT_ENABLED = False
+    if db._pool is not None:
+        db._pool.close_all()
+    db.DB_PATH = db_path
+    db._pool = None
+    return db_path
+
+
+def timeit(func, calls: int) -> float:
+    """Среднее время одного вызова в микросекундах"""
+    func()  # прогрев: соединение и подготовленное выражение
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def print_table(title: str, rows):
+    """Печать результатов: (название, старый путь, новый путь)"""
+    print(f"\n📊 {title}")
+    print(f"  {'Запрос':<32} {'DataFrame, мкс':>15} {'fetch_*, мкс':>13} {'Ускорение':>10}")
+    for name, old, new in rows:
+        print(f"  {name:<32} {old:>15.1f} {new:>13.1f} {old / new:>9.1f}x")
+
+
+# ==================== FASTPATH ====================
+
+def bench_fastpath(args):
+    """Накладные расходы pd.read_sql против fetch_scalar / fetch_one"""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        db.init_database()
+
+        rows = [
+            (1 + i % 3, 'Кубок России', f'2025-{1 + i % 12:02d}-01', 'Спринт 1км', '3:05', 1 + i % 12)
+            for i in range(300)
+        ]
+        with db.db_connection() as conn:
+            conn.executemany(
+                """INSERT INTO sport_results
+                   (athlete_id, competition_name, competition_date, discipline, result, place)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            conn.commit()
+
+        count_sql = "SELECT COUNT(*) as count FROM sport_results"
+        user_sql = "SELECT * FROM users WHERE username = ?"
+        stats_sql = "SELECT COUNT(*) as count FROM sport_results WHERE athlete_id = ?"
+
+        results = [
+            (
+                'COUNT(*) -> число',
+                timeit(lambda: db.execute_query(count_sql)['count'][0], args.calls),
+                timeit(lambda: db.fetch_scalar(count_sql), args.calls),
+            ),
+            (
+                'пользователь по логину -> dict',
+                timeit(lambda: db.execute_query(user_sql, ['admin']).to_dict('records')[0], args.calls),
+                timeit(lambda: db.fetch_one(user_sql, ['admin'], row_type='dict'), args.calls),
+            ),
+            (
+                'COUNT по спортсмену',
+                timeit(lambda: db.execute_query(stats_sql, [1])['count'][0], args.calls),
+                timeit(lambda: db.fetch_scalar(stats_sql, [1]), args.calls),
+            ),
+            (
+                'список видов спорта -> rows',
+                timeit(lambda: db.execute_query("SELECT * FROM sports ORDER BY name"), args.calls),
+                timeit(lambda: db.fetch_all("SELECT * FROM sports ORDER BY name", row_type='row'), args.calls),
+            ),
+        ]
+        print_table(f"Накладные расходы на вызов ({args.calls} вызовов)", results)
+        db.get_pool().close_all()
+
+
+# ==================== INDEXES ====================
+
+PROFILE_QUERIES = [
+    ('результаты спортсмена',
+     "SELECT * FROM sport_results WHERE athlete_id = ? ORDER BY competition_date DESC LIMIT 100",
+     lambda: [random.randint(1, 10000)]),
+    ('статистика спортсмена',
+     """SELECT COUNT(*), COALESCE(SUM(is_personal_best = 1), 0), AVG(place)
+        FROM sport_results WHERE athlete_id = ?""",
+     lambda: [random.randint(1, 10000)]),
+    ('последние результаты',
+     "SELECT * FROM sport_results ORDER BY competition_date DESC LIMIT 50",
+     lambda: []),
+    ('личные рекорды спортсмена',
+     "SELECT * FROM sport_results WHERE athlete_id = ? AND is_personal_best = 1",
+     lambda: [random.randint(1, 10000)]),
+    ('активные спортсмены по ФИО',
+     "SELECT * FROM athletes WHERE program_status = ? ORDER BY last_name, first_name LIMIT 100",
+     lambda: ['active']),
+    ('медданные спортсмена',
+     "SELECT * FROM medical_data WHERE athlete_id = ? ORDER BY examination_date DESC",
+     lambda: [random.randint(1, 10000)]),
+    # Страница результатов: фильтр и порядки
+    ('результаты соревнования',
+     """SELECT * FROM sport_results WHERE competition_name = ? AND competition_date IS NOT NULL
+        ORDER BY competition_date DESC, id DESC LIMIT 51""",
+     lambda: ['Кубок России']),
+    ('результаты по месту',
+     "SELECT * FROM sport_results WHERE place IS NOT NULL ORDER BY place, id LIMIT 51",
+     lambda: []),
+    ('результаты по спортсмену',
+     """SELECT r.*, a.last_name, a.first_name
+        FROM sport_results r LEFT JOIN athletes a ON a.id = r.athlete_id
+        WHERE a.last_name IS NOT NULL
+        ORDER BY a.last_name, a.first_name, a.id, r.id LIMIT 51""",
+     lambda: []),
+]
+
+
+def generate_results(count: int, athletes: int):
+    """Поток синтетических результатов для массовой вставки"""
+    rng = random.Random(42)
+    for _ in range(count):
+        yield (
+            rng.randint(1, athletes),
+            rng.choice(['Чемпионат России', 'Кубок России', 'Спартакиада регионов']),
+            f"{rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            rng.choice(['Спринт 1км', 'Классический стиль 5км', 'Одиночка 2км']),
+            f"{rng.randint(3, 9)}:{rng.randint(0, 59):02d}",
+            rng.randint(1, 30),
+        )
+
+
+def measure_queries(conn, repeats: int):
+    """План и среднее время каждого запроса профиля"""
+    measured = {}
+    for name, query, make_params in PROFILE_QUERIES:
+        plan = '; '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", make_params()))
+        start = time.perf_counter()
+        for _ in range(repeats):
+            conn.execute(query, make_params()).fetchall()
+        measured[name] = (plan, (time.perf_counter() - start) / repeats * 1000)
+    return measured
+
+
+def bench_indexes(args):
+    """Профильные запросы на N результатах: до и после миграции индексов"""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        db.init_database()
+
+        with db.db_connection() as conn:
+            # Состояние старого olympic_reserve.db: таблицы без индексов и без версии
+            indexes = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+            )]
+            for name in indexes:
+                conn.execute(f"DROP INDEX {name}")
+            conn.execute("DELETE FROM schema_version")
+            conn.execute("DROP TABLE IF EXISTS sqlite_stat1")
+            conn.commit()
+
+        print(f"⏳ Генерация 10000 спортсменов и {args.results} результатов...")
+        db.add_athletes_bulk(
+            (f"Имя{i}", f"Фамилия{i % 997}", '2005-01-01', 'МЖ'[i % 2], 'active')
+            for i in range(10000)
+        )
+        start = time.perf_counter()
+        db.add_sport_results_bulk(generate_results(args.results, 10000))
+        print(f"   вставка результатов: {time.perf_counter() - start:.1f} с")
+
+        with db.db_connection() as conn:
+            before = measure_queries(conn, args.repeats)
+            start = time.perf_counter()
+            applied = run_migrations(conn)
+            print(f"   миграции {applied}: {time.perf_counter() - start:.1f} с")
+            after = measure_queries(conn, args.repeats)
+
+        for name, _, _ in PROFILE_QUERIES:
+            plan_before, ms_before = before[name]
+            plan_after, ms_after = after[name]
+            print(f"\n📊 {name}: {ms_before:.2f} мс -> {ms_after:.2f} мс")
+            print(f"   до:    {plan_before}")
+            print(f"   после: {plan_after}")
+        db.get_pool().close_all()
+
+
+# ==================== LEADERBOARDS ====================
+
+LEADERBOARD_DISCIPLINES = ['Спринт 1км', 'Классический стиль 5км', 'Одиночка 2км']
+
+
+def bench_leaderboards(args):
+    """Топ-500 дисциплины из leaderboard_entries и обновление рейтинга при вставке"""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        db.init_database()
+
+        print(f"⏳ Генерация 10000 спортсменов и {args.results} результатов...")
+        db.add_athletes_bulk(
+            (f"Имя{i}", f"Фамилия{i % 997}", '2005-01-01', 'МЖ'[i % 2], 'active')
+            for i in range(10000)
+        )
+        start = time.perf_counter()
+        db.add_sport_results_bulk(generate_results(args.results, 10000))
+        print(f"   вставка результатов (с рейтингами): {time.perf_counter() - start:.1f} с")
+
+        start = time.perf_counter()
+        rows = db.rebuild_leaderboards()
+        print(f"   полный пересчёт рейтингов: {time.perf_counter() - start:.1f} с, строк: {rows}")
+
+        def read_top(discipline, season, gender):
+            # Сброс кэша: меряем чтение из БД, а не из памяти
+            db.invalidate_tables('leaderboard_entries')
+            return db.get_leaderboard(discipline, season, gender, limit=500)
+
+        print("\n📊 Топ-500, чтение из БД")
+        for discipline in LEADERBOARD_DISCIPLINES:
+            for season, gender in (('all', None), ('2024', None), ('2024', 'Ж')):
+                ms = timeit(lambda: read_top(discipline, season, gender), args.repeats) / 1000
+                print(f"  {discipline:<24} {season:>4} {gender or 'все':>4}: {ms:6.2f} мс")
+
+        rng = random.Random(7)
+
+        def insert_one():
+            db.add_sport_result(
+                rng.randint(1, 10000), 'Кубок России', f"2024-{rng.randint(1, 12):02d}-15",
+                rng.choice(LEADERBOARD_DISCIPLINES), f"{rng.randint(3, 9)}:{rng.randint(0, 59):02d}",
+                rng.randint(1, 30)
+            )
+
+        ms = timeit(insert_one, args.repeats) / 1000
+        print(f"\n📊 Вставка одного результата (рекорд + рейтинги): {ms:.2f} мс")
+        db.get_pool().close_all()
+
+
+def bench_audit(args):
+    """Событие журнала: синхронный INSERT против очереди с пакетной записью"""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        db.init_database()
+        db.AUDIT_ENABLED = True
+
+        def write_sync():
+            row = audit.make_row(audit.READ, 'athletes', 1, username='bench')
+            with db.db_connection() as conn:
+                begin_write(conn)
+                conn.execute(audit.INSERT, row)
+                conn.commit()
+
+        sync_us = timeit(write_sync, min(args.events, 2000))
+        queue_us = timeit(lambda: db.audit_event(audit.UPDATE, 'athletes', 1), args.events)
+        start = time.perf_counter()
+        db.flush_audit_log(timeout=600)
+        drain = time.perf_counter() - start
+
+        stats = db.get_audit_stats()
+        print("\n📊 Одно событие журнала")
+        print(f"  синхронный INSERT + COMMIT: {sync_us:8.1f} мкс")
+        print(f"  постановка в очередь:       {queue_us:8.1f} мкс ({sync_us / queue_us:.0f}x)")
+        print(f"  дозапись очереди: {drain:.2f} с, пачек: {stats['batches']}, "
+              f"записано: {stats['written']}, отброшено: {stats['dropped']}")
+
+        ms = timeit(lambda: db.get_audit_log_page(action=audit.UPDATE), 50) / 1000
+        print(f"  страница журнала (фильтр по действию): {ms:.2f} мс")
+        db.AUDIT_ENABLED = False
+        db.get_pool().close_all()
+
+
+# ==================== DASHBOARD ====================
+
+def bench_dashboard(args):
+    """Сводка для дашбордов: без кэша и из кэша при растущем числе спортсменов"""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        db.init_database()
+        rng = random.Random(7)
+        sport_ids = db.get_sports()['id'].tolist()
+        region_ids = db.get_regions()['id'].tolist()
+
+        def read_cold():
+            # Сброс кэша: меряем GROUP BY в БД, а не чтение из памяти
+            db.invalidate_tables('athletes', 'athlete_stats', 'coaches', 'sport_results')
+            return db.get_dashboard_aggregates()
+
+        print("\n📊 Сводка для дашбордов")
+        print(f"  {'Спортсменов':>12} {'без кэша, мс':>13} {'из кэша, мс':>12}")
+        total = 0
+        # 1%, 10% и 100% от --athletes
+        for size in sorted({max(1, args.athletes // 100), max(1, args.athletes // 10), args.athletes}):
+            db.add_athletes_bulk(
+                (f"Имя{i}", f"Фамилия{i % 997}", '2005-01-01', 'МЖ'[i % 2], 'active',
+                 rng.choice(sport_ids), rng.choice(region_ids), None)
+                for i in range(total, size)
+            )
+            total = size
+            cold = timeit(read_cold, args.repeats) / 1000
+            warm = timeit(db.get_dashboard_aggregates, args.repeats) / 1000
+            print(f"  {total:>12} {cold:>13.2f} {warm:>12.2f}")
+        db.get_pool().close_all()
+
+
+# ==================== BOOTSTRAP ====================
+
+# Дочерний процесс: холодный старт сервера и открытие сессий через AppTest.
+# Отсчёт первой сессии - от запуска процесса: импорт streamlit и app.py,
+# подготовка БД и первый запрос главной страницы
+BOOTSTRAP_CHILD = """
+import time
+started = time.perf_counter()
+import json, sys
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+from utils import database as db
+
+if sys.argv[1] == 'session':
+    # Как было в app.py до bootstrap(): схема и мок-данные в каждой сессии
+    def bootstrap(seed=None):
+        db.init_database()
+        if seed is not None:
+            seed()
+        db.start_archive_scheduler()
+    db.bootstrap = bootstrap
+
+times = []
+for _ in range(int(sys.argv[2])):
+    at = AppTest.from_file({app!r}, default_timeout=120)
+    at.session_state['user'] = {{'username': 'admin'}}
+    start = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+    times.append((time.perf_counter() - (started if not times else start)) * 1000)
+print(json.dumps(times))
+"""
+
+
+def run_sessions(tmp_dir: str, mode: str, sessions: int) -> list:
+    """Новый процесс сервера с БД в tmp_dir: время открытия сессий, мс"""
+    root = Path(__file__).parent.parent
+    code = BOOTSTRAP_CHILD.format(root=str(root), app=str(root / 'app.py'))
+    proc = subprocess.run(
+        [sys.executable, '-c', code, mode, str(sessions)],
+        cwd=tmp_dir, capture_output=True, text=True, check=True
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def bench_bootstrap(args):
+    """Холодная сессия (новый процесс) и новая сессия: подготовка БД на каждую сессию против bootstrap()"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # Первый процесс создаёт olympic_reserve.db с мок-данными в tmp -
+        # дальше меряем уже работающую установку
+        run_sessions(tmp, 'process', 1)
+
+        print("\n📊 Открытие главной страницы (AppTest)")
+        print(f"  {'Подготовка БД':<26} {'холодная сессия, мс':>20} {'новая сессия, мс':>17}")
+        for mode, name in (('session', 'в каждой сессии'), ('process', 'bootstrap() на процесс')):
+            cold, warm = [], []
+            for _ in range(args.processes):
+                times = run_sessions(tmp, mode, args.sessions + 1)
+                cold.append(times[0])
+                warm.extend(times[1:])
+            print(f"  {name:<26} {statistics.median(cold):>20.0f} {statistics.median(warm):>17.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки слоя доступа к данным")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fastpath = subparsers.add_parser('fastpath', help='pd.read_sql против fetch_*')
+    fastpath.add_argument('--calls', type=int, default=2000)
+    fastpath.set_defaults(func=bench_fastpath)
+
+    indexes = subparsers.add_parser('indexes', help='планы запросов до и после индексов')
+    indexes.add_argument('--results', type=int, default=1_000_000)
+    indexes.add_argument('--repeats', type=int, default=20)
+    indexes.set_defaults(func=bench_indexes)
+
+    leaderboards = subparsers.add_parser('leaderboards', help='чтение топ-500 и обновление рейтингов')
+    leaderboards.add_argument('--results', type=int, default=1_000_000)
+    leaderboards.add_argument('--repeats', type=int, default=50)
+    leaderboards.set_defaults(func=bench_leaderboards)
+
+    audit_parser = subparsers.add_parser('audit', help='журнал действий: очередь против синхронной записи')
+    audit_parser.add_argument('--events', type=int, default=100_000)
+    audit_parser.set_defaults(func=bench_audit)
+
+    dashboard = subparsers.add_parser('dashboard', help='сводка для главной и аналитики')
+    dashboard.add_argument('--athletes', type=int, default=100_000)
+    dashboard.add_argument('--repeats', type=int, default=20)
+    dashboard.set_defaults(func=bench_dashboard)
+
+    bootstrap = subparsers.add_parser('bootstrap', help='открытие сессии: подготовка БД на сессию против на процесс')
+    bootstrap.add_argument('--processes', type=int, default=5)
+    bootstrap.add_argument('--sessions', type=int, default=10)
+    bootstrap.set_defaults(func=bench_bootstrap)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Проверка времени импорта при холодном старте приложения
+
+Импорты верхнего уровня app.py (те же строки import, что в файле)
+выполняются в отдельном интерпретаторе с `python -X importtime`;
+время - сумма cumulative по модулям верхнего уровня, лучший из --runs
+запусков. Проверка падает (код выхода 1), если время больше бюджета
+или если при старте загружен графический стек (страница входа должна
+открываться без него: графики импортирует utils/chart_cache при первой
+отрисовке).
+
+Использование:
+    python scripts/check_import_time.py [--budget-ms 800] [--runs 3] [--top 15]
+
+Бюджет по умолчанию - IMPORT_TIME_BUDGET_MS из окружения или 800 мс.
+"""
+
+import sys
+import argparse
+import ast
+import os
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+APP = ROOT / 'app.py'
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', '800'))
+
+# Пакеты, которых не должно быть в sys.modules после импорта app.py
+FORBIDDEN_AT_STARTUP = ('matplotlib', 'seaborn', 'plotly')
+
+
+def startup_imports(path: Path) -> str:
+    """Строки import верхнего уровня файла"""
+    source = path.read_text(encoding='utf-8')
+    tree = ast.parse(source)
+    return '\n'.join(
+        ast.get_source_segment(source, node)
+        for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def measure(code: str):
+    """
+    Один холодный импорт в новом интерпретаторе.
+
+    Returns:
+        (время, мс; {модуль: cumulative, мкс} для модулей верхнего уровня;
+         загруженные пакеты из FORBIDDEN_AT_STARTUP)
+    """
+    # importtime пишет и неудачные попытки импорта (streamlit пробует plotly),
+    # поэтому загруженные пакеты берутся из sys.modules
+    probe = f"\nimport sys as _sys; print(sorted(set(_sys.modules) & {set(FORBIDDEN_AT_STARTUP)!r}))"
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code + probe],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"импорт завершился с ошибкой:\n{proc.stderr[-2000:]}")
+
+    top_level = {}
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Вложенные импорты выводятся с отступом после "|"
+        if not name[1:].startswith(' '):
+            top_level[name.strip()] = int(cumulative)
+    loaded = ast.literal_eval(proc.stdout.strip().splitlines()[-1])
+    return sum(top_level.values()) / 1000, top_level, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бюджет времени импорта app.py")
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    code = startup_imports(APP)
+    best_ms, top_level, forbidden = min(
+        (measure(code) for _ in range(args.runs)), key=lambda run: run[0]
+    )
+
+    print(f"📦 Импорт app.py: {best_ms:.0f} мс (лучший из {args.runs}), бюджет {args.budget_ms:.0f} мс")
+    for name, us in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<40} {us / 1000:>8.1f} мс")
+
+    failed = False
+    if forbidden:
+        print(f"❌ При старте загружены графические пакеты: {', '.join(forbidden)}")
+        failed = True
+    if best_ms > args.budget_ms:
+        print(f"❌ Время импорта {best_ms:.0f} мс больше бюджета {args.budget_ms:.0f} мс")
+        failed = True
+    if not failed:
+        print("✅ Время импорта в пределах бюджета")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
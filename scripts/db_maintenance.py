@@ -0,0 +1,95 @@
+"""
+Обслуживание локальной БД (olympic_reserve.db)
+
+Разовые команды для пересчёта производных таблиц.
+
+Использование:
+    python scripts/db_maintenance.py rebuild-stats
+    python scripts/db_maintenance.py rebuild-personal-bests
+    python scripts/db_maintenance.py rebuild-leaderboards [--discipline "Спринт 1км"]
+    python scripts/db_maintenance.py rebuild-rollups
+    python scripts/db_maintenance.py archive [--horizon-days 730] [--batch-size 5000] [--max-batches N]
+
+archive удобно запускать по расписанию (cron): прерванный запуск
+продолжается с места остановки. Фоновое архивирование в процессе
+приложения по умолчанию выключено (ARCHIVE_INTERVAL_HOURS=0).
+"""
+
+import sys
+import argparse
+import time
+from pathlib import Path
+
+# Добавляем корневую папку в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import database as db
+
+
+def rebuild_stats(args):
+    """Пересчёт athlete_stats по всем результатам"""
+    start = time.perf_counter()
+    count = db.rebuild_athlete_stats()
+    print(f"✅ athlete_stats пересчитана: {count} спортсменов за {time.perf_counter() - start:.1f} с")
+
+
+def rebuild_personal_bests(args):
+    """Пересчёт personal_bests и флагов is_personal_best по всем результатам"""
+    start = time.perf_counter()
+    count = db.rebuild_personal_bests()
+    print(f"✅ Личные рекорды пересчитаны: {count} за {time.perf_counter() - start:.1f} с")
+
+
+def rebuild_leaderboards(args):
+    """Пересчёт рейтингов дисциплин (всех или одной)"""
+    start = time.perf_counter()
+    count = db.rebuild_leaderboards(args.discipline)
+    print(f"✅ Рейтинги пересчитаны: {count} строк за {time.perf_counter() - start:.1f} с")
+
+
+def rebuild_rollups(args):
+    """Пересчёт помесячных и посезонных итогов спортсменов"""
+    start = time.perf_counter()
+    count = db.rebuild_athlete_rollups()
+    print(f"✅ Итоги пересчитаны: {count} помесячных строк за {time.perf_counter() - start:.1f} с")
+
+
+def archive_results(args):
+    """Перенос результатов старше горизонта в sport_results_archive"""
+    start = time.perf_counter()
+    result = db.archive_old_results(args.horizon_days, args.batch_size, args.max_batches)
+    state = "завершён" if result['finished'] else "остановлен, продолжится при следующем запуске"
+    print(f"✅ Запуск {result['run_id']} {state}: перенесено {result['moved']} "
+          f"за {time.perf_counter() - start:.1f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание БД олимпийского резерва")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('rebuild-stats', help='пересчитать athlete_stats').set_defaults(func=rebuild_stats)
+    subparsers.add_parser(
+        'rebuild-personal-bests', help='пересчитать личные рекорды'
+    ).set_defaults(func=rebuild_personal_bests)
+    leaderboards = subparsers.add_parser('rebuild-leaderboards', help='пересчитать рейтинги дисциплин')
+    leaderboards.add_argument('--discipline', help='только одна дисциплина')
+    leaderboards.set_defaults(func=rebuild_leaderboards)
+    subparsers.add_parser(
+        'rebuild-rollups', help='пересчитать помесячные и посезонные итоги'
+    ).set_defaults(func=rebuild_rollups)
+    archive = subparsers.add_parser('archive', help='перенести старые результаты в архив')
+    archive.add_argument('--horizon-days', type=int, help='возраст результата в днях (по умолчанию ARCHIVE_AFTER_DAYS)')
+    archive.add_argument('--batch-size', type=int, default=5000)
+    archive.add_argument('--max-batches', type=int, help='не больше N пачек за запуск')
+    archive.set_defaults(func=archive_results)
+
+    args = parser.parse_args()
+
+    # Таблицы и миграции должны быть применены до любой команды
+    if not db.init_database():
+        sys.exit(1)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
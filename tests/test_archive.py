@@ -0,0 +1,192 @@
+"""
+Архив результатов и личные рекорды
+
+Запуск: python -m pytest tests
+Тесты с параллельными транзакциями идут только на PostgreSQL (в SQLite
+запись сериализована): TEST_DATABASE_URL=postgresql://... - для каждого
+теста создаётся и удаляется отдельная схема, данные базы не трогаются.
+"""
+
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import archive, database as db, personal_bests
+from utils.db_backend import POSTGRESQL, SQLITE, begin_write, connect_postgres, parse_database_url
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL', '')
+DISCIPLINE = 'Спринт 1км'
+CUTOFF = '2020-01-01'
+
+requires_postgres = pytest.mark.skipif(
+    parse_database_url(TEST_DATABASE_URL)[0] != POSTGRESQL,
+    reason="нужен TEST_DATABASE_URL=postgresql://..."
+)
+
+def _use_database(dialect, target, path):
+    """Переключает пул соединений database.py на другую БД"""
+    if db._pool is not None:
+        db._pool.close_all()
+    db.DB_DIALECT, db._DB_TARGET, db.DB_PATH = dialect, target, path
+    db._pool = None
+    db._query_cache.clear()
+
+@pytest.fixture(params=[SQLITE, pytest.param(POSTGRESQL, marks=requires_postgres)])
+def database(request, tmp_path):
+    """Пустая БД со схемой приложения; возвращает диалект"""
+    saved = (db.DB_DIALECT, db._DB_TARGET, db.DB_PATH, db.AUDIT_ENABLED)
+    db.AUDIT_ENABLED = False
+    schema = None
+    if request.param == POSTGRESQL:
+        dsn = parse_database_url(TEST_DATABASE_URL)[1]
+        schema = f"test_{uuid.uuid4().hex[:12]}"
+        admin = connect_postgres(dsn)
+        admin.execute(f"CREATE SCHEMA {schema}")
+        admin.commit()
+        separator = '&' if '?' in dsn else '?'
+        _use_database(POSTGRESQL, f"{dsn}{separator}options=-csearch_path%3D{schema}", None)
+    else:
+        _use_database(SQLITE, None, tmp_path / 'test.db')
+    assert db.init_database()
+
+    yield request.param
+
+    _use_database(*saved[:3])
+    db.AUDIT_ENABLED = saved[3]
+    if schema is not None:
+        admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.commit()
+        admin.close()
+
+def _add_result(athlete_id, competition_date, result):
+    return db.add_sport_result(athlete_id, 'Тест', competition_date, DISCIPLINE, result, 1)
+
+def _copies(result_id):
+    """Сколько раз результат виден во всей истории"""
+    return db.fetch_scalar(f"SELECT COUNT(*) FROM {archive.RESULTS_VIEW} WHERE id = ?", [result_id])
+
+def _flagged(athlete_id):
+    """id результатов спортсмена с флагом рекорда (горячая таблица и архив)"""
+    rows = db.fetch_all(
+        f"SELECT id FROM {archive.RESULTS_VIEW} WHERE athlete_id = ? AND is_personal_best = 1 ORDER BY id",
+        [athlete_id]
+    )
+    return [row[0] for row in rows]
+
+class _AfterCopy:
+    """Соединение, которое вызывает callback сразу после копирования пачки в архив"""
+
+    def __init__(self, conn, callback):
+        self._conn = conn
+        self._callback = callback
+
+    def execute(self, query, params=()):
+        cursor = self._conn.execute(query, params)
+        if self._callback and query.lstrip().startswith(f"INSERT INTO {archive.ARCHIVE_TABLE}"):
+            callback, self._callback = self._callback, None
+            callback()
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def _move_batch_with(callback):
+    """Одна пачка архивирования; callback выполняется между копированием и удалением"""
+    with db.db_connection() as conn:
+        begin_write(conn, lock_key=db.ARCHIVE_LOCK_KEY)
+        run_id = archive.start_run(conn, CUTOFF)
+        conn.commit()
+        begin_write(conn, lock_key=db.ARCHIVE_LOCK_KEY)
+        paused = _AfterCopy(conn, callback)
+        moved, _ = archive.move_batch(paused, run_id)
+        conn.commit()
+    assert paused._callback is None, "пачка не дошла до копирования"
+    db.invalidate_tables('sport_results', archive.ARCHIVE_TABLE)
+    return moved
+
+# ==================== АРХИВИРОВАНИЕ ====================
+
+def test_archive_keeps_personal_bests_hot(database):
+    athlete_id = db.add_athlete('Тест', 'Архивов', '2000-01-01', 'М')
+    best = _add_result(athlete_id, '2015-01-01', '5:00')
+    other = _add_result(athlete_id, '2015-02-01', '5:30')
+
+    assert _move_batch_with(lambda: None) == 1
+    assert db.fetch_scalar("SELECT COUNT(*) FROM sport_results WHERE id = ?", [best]) == 1
+    assert db.fetch_scalar(f"SELECT COUNT(*) FROM {archive.ARCHIVE_TABLE} WHERE id = ?", [other]) == 1
+    assert _copies(best) == _copies(other) == 1
+
+@requires_postgres
+@pytest.mark.parametrize('database', [POSTGRESQL], indirect=True)
+def test_archive_batch_with_concurrent_demotion(database):
+    athlete_id = db.add_athlete('Тест', 'Архивов', '2000-01-01', 'М')
+    old_best = _add_result(athlete_id, '2015-01-01', '5:00')
+    # Кандидат с большим id: диапазон пачки накрывает и старый рекорд
+    _add_result(athlete_id, '2015-02-01', '5:30')
+    writer = connect_postgres(db._DB_TARGET)
+
+    def record_better_result():
+        # Новый рекорд в другой транзакции снимает флаг со старого
+        new_id = writer.execute(
+            """INSERT INTO sport_results
+               (athlete_id, competition_name, competition_date, discipline, result, place,
+                result_value, result_unit)
+               VALUES (?, 'Тест', '2024-01-01', ?, '4:50', 1, 290, 's') RETURNING id""",
+            (athlete_id, DISCIPLINE)
+        ).fetchone()[0]
+        assert personal_bests.record(writer, new_id, athlete_id, DISCIPLINE, 290, 's', '2024-01-01')
+        writer.commit()
+
+    _move_batch_with(record_better_result)
+    writer.close()
+
+    # Строка, не попавшая в копию, не удалена
+    assert _copies(old_best) == 1
+    assert len(_flagged(athlete_id)) == 1
+
+@requires_postgres
+@pytest.mark.parametrize('database', [POSTGRESQL], indirect=True)
+def test_archive_batch_with_concurrent_promotion(database):
+    athlete_id = db.add_athlete('Тест', 'Архивов', '2000-01-01', 'М')
+    _add_result(athlete_id, '2015-01-01', '5:00')
+    promoted = _add_result(athlete_id, '2015-02-01', '5:30')
+    writer = connect_postgres(db._DB_TARGET)
+
+    def promote():
+        writer.execute("UPDATE sport_results SET is_personal_best = 1 WHERE id = ?", (promoted,))
+        writer.commit()
+
+    assert _move_batch_with(promote) == 0
+    writer.close()
+
+    # Рекорд остался в горячей таблице и не задвоился в архиве
+    assert _copies(promoted) == 1
+    assert db.fetch_scalar("SELECT COUNT(*) FROM sport_results WHERE id = ?", [promoted]) == 1
+
+# ==================== ПЕРЕСЧЁТ РЕКОРДОВ ====================
+
+def test_rebuild_returns_archived_best_to_hot_table(database):
+    athlete_id = db.add_athlete('Тест', 'Архивов', '2000-01-01', 'М')
+    best = _add_result(athlete_id, '2015-01-01', '5:00')
+    second = _add_result(athlete_id, '2015-02-01', '5:30')
+    _move_batch_with(lambda: None)
+
+    # Прежний рекорд удалён: лучшим становится результат из архива
+    db.execute_update("DELETE FROM sport_results WHERE id = ?", [best])
+    db.rebuild_personal_bests()
+    assert db.fetch_scalar("SELECT is_personal_best FROM sport_results WHERE id = ?", [second]) == 1
+    assert _copies(second) == 1
+
+    # Следующий лучший результат снимает флаг: рекорд снова один
+    newer = _add_result(athlete_id, '2024-01-01', '4:50')
+    assert _flagged(athlete_id) == [newer]
+    stats = db.fetch_all(
+        "SELECT total_competitions, personal_bests FROM athlete_stats WHERE athlete_id = ?",
+        [athlete_id]
+    )
+    assert tuple(stats[0]) == (2, 1)
@@ -1,88 +1,58 @@
 """
 Модуль утилит для работы с базой данных, аутентификацией и графиками
 Цифровой реестр олимпийского резерва
+
+Функции модулей пакета доступны как utils.<имя>, но модуль импортируется
+только при первом обращении к его функции (PEP 562): импорт utils или
+utils.database не тянет за собой графики (utils.charts и plotly).
 """
 
+import importlib
+
 __version__ = '1.0.0'
 __author__ = 'Olympic Reserve Development Team'
 __description__ = 'Utils package for Olympic Reserve Registry system'
 
-# Явно импортируем модули пакета для удобства
-try:
-    from .auth import (
-        check_authentication,
-        get_current_user,
-        logout_user,
-        authenticate_user,
-        hash_password,
-        verify_password
-    )
-except ImportError as e:
-    print(f"Warning: Could not import auth: {e}")
+# Имя -> модуль пакета, в котором оно определено
+_EXPORTS = {
+    # Аутентификация
+    'check_authentication': 'auth',
+    'get_current_user': 'auth',
+    'logout_user': 'auth',
+    'authenticate_user': 'auth',
+    'hash_password': 'auth',
+    'verify_password': 'auth',
+    # База данных
+    'get_db_connection': 'database',
+    'init_database': 'database',
+    'execute_query': 'database',
+    'get_athletes': 'database',
+    'get_athlete_by_id': 'database',
+    'get_sport_results': 'database',
+    'add_sport_result': 'database',
+    'get_medical_data': 'database',
+    'get_functional_tests': 'database',
+    'get_development_plans': 'database',
+    'get_sports': 'database',
+    'get_regions': 'database',
+    'get_athlete_statistics': 'database',
+    # Графики (plotly)
+    'plot_competition_results_trend': 'charts',
+    'plot_vo2max_trend': 'charts',
+    'plot_heart_rate_zones': 'charts',
+    'plot_morphometry_trend': 'charts',
+    'plot_blood_markers': 'charts',
+}
 
-try:
-    from .database import (
-        get_db_connection,
-        init_database,
-        execute_query,
-        get_athletes,
-        get_athlete_by_id,
-        get_sport_results,
-        add_sport_result,
-        get_medical_data,
-        get_functional_tests,
-        get_development_plans,
-        get_documents,
-        get_sports,
-        get_regions,
-        get_athlete_statistics,
-        get_sport_statistics
-    )
-except ImportError as e:
-    print(f"Warning: Could not import database: {e}")
+__all__ = list(_EXPORTS)
 
-try:
-    from .charts import (
-        plot_results_dynamics,
-        plot_vo2max_dynamics,
-        plot_medical_indicators,
-        plot_anthropometry,
-        plot_heart_rate_zones,
-        plot_places_distribution,
-        plot_competition_frequency,
-        plot_functional_profile
-    )
-except ImportError as e:
-    print(f"Warning: Could not import charts: {e}")
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value  # следующие обращения - без __getattr__
+    return value
 
-__all__ = [
-    'check_authentication',
-    'get_current_user',
-    'logout_user',
-    'authenticate_user',
-    'hash_password',
-    'verify_password',
-    'get_db_connection',
-    'init_database',
-    'execute_query',
-    'get_athletes',
-    'get_athlete_by_id',
-    'get_sport_results',
-    'add_sport_result',
-    'get_medical_data',
-    'get_functional_tests',
-    'get_development_plans',
-    'get_documents',
-    'get_sports',
-    'get_regions',
-    'get_athlete_statistics',
-    'get_sport_statistics',
-    'plot_results_dynamics',
-    'plot_vo2max_dynamics',
-    'plot_medical_indicators',
-    'plot_anthropometry',
-    'plot_heart_rate_zones',
-    'plot_places_distribution',
-    'plot_competition_frequency',
-    'plot_functional_profile'
-]
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
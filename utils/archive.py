@@ -0,0 +1,201 @@
+"""
+Архив старых результатов (горячая и холодная таблицы)
+
+sport_results - горячая таблица: новые результаты, которые показывает
+интерфейс. Результаты старше горизонта (ARCHIVE_AFTER_DAYS) переносятся
+в sport_results_archive с теми же id и колонками, поэтому горячая таблица
+и её индексы остаются маленькими и помещаются в кэш страниц.
+Представление sport_results_all объединяет обе таблицы (UNION ALL) для
+запросов по всей истории.
+
+Действующие личные рекорды (is_personal_best = 1) не архивируются:
+перенос флага рекорда всегда идёт по горячей таблице. Производные
+таблицы (athlete_stats, personal_bests, рейтинги, итоги) считаются по всей
+истории и при переносе не меняются; триггер удаления athlete_stats
+отличает перенос от удаления по наличию строки в архиве.
+
+Перенос идёт пачками по возрастанию id, каждая пачка - короткая
+транзакция (интерфейс продолжает работать). Прогресс хранится в
+archive_runs: прерванный запуск продолжается с последнего id и с тем же
+порогом даты.
+
+Функции модуля принимают открытое соединение и работают внутри
+транзакции вызывающего кода.
+"""
+
+import os
+from datetime import date, timedelta
+
+from utils.db_backend import relation_exists
+
+ARCHIVE_TABLE = 'sport_results_archive'
+RESULTS_VIEW = 'sport_results_all'
+
+# Результаты старше стольких дней уходят в архив
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '730'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '5000'))
+
+# Колонки sport_results; при добавлении колонки в sport_results
+# её нужно добавить и сюда, и в архив (миграцией с create_view)
+ARCHIVE_COLUMNS = (
+    'id', 'athlete_id', 'competition_name', 'competition_date', 'discipline',
+    'result', 'place', 'is_personal_best', 'created_at', 'result_value', 'result_unit',
+)
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS sport_results_archive (
+    id INTEGER PRIMARY KEY,
+    athlete_id INTEGER NOT NULL,
+    competition_name TEXT,
+    competition_date DATE,
+    discipline TEXT,
+    result TEXT,
+    place INTEGER,
+    is_personal_best BOOLEAN DEFAULT 0,
+    created_at TIMESTAMP,
+    result_value REAL,
+    result_unit TEXT
+);
+"""
+
+CREATE_INDEXES = [
+    # История спортсмена и лента результатов с архивом
+    """CREATE INDEX IF NOT EXISTS idx_sport_results_archive_athlete_date
+       ON sport_results_archive (athlete_id, competition_date DESC, id DESC)""",
+    """CREATE INDEX IF NOT EXISTS idx_sport_results_archive_date
+       ON sport_results_archive (competition_date DESC, id DESC)""",
+]
+
+CREATE_RUNS_TABLE = """
+CREATE TABLE IF NOT EXISTS archive_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cutoff_date DATE NOT NULL,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    moved INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running',
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+"""
+
+def create_view(conn):
+    """Представление sport_results_all со списком колонок (пересоздаётся)"""
+    columns = ', '.join(ARCHIVE_COLUMNS)
+    conn.execute(f"DROP VIEW IF EXISTS {RESULTS_VIEW}")
+    conn.execute(f"""
+        CREATE VIEW {RESULTS_VIEW} AS
+        SELECT {columns} FROM sport_results
+        UNION ALL
+        SELECT {columns} FROM {ARCHIVE_TABLE}
+    """)
+
+def results_source(conn) -> str:
+    """
+    Откуда читать всю историю результатов: sport_results_all, если архив
+    уже создан (до его миграции - sport_results)
+    """
+    return RESULTS_VIEW if relation_exists(conn, RESULTS_VIEW) else 'sport_results'
+
+def result_tables(conn):
+    """Таблицы, в которых лежат результаты: горячая и, если есть, архив"""
+    if relation_exists(conn, ARCHIVE_TABLE):
+        return ('sport_results', ARCHIVE_TABLE)
+    return ('sport_results',)
+
+# ==================== ПЕРЕНОС ====================
+
+def cutoff_for(horizon_days=None, today=None) -> str:
+    """Порог даты: результаты строго раньше него уходят в архив"""
+    horizon_days = ARCHIVE_AFTER_DAYS if horizon_days is None else horizon_days
+    return ((today or date.today()) - timedelta(days=horizon_days)).isoformat()
+
+def current_run(conn):
+    """id незавершённого запуска или None"""
+    row = conn.execute(
+        "SELECT id FROM archive_runs WHERE status = 'running' ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    return row[0] if row else None
+
+def start_run(conn, cutoff) -> int:
+    """Новый запуск с порогом cutoff, возвращает его id"""
+    row = conn.execute(
+        "INSERT INTO archive_runs (cutoff_date) VALUES (?) RETURNING id", (str(cutoff),)
+    ).fetchone()
+    return row[0]
+
+# Кандидаты: старше порога, с датой и не действующий рекорд
+_CANDIDATES = """
+    FROM sport_results
+    WHERE id > ? AND id <= ? AND competition_date < ?
+      AND (is_personal_best IS NULL OR is_personal_best <> 1)
+"""
+
+def move_batch(conn, run_id, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Перенос следующей пачки запуска run_id (до batch_size строк) и запись
+    прогресса. Порог и последний id читаются из archive_runs в той же
+    транзакции, поэтому параллельный или прерванный запуск продолжает с
+    нужного места. Пачка задаётся диапазоном id: INSERT и DELETE идут
+    выражениями без списка параметров.
+
+    Набор строк фиксирует INSERT: DELETE удаляет из горячей таблицы только
+    скопированные id, а не заново вычисленных кандидатов. Иначе в
+    PostgreSQL (READ COMMITTED, писатели рекордов блокировку архива не
+    берут) снятый между выражениями флаг рекорда приводил бы к удалению
+    нескопированной строки. Строку, ставшую рекордом после копирования,
+    DELETE пропускает, а её копия убирается из архива.
+
+    Returns:
+        (перенесено строк, есть ли ещё кандидаты)
+    """
+    cutoff, last_id, status = conn.execute(
+        "SELECT cutoff_date, last_id, status FROM archive_runs WHERE id = ?", (run_id,)
+    ).fetchone()
+    if status != 'running':
+        return 0, False
+
+    upper = conn.execute(
+        """SELECT MAX(id) FROM (
+               SELECT id FROM sport_results
+               WHERE id > ? AND competition_date < ?
+                 AND (is_personal_best IS NULL OR is_personal_best <> 1)
+               ORDER BY id LIMIT ?
+           ) batch""",
+        (last_id, str(cutoff), int(batch_size))
+    ).fetchone()[0]
+    if upper is None:
+        finish_run(conn, run_id)
+        return 0, False
+
+    columns = ', '.join(ARCHIVE_COLUMNS)
+    conn.execute(
+        f"INSERT INTO {ARCHIVE_TABLE} ({columns}) SELECT {columns} {_CANDIDATES}",
+        (last_id, upper, str(cutoff))
+    )
+    moved = conn.execute(
+        f"""DELETE FROM sport_results
+            WHERE id IN (SELECT id FROM {ARCHIVE_TABLE} WHERE id > ? AND id <= ?)
+              AND (is_personal_best IS NULL OR is_personal_best <> 1)""",
+        (last_id, upper)
+    ).rowcount
+    # Копии строк, оставшихся в горячей таблице: без них представление
+    # вернуло бы такой результат дважды
+    conn.execute(
+        f"""DELETE FROM {ARCHIVE_TABLE}
+            WHERE id > ? AND id <= ?
+              AND id IN (SELECT id FROM sport_results WHERE id > ? AND id <= ?)""",
+        (last_id, upper, last_id, upper)
+    )
+    conn.execute(
+        "UPDATE archive_runs SET last_id = ?, moved = moved + ? WHERE id = ?",
+        (upper, moved, run_id)
+    )
+    return moved, True
+
+def finish_run(conn, run_id):
+    """Отметка о завершении запуска"""
+    conn.execute(
+        """UPDATE archive_runs SET status = 'done', finished_at = CURRENT_TIMESTAMP
+           WHERE id = ?""",
+        (run_id,)
+    )
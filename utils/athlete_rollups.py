@@ -0,0 +1,207 @@
+"""
+Помесячные и посезонные итоги спортсмена (athlete_monthly_stats, athlete_season_stats)
+
+Строка - спортсмен × период × дисциплина: число стартов, сумма и число
+мест (среднее место = place_sum / place_count), лучшее и худшее место,
+лучший числовой результат best_value (result_unit - единица дисциплины,
+best_score - тот же результат в виде "меньше - лучше"). Период - 'YYYY-MM'
+для месяцев и календарный год для сезонов, как в рейтингах. Результаты
+без даты в итоги не входят, результаты без дисциплины идут под discipline = ''.
+
+Итоги обновляются путём записи результатов: новая строка складывается
+с существующей одним UPSERT (счётчики - сложением, места и результат -
+минимумом/максимумом), пачка результатов сначала агрегируется в pandas.
+Удаление и правка результатов - через rebuild().
+
+Функции модуля принимают открытое соединение и работают внутри
+транзакции вызывающего кода.
+"""
+
+import pandas as pd
+
+from utils import archive
+from utils.db_backend import execute_batch
+from utils.leaderboards import season_of
+
+ROLLUP_TABLES = {
+    'month': 'athlete_monthly_stats',
+    'season': 'athlete_season_stats',
+}
+
+ROLLUP_COLUMNS = (
+    'athlete_id', 'period', 'discipline', 'competitions', 'place_count', 'place_sum',
+    'best_place', 'worst_place', 'best_score', 'best_value', 'result_unit',
+)
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    athlete_id INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    discipline TEXT NOT NULL DEFAULT '',
+    competitions INTEGER NOT NULL DEFAULT 0,
+    place_count INTEGER NOT NULL DEFAULT 0,
+    place_sum INTEGER NOT NULL DEFAULT 0,
+    best_place INTEGER,
+    worst_place INTEGER,
+    best_score REAL,
+    best_value REAL,
+    result_unit TEXT,
+    PRIMARY KEY (athlete_id, period, discipline)
+);
+"""
+
+CREATE_TABLES = [_CREATE_TABLE.format(table=table) for table in ROLLUP_TABLES.values()]
+
+# NULL в месте или результате не должен затирать известное значение
+_UPSERT = """
+INSERT INTO {table} ({columns})
+VALUES ({placeholders})
+ON CONFLICT (athlete_id, period, discipline) DO UPDATE SET
+    competitions = {table}.competitions + excluded.competitions,
+    place_count = {table}.place_count + excluded.place_count,
+    place_sum = {table}.place_sum + excluded.place_sum,
+    best_place = CASE
+        WHEN {table}.best_place IS NULL OR excluded.best_place < {table}.best_place
+        THEN COALESCE(excluded.best_place, {table}.best_place) ELSE {table}.best_place END,
+    worst_place = CASE
+        WHEN {table}.worst_place IS NULL OR excluded.worst_place > {table}.worst_place
+        THEN COALESCE(excluded.worst_place, {table}.worst_place) ELSE {table}.worst_place END,
+    best_value = CASE
+        WHEN {table}.best_score IS NULL OR excluded.best_score < {table}.best_score
+        THEN COALESCE(excluded.best_value, {table}.best_value) ELSE {table}.best_value END,
+    result_unit = COALESCE({table}.result_unit, excluded.result_unit),
+    best_score = CASE
+        WHEN {table}.best_score IS NULL OR excluded.best_score < {table}.best_score
+        THEN COALESCE(excluded.best_score, {table}.best_score) ELSE {table}.best_score END
+"""
+
+def _upsert_sql(table):
+    return _UPSERT.format(
+        table=table,
+        columns=', '.join(ROLLUP_COLUMNS),
+        placeholders=', '.join('?' * len(ROLLUP_COLUMNS))
+    )
+
+def month_of(competition_date):
+    """Месяц результата: '2024-03-01' -> '2024-03', None без даты"""
+    if competition_date is None or pd.isna(competition_date):
+        return None
+    return str(competition_date)[:7]
+
+_PERIODS = {'month': month_of, 'season': season_of}
+
+# ==================== ЗАПИСЬ РЕЗУЛЬТАТОВ ====================
+
+def record(conn, athlete_id, discipline, place, value, unit, competition_date,
+           lower_is_better=True):
+    """Учёт одного нового результата в итогах его месяца и сезона"""
+    if month_of(competition_date) is None:
+        return
+    score = None if value is None else (value if lower_is_better else -value)
+    has_place = place is not None
+    for granularity, table in ROLLUP_TABLES.items():
+        conn.execute(_upsert_sql(table), (
+            athlete_id, _PERIODS[granularity](competition_date), discipline or '',
+            1, int(has_place), place if has_place else 0, place, place,
+            score, value, unit if value is not None else None,
+        ))
+
+def record_bulk(conn, results: pd.DataFrame, directions: dict) -> int:
+    """
+    Учёт пачки новых результатов: пачка группируется в pandas по
+    (спортсмен, период, дисциплина), в БД уходит по одной строке на группу.
+
+    results - колонки athlete_id, discipline, place, result_value,
+    result_unit, competition_date; directions - дисциплина -> lower_is_better.
+
+    Returns:
+        Число записанных групп
+    """
+    frame = results[results['competition_date'].notna()]
+    if frame.empty:
+        return 0
+
+    lower = frame['discipline'].map(directions).fillna(1).astype(bool)
+    place = pd.to_numeric(frame['place'], errors='coerce')
+    frame = frame.assign(
+        discipline=frame['discipline'].fillna(''),
+        place=place,
+        has_place=place.notna().astype(int),
+        score=frame['result_value'].where(lower, -frame['result_value']),
+    )
+
+    written = 0
+    for granularity, table in ROLLUP_TABLES.items():
+        keyed = frame.assign(period=frame['competition_date'].map(_PERIODS[granularity]))
+        keys = ['athlete_id', 'period', 'discipline']
+        groups = keyed.groupby(keys, sort=False)
+        totals = groups.agg(
+            competitions=('athlete_id', 'size'),
+            place_count=('has_place', 'sum'),
+            place_sum=('place', 'sum'),
+            best_place=('place', 'min'),
+            worst_place=('place', 'max'),
+            best_score=('score', 'min'),
+        )
+        # Значение и единица лучшего результата группы
+        best = (
+            keyed.dropna(subset=['score'])
+            .sort_values('score')
+            .drop_duplicates(keys)
+            .set_index(keys)[['result_value', 'result_unit']]
+            .rename(columns={'result_value': 'best_value'})
+        )
+        totals = totals.join(best).reset_index()
+
+        def column(name, cast=None):
+            values = totals[name].astype(object).where(totals[name].notna(), None)
+            return [cast(v) if cast and v is not None else v for v in values]
+
+        rows = list(zip(
+            column('athlete_id', int), column('period'), column('discipline'),
+            column('competitions', int), column('place_count', int), column('place_sum', int),
+            column('best_place', int), column('worst_place', int),
+            column('best_score', float), column('best_value', float), column('result_unit'),
+        ))
+        execute_batch(conn, _upsert_sql(table), rows)
+        written += len(rows)
+    return written
+
+# ==================== ПОЛНЫЙ ПЕРЕСЧЁТ ====================
+
+_RECOMPUTE = """
+INSERT INTO {table} ({columns})
+SELECT athlete_id, period, discipline,
+       COUNT(*), COUNT(place), COALESCE(SUM(place), 0), MIN(place), MAX(place),
+       MIN(score),
+       CASE WHEN MAX(lower_is_better) = 1 THEN MIN(score) ELSE -MIN(score) END,
+       MAX(CASE WHEN score IS NOT NULL THEN result_unit END)
+FROM (
+    SELECT r.athlete_id, SUBSTR(CAST(r.competition_date AS TEXT), 1, {length}) AS period,
+           COALESCE(r.discipline, '') AS discipline, r.place, r.result_unit,
+           COALESCE(d.lower_is_better, 1) AS lower_is_better,
+           CASE WHEN COALESCE(d.lower_is_better, 1) = 1
+                THEN r.result_value ELSE -r.result_value END AS score
+    FROM {source} r
+    LEFT JOIN disciplines d ON d.name = r.discipline
+    WHERE r.competition_date IS NOT NULL
+) periods
+GROUP BY athlete_id, period, discipline
+"""
+
+_PERIOD_LENGTH = {'month': 7, 'season': 4}
+
+def rebuild(conn) -> int:
+    """
+    Полный пересчёт итогов по всем результатам, включая архив.
+
+    Returns:
+        Число строк помесячных итогов
+    """
+    for granularity, table in ROLLUP_TABLES.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(_RECOMPUTE.format(
+            table=table, columns=', '.join(ROLLUP_COLUMNS), length=_PERIOD_LENGTH[granularity],
+            source=archive.results_source(conn)
+        ))
+    return conn.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLES['month']}").fetchone()[0]
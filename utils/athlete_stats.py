@@ -0,0 +1,324 @@
+"""
+Материализованная статистика спортсменов (таблица athlete_stats)
+
+Одна строка на спортсмена: число стартов, личных рекордов, среднее,
+лучшее и последнее место, дата последнего старта. Таблицу поддерживают
+триггеры на sport_results, поэтому заголовок профиля и рейтинги читают
+готовую строку вместо агрегации по всем результатам.
+
+Функции модуля принимают открытое соединение и работают внутри
+транзакции вызывающего кода. Триггеры есть в двух вариантах: SQLite
+и PL/pgSQL для PostgreSQL, логика у них одинаковая.
+"""
+
+from utils import archive
+from utils.db_backend import POSTGRESQL, dialect_of
+
+STATS_COLUMNS = (
+    'athlete_id', 'total_competitions', 'personal_bests', 'place_count',
+    'place_sum', 'avg_place', 'best_place', 'last_place',
+    'last_competition_date', 'last_result_id',
+)
+
+# Колонки, по которым можно строить рейтинг (колонка -> порядок).
+# NULLS LAST совпадает с индексами в обоих диалектах
+LEADERBOARD_ORDER = {
+    'total_competitions': 'DESC NULLS LAST',
+    'personal_bests': 'DESC NULLS LAST',
+    'avg_place': 'ASC',
+    'best_place': 'ASC',
+}
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS athlete_stats (
+    athlete_id INTEGER PRIMARY KEY,
+    total_competitions INTEGER NOT NULL DEFAULT 0,
+    personal_bests INTEGER NOT NULL DEFAULT 0,
+    place_count INTEGER NOT NULL DEFAULT 0,
+    place_sum INTEGER NOT NULL DEFAULT 0,
+    avg_place REAL,
+    best_place INTEGER,
+    last_place INTEGER,
+    last_competition_date DATE,
+    last_result_id INTEGER,
+    FOREIGN KEY(athlete_id) REFERENCES athletes(id)
+);
+"""
+
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_athlete_stats_total ON athlete_stats (total_competitions DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_athlete_stats_pbs ON athlete_stats (personal_bests DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_athlete_stats_avg_place ON athlete_stats (avg_place)",
+    "CREATE INDEX IF NOT EXISTS idx_athlete_stats_best_place ON athlete_stats (best_place)",
+]
+
+# Полный пересчёт по {source} (вся история, с архивом); {where} ограничивает
+# набор спортсменов.
+# Последний старт - строка с максимальными (competition_date, id),
+# строки без даты считаются самыми старыми (как в ленте результатов).
+_RECOMPUTE = """
+INSERT INTO athlete_stats ({columns})
+SELECT a.athlete_id, a.total_competitions, a.personal_bests, a.place_count,
+       a.place_sum, a.avg_place, a.best_place,
+       l.place, l.competition_date, l.id
+FROM (
+    SELECT athlete_id,
+           COUNT(*) AS total_competitions,
+           COALESCE(SUM(CASE WHEN is_personal_best = 1 THEN 1 ELSE 0 END), 0) AS personal_bests,
+           COUNT(place) AS place_count,
+           COALESCE(SUM(place), 0) AS place_sum,
+           AVG(place) AS avg_place,
+           MIN(place) AS best_place
+    FROM {source} {where}
+    GROUP BY athlete_id
+) a
+JOIN (
+    SELECT athlete_id, id, place, competition_date,
+           ROW_NUMBER() OVER (
+               PARTITION BY athlete_id ORDER BY competition_date DESC NULLS LAST, id DESC
+           ) AS rn
+    FROM {source} {where}
+) l ON l.athlete_id = a.athlete_id AND l.rn = 1;
+"""
+
+def _recompute_sql(athlete_ref=None, source='sport_results'):
+    """Пересчёт для одного спортсмена (athlete_ref - выражение id) или для всех"""
+    where = f"WHERE athlete_id = {athlete_ref}" if athlete_ref else ""
+    return _RECOMPUTE.format(columns=', '.join(STATS_COLUMNS), where=where, source=source)
+
+# Вставка: инкрементальное обновление за O(1)
+TRIGGER_INSERT = """
+CREATE TRIGGER IF NOT EXISTS trg_athlete_stats_insert
+AFTER INSERT ON sport_results
+BEGIN
+    INSERT INTO athlete_stats ({columns})
+    VALUES (
+        NEW.athlete_id, 1, NEW.is_personal_best = 1, NEW.place IS NOT NULL,
+        COALESCE(NEW.place, 0), NEW.place, NEW.place, NEW.place,
+        NEW.competition_date, NEW.id
+    )
+    ON CONFLICT(athlete_id) DO UPDATE SET
+        total_competitions = total_competitions + 1,
+        personal_bests = personal_bests + excluded.personal_bests,
+        place_count = place_count + excluded.place_count,
+        place_sum = place_sum + excluded.place_sum,
+        avg_place = CASE
+            WHEN place_count + excluded.place_count > 0
+            THEN (place_sum + excluded.place_sum) * 1.0 / (place_count + excluded.place_count)
+        END,
+        best_place = MIN(COALESCE(best_place, excluded.best_place),
+                         COALESCE(excluded.best_place, best_place));
+
+    UPDATE athlete_stats
+    SET last_place = NEW.place,
+        last_competition_date = NEW.competition_date,
+        last_result_id = NEW.id
+    WHERE athlete_id = NEW.athlete_id
+      AND (
+          (NEW.competition_date IS NOT NULL AND (
+              last_competition_date IS NULL
+              OR NEW.competition_date > last_competition_date
+              OR (NEW.competition_date = last_competition_date AND NEW.id > last_result_id)))
+          OR (NEW.competition_date IS NULL AND last_competition_date IS NULL
+              AND NEW.id > last_result_id)
+      );
+END;
+""".format(columns=', '.join(STATS_COLUMNS))
+
+# Изменение и удаление: минимум/последний старт инкрементально не вычислить,
+# поэтому пересчитываем строку спортсмена (по индексу, только его результаты).
+# {recompute_old} / {recompute_new} подставляет create_triggers
+TRIGGER_UPDATE = """
+CREATE TRIGGER IF NOT EXISTS trg_athlete_stats_update
+AFTER UPDATE OF athlete_id, competition_date, is_personal_best, place ON sport_results
+WHEN NEW.athlete_id IS NOT OLD.athlete_id
+  OR NEW.competition_date IS NOT OLD.competition_date
+  OR NEW.place IS NOT OLD.place
+BEGIN
+    DELETE FROM athlete_stats WHERE athlete_id = OLD.athlete_id;
+    {recompute_old}
+END;
+"""
+
+TRIGGER_UPDATE_MOVED = """
+CREATE TRIGGER IF NOT EXISTS trg_athlete_stats_update_moved
+AFTER UPDATE OF athlete_id ON sport_results
+WHEN NEW.athlete_id IS NOT OLD.athlete_id
+BEGIN
+    DELETE FROM athlete_stats WHERE athlete_id = NEW.athlete_id;
+    {recompute_new}
+END;
+"""
+
+# Смена только флага личного рекорда (перенос рекорда на новый результат) -
+# за O(1), без пересчёта. Условие взаимоисключающее с TRIGGER_UPDATE
+TRIGGER_UPDATE_PB = """
+CREATE TRIGGER IF NOT EXISTS trg_athlete_stats_update_pb
+AFTER UPDATE OF is_personal_best ON sport_results
+WHEN NEW.athlete_id IS OLD.athlete_id
+ AND NEW.competition_date IS OLD.competition_date
+ AND NEW.place IS OLD.place
+ AND (NEW.is_personal_best = 1) IS NOT (OLD.is_personal_best = 1)
+BEGIN
+    UPDATE athlete_stats
+    SET personal_bests = personal_bests + CASE WHEN NEW.is_personal_best = 1 THEN 1 ELSE -1 END
+    WHERE athlete_id = NEW.athlete_id;
+END;
+"""
+
+# {delete_when}: перенос в архив - не удаление, история спортсмена не меняется
+TRIGGER_DELETE = """
+CREATE TRIGGER IF NOT EXISTS trg_athlete_stats_delete
+AFTER DELETE ON sport_results
+{delete_when}
+BEGIN
+    DELETE FROM athlete_stats WHERE athlete_id = OLD.athlete_id;
+    {recompute_old}
+END;
+"""
+
+_MOVED_TO_ARCHIVE = f"EXISTS (SELECT 1 FROM {archive.ARCHIVE_TABLE} WHERE id = OLD.id)"
+
+TRIGGERS = [TRIGGER_INSERT, TRIGGER_UPDATE, TRIGGER_UPDATE_PB, TRIGGER_UPDATE_MOVED, TRIGGER_DELETE]
+TRIGGER_NAMES = [
+    'trg_athlete_stats_insert', 'trg_athlete_stats_update', 'trg_athlete_stats_update_pb',
+    'trg_athlete_stats_update_moved', 'trg_athlete_stats_delete',
+]
+
+# PostgreSQL: те же правила на PL/pgSQL (триггер вызывает функцию)
+PG_FUNCTION_RECOMPUTE = """
+CREATE OR REPLACE FUNCTION athlete_stats_recompute(p_athlete_id INTEGER) RETURNS void AS $$
+BEGIN
+    DELETE FROM athlete_stats WHERE athlete_id = p_athlete_id;
+    {recompute}
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+PG_FUNCTION_INSERT = """
+CREATE OR REPLACE FUNCTION athlete_stats_on_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO athlete_stats AS s ({columns})
+    VALUES (
+        NEW.athlete_id, 1, COALESCE((NEW.is_personal_best = 1)::int, 0),
+        (NEW.place IS NOT NULL)::int, COALESCE(NEW.place, 0),
+        NEW.place, NEW.place, NEW.place, NEW.competition_date, NEW.id
+    )
+    ON CONFLICT (athlete_id) DO UPDATE SET
+        total_competitions = s.total_competitions + 1,
+        personal_bests = s.personal_bests + excluded.personal_bests,
+        place_count = s.place_count + excluded.place_count,
+        place_sum = s.place_sum + excluded.place_sum,
+        avg_place = CASE
+            WHEN s.place_count + excluded.place_count > 0
+            THEN (s.place_sum + excluded.place_sum)::float / (s.place_count + excluded.place_count)
+        END,
+        best_place = LEAST(s.best_place, excluded.best_place);
+
+    UPDATE athlete_stats
+    SET last_place = NEW.place,
+        last_competition_date = NEW.competition_date,
+        last_result_id = NEW.id
+    WHERE athlete_id = NEW.athlete_id
+      AND (
+          (NEW.competition_date IS NOT NULL AND (
+              last_competition_date IS NULL
+              OR NEW.competition_date > last_competition_date
+              OR (NEW.competition_date = last_competition_date AND NEW.id > last_result_id)))
+          OR (NEW.competition_date IS NULL AND last_competition_date IS NULL
+              AND NEW.id > last_result_id)
+      );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+""".format(columns=', '.join(STATS_COLUMNS))
+
+PG_FUNCTION_CHANGE = """
+CREATE OR REPLACE FUNCTION athlete_stats_on_change() RETURNS trigger AS $$
+BEGIN
+    {skip_moved}
+    IF TG_OP = 'UPDATE'
+       AND NEW.athlete_id IS NOT DISTINCT FROM OLD.athlete_id
+       AND NEW.competition_date IS NOT DISTINCT FROM OLD.competition_date
+       AND NEW.place IS NOT DISTINCT FROM OLD.place THEN
+        -- Сменился только флаг личного рекорда: O(1) без пересчёта
+        IF (NEW.is_personal_best = 1) IS DISTINCT FROM (OLD.is_personal_best = 1) THEN
+            UPDATE athlete_stats
+            SET personal_bests = personal_bests
+                + CASE WHEN NEW.is_personal_best = 1 THEN 1 ELSE -1 END
+            WHERE athlete_id = NEW.athlete_id;
+        END IF;
+        RETURN NULL;
+    END IF;
+    PERFORM athlete_stats_recompute(OLD.athlete_id);
+    IF TG_OP = 'UPDATE' AND NEW.athlete_id IS DISTINCT FROM OLD.athlete_id THEN
+        PERFORM athlete_stats_recompute(NEW.athlete_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+PG_TRIGGERS = [
+    PG_FUNCTION_RECOMPUTE,
+    PG_FUNCTION_INSERT,
+    PG_FUNCTION_CHANGE,
+    "DROP TRIGGER IF EXISTS trg_athlete_stats_insert ON sport_results",
+    """CREATE TRIGGER trg_athlete_stats_insert
+       AFTER INSERT ON sport_results
+       FOR EACH ROW EXECUTE FUNCTION athlete_stats_on_insert()""",
+    "DROP TRIGGER IF EXISTS trg_athlete_stats_update ON sport_results",
+    """CREATE TRIGGER trg_athlete_stats_update
+       AFTER UPDATE OF athlete_id, competition_date, is_personal_best, place ON sport_results
+       FOR EACH ROW EXECUTE FUNCTION athlete_stats_on_change()""",
+    "DROP TRIGGER IF EXISTS trg_athlete_stats_delete ON sport_results",
+    """CREATE TRIGGER trg_athlete_stats_delete
+       AFTER DELETE ON sport_results
+       FOR EACH ROW EXECUTE FUNCTION athlete_stats_on_change()""",
+]
+
+def create_triggers(conn):
+    """
+    Триггеры поддержки athlete_stats для диалекта соединения. Пересчёт
+    читает всю историю: после создания архива - sport_results_all
+    """
+    source = archive.results_source(conn)
+    archived = source != 'sport_results'
+    parts = {
+        'recompute_old': _recompute_sql('OLD.athlete_id', source),
+        'recompute_new': _recompute_sql('NEW.athlete_id', source),
+        'recompute': _recompute_sql('p_athlete_id', source),
+        'delete_when': f"WHEN NOT {_MOVED_TO_ARCHIVE}" if archived else "",
+        'skip_moved': (
+            f"IF TG_OP = 'DELETE' AND {_MOVED_TO_ARCHIVE} THEN RETURN NULL; END IF;"
+            if archived else ""
+        ),
+    }
+    for statement in (PG_TRIGGERS if dialect_of(conn) == POSTGRESQL else TRIGGERS):
+        conn.execute(statement.format(**parts))
+
+def recreate_triggers(conn):
+    """Пересоздание триггеров после изменения их определений"""
+    if dialect_of(conn) != POSTGRESQL:
+        # В PostgreSQL PG_TRIGGERS сами заменяют функции и триггеры
+        for name in TRIGGER_NAMES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    create_triggers(conn)
+
+def refresh(conn, athlete_ids):
+    """Пересчёт строк athlete_stats отдельных спортсменов (по всей истории)"""
+    query = _recompute_sql('?', archive.results_source(conn))
+    for athlete_id in athlete_ids:
+        conn.execute("DELETE FROM athlete_stats WHERE athlete_id = ?", (athlete_id,))
+        conn.execute(query, (athlete_id, athlete_id))
+
+def rebuild(conn) -> int:
+    """
+    Полное перестроение athlete_stats по всем результатам (с архивом).
+
+    Returns:
+        Число спортсменов со статистикой
+    """
+    conn.execute("DELETE FROM athlete_stats")
+    conn.execute(_recompute_sql(source=archive.results_source(conn)))
+    return conn.execute("SELECT COUNT(*) FROM athlete_stats").fetchone()[0]
@@ -0,0 +1,271 @@
+"""
+Журнал действий с данными (таблица audit_logs)
+
+Слой доступа к данным не пишет событие в БД сам: он кладёт готовую
+строку в ограниченную очередь в памяти и сразу возвращается. Фоновый
+поток AuditWriter забирает события пачками (до AUDIT_BATCH_SIZE, ожидая
+добора пачки не дольше AUDIT_FLUSH_INTERVAL секунд) и пишет каждую пачку
+одной транзакцией через executemany. Время события фиксируется при
+постановке в очередь, а не при записи.
+
+Противодавление: если писатель не успевает и очередь заполнена, события
+чтения (READ) отбрасываются сразу, а события изменения ждут места до
+AUDIT_ENQUEUE_TIMEOUT секунд, тормозя пишущий поток, и только потом
+отбрасываются. Отброшенные и не записанные события видны в stats().
+При завершении процесса (atexit) очередь дописывается до конца.
+
+Модуль не знает, как открыть соединение: функцию записи пачки передаёт
+utils/database.py, которая отвечает за транзакции и кэш.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '500'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))  # секунд
+AUDIT_ENQUEUE_TIMEOUT = 2.0  # сколько секунд событие изменения ждёт места в очереди
+AUDIT_WRITE_RETRIES = 3
+AUDIT_SHUTDOWN_TIMEOUT = 10.0  # сколько секунд atexit ждёт дозаписи очереди
+
+CREATE, READ, UPDATE, DELETE = 'CREATE', 'READ', 'UPDATE', 'DELETE'
+ACTIONS = (CREATE, READ, UPDATE, DELETE)
+
+# Колонки как в database/models.py (AuditLog) плюс логин: у демо-пользователей
+# нет строки в users, и user_id для них пустой
+AUDIT_COLUMNS = (
+    'user_id', 'username', 'action', 'table_name', 'record_id', 'changes',
+    'ip_address', 'timestamp',
+)
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS audit_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER REFERENCES users(id),
+    username TEXT,
+    action TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    record_id INTEGER,
+    changes TEXT,
+    ip_address TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Просмотр журнала - новые первыми (по id) с фильтром по одной из колонок
+CREATE_INDEXES = [
+    """CREATE INDEX IF NOT EXISTS idx_audit_logs_username
+       ON audit_logs (username, id DESC)""",
+    """CREATE INDEX IF NOT EXISTS idx_audit_logs_table_record
+       ON audit_logs (table_name, record_id, id DESC)""",
+    """CREATE INDEX IF NOT EXISTS idx_audit_logs_action
+       ON audit_logs (action, id DESC)""",
+    """CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp
+       ON audit_logs (timestamp)""",
+]
+
+INSERT = (
+    f"INSERT INTO audit_logs ({', '.join(AUDIT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(AUDIT_COLUMNS))})"
+)
+
+_logger = logging.getLogger('olympic_reserve.audit')
+
+def make_row(action, table_name, record_id=None, changes=None,
+             user_id=None, username=None, ip_address=None) -> tuple:
+    """Строка audit_logs в порядке AUDIT_COLUMNS; changes - словарь, хранится как JSON"""
+    return (
+        user_id, username, action, table_name,
+        None if record_id is None else int(record_id),
+        None if changes is None else json.dumps(changes, ensure_ascii=False, default=str),
+        ip_address,
+        datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+    )
+
+# ==================== ФОНОВЫЙ ПИСАТЕЛЬ ====================
+
+# Служебные метки в очереди: дописать текущую пачку / завершить поток
+_FLUSH = object()
+_STOP = object()
+
+class AuditWriter:
+    """
+    Очередь событий и поток, который пишет их пачками.
+
+    write_batch(rows) записывает список строк одной транзакцией.
+    Поток запускается при первом событии; atexit дописывает очередь.
+    """
+
+    def __init__(self, write_batch, max_size=AUDIT_QUEUE_SIZE, batch_size=AUDIT_BATCH_SIZE,
+                 flush_interval=AUDIT_FLUSH_INTERVAL, enqueue_timeout=AUDIT_ENQUEUE_TIMEOUT):
+        self._write_batch = write_batch
+        self._queue = queue.Queue(maxsize=max_size)
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._thread = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        # Событий в очереди и в записываемой пачке; flush() ждёт нуля
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+        self._max_depth = 0
+
+    def start(self):
+        """Запуск потока записи (повторный вызов ничего не делает)"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is None:
+                    atexit.register(self.close)
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-writer', daemon=True
+                )
+                self._thread.start()
+
+    def enqueue(self, row, block=True) -> bool:
+        """
+        Постановка события в очередь. block=False - при полной очереди
+        событие сразу отбрасывается, иначе ждёт места enqueue_timeout секунд.
+
+        Returns:
+            False, если событие отброшено
+        """
+        if self._closed:
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+
+        with self._cond:
+            self._pending += 1
+            self._enqueued += 1
+        try:
+            self._queue.put(row, block=block, timeout=self.enqueue_timeout if block else None)
+        except queue.Full:
+            with self._cond:
+                self._pending -= 1
+                self._dropped += 1
+                dropped = self._dropped
+                self._cond.notify_all()
+            # Не засоряем лог: первое отброшенное событие и далее каждое тысячное
+            if dropped % 1000 == 1:
+                _logger.warning("audit queue is full, %d events dropped so far", dropped)
+            return False
+
+        depth = self._queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+        return True
+
+    def flush(self, timeout=AUDIT_SHUTDOWN_TIMEOUT) -> bool:
+        """
+        Дописать всё, что уже в очереди, не дожидаясь добора пачки.
+
+        Returns:
+            True, если очередь записана за timeout секунд
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._pending == 0
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass  # очередь полна - писатель и так не ждёт добора пачки
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=AUDIT_SHUTDOWN_TIMEOUT):
+        """Остановка: новые события не принимаются, очередь дописывается"""
+        self._closed = True
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        # Метка остановки встаёт за всеми событиями, поэтому ждём места
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            _logger.error("audit writer did not drain the queue, %d events lost", self._pending)
+            return
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        """Счётчики очереди и записи"""
+        with self._cond:
+            return {
+                'queued': self._queue.qsize(),
+                'max_size': self.max_size,
+                'max_depth': self._max_depth,
+                'pending': self._pending,
+                'enqueued': self._enqueued,
+                'written': self._written,
+                'dropped': self._dropped,
+                'failed': self._failed,
+                'batches': self._batches,
+                'running': self._thread is not None and self._thread.is_alive(),
+            }
+
+    def _collect(self):
+        """
+        Следующая пачка: ждёт первое событие, затем добирает до batch_size
+        не дольше flush_interval.
+
+        Returns:
+            (список строк, пора ли завершать поток)
+        """
+        batch = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP:
+                # Всё, что стоит перед меткой, уже в пачке; после неё ничего нет
+                return batch, True
+            if item is _FLUSH:
+                return batch, False
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+
+    def _write(self, batch):
+        """Запись пачки с повторами (например, если БД занята другим писателем)"""
+        written = False
+        for attempt in range(1, AUDIT_WRITE_RETRIES + 1):
+            try:
+                self._write_batch(batch)
+                written = True
+                break
+            except Exception:
+                if attempt == AUDIT_WRITE_RETRIES:
+                    _logger.exception("audit batch of %d events was not written", len(batch))
+                else:
+                    time.sleep(0.5 * attempt)
+        with self._cond:
+            self._pending -= len(batch)
+            if written:
+                self._written += len(batch)
+                self._batches += 1
+            else:
+                self._failed += len(batch)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
@@ -4,9 +4,10 @@
 """
 
 import streamlit as st
-import pandas as pd
 import bcrypt
-from utils.database import get_db_connection
+from utils.database import (
+    get_user_by_username, fetch_one, fetch_scalar, execute_insert, execute_update
+)
 
 # Константы по умолчанию
 DEFAULT_USERS = {
@@ -71,31 +72,24 @@ def authenticate_user(username: str, password: str) -> bool:
     Returns:
         True если аутентификация успешна, иначе False
     """
-    try:
-        conn = get_db_connection()
-        
-        # Попытка получить пользователя из БД
-        query = "SELECT username, password_hash, role, sport_id FROM users WHERE username = %s"
-        result = pd.read_sql(query, conn, params=(username,))
-        conn.close()
-        
-        if not result.empty:
-            user_record = result.iloc[0]
-            # Проверяем пароль
-            if verify_password(password, user_record['password_hash']):
-                # Сохраняем данные пользователя в session
-                st.session_state.user = {
-                    'username': user_record['username'],
-                    'role': user_record['role'],
-                    'sport_id': user_record['sport_id'],
-                    'authenticated': True
-                }
-                return True
-    except Exception:
-        # Если ошибка БД, используем тестовые учетные данные
-        pass
+    # Пользователь из БД (ошибка запроса показывается слоем данных)
+    user_record = get_user_by_username(username)
     
-    # Проверяем в тестовых учетных данных
+    if user_record is not None:
+        # Проверяем пароль
+        if verify_password(password, user_record['password_hash']):
+            # Сохраняем данные пользователя в session
+            st.session_state.user = {
+                'id': user_record['id'],
+                'username': user_record['username'],
+                'role': user_record['role'],
+                'sport_id': user_record.get('sport_id'),
+                'authenticated': True
+            }
+            return True
+        return False
+    
+    # Пользователя нет в БД - проверяем тестовые учетные данные
     if username in DEFAULT_USERS:
         user_data = DEFAULT_USERS[username]
         if user_data['password'] == password:  # В демо просто сравниваем
@@ -232,18 +226,7 @@ def get_user_by_id(user_id: int) -> dict:
     Returns:
         Словарь с данными пользователя
     """
-    try:
-        conn = get_db_connection()
-        query = "SELECT * FROM users WHERE id = %s"
-        result = pd.read_sql(query, conn, params=(user_id,))
-        conn.close()
-        
-        if not result.empty:
-            return result.iloc[0].to_dict()
-    except Exception as e:
-        st.error(f"Ошибка получения пользователя: {e}")
-    
-    return None
+    return fetch_one("SELECT * FROM users WHERE id = ?", [user_id], row_type='dict')
 
 def register_user(username: str, password: str, role: str = 'athlete', sport_id: int = None) -> bool:
     """
@@ -258,38 +241,27 @@ def register_user(username: str, password: str, role: str = 'athlete', sport_id:
     Returns:
         True если регистрация успешна
     """
-    try:
-        conn = get_db_connection()
-        
-        # Проверяем что пользователя нет
-        check_query = "SELECT id FROM users WHERE username = %s"
-        exists = pd.read_sql(check_query, conn, params=(username,))
-        
-        if not exists.empty:
-            st.error(f"Пользователь {username} уже существует")
-            return False
-        
-        # Хэшируем пароль
-        password_hash = hash_password(password)
-        
-        # Вставляем пользователя
-        insert_query = """
-        INSERT INTO users (username, password_hash, role, sport_id)
-        VALUES (%s, %s, %s, %s)
-        """
-        
-        cursor = conn.cursor()
-        cursor.execute(insert_query, (username, password_hash, role, sport_id))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        st.success(f"✅ Пользователь {username} успешно зарегистрирован")
-        return True
+    # Проверяем что пользователя нет
+    exists = fetch_scalar("SELECT COUNT(*) FROM users WHERE username = ?", [username], default=0)
     
-    except Exception as e:
-        st.error(f"Ошибка регистрации: {e}")
+    if exists:
+        st.error(f"Пользователь {username} уже существует")
         return False
+    
+    # Хэшируем пароль
+    password_hash = hash_password(password)
+    
+    # Вставляем пользователя
+    insert_query = """
+    INSERT INTO users (username, password_hash, role, sport_id)
+    VALUES (?, ?, ?, ?)
+    """
+    
+    if execute_insert(insert_query, (username, password_hash, role, sport_id)) is None:
+        return False
+    
+    st.success(f"✅ Пользователь {username} успешно зарегистрирован")
+    return True
 
 def update_password(username: str, old_password: str, new_password: str) -> bool:
     """
@@ -303,31 +275,21 @@ def update_password(username: str, old_password: str, new_password: str) -> bool
     Returns:
         True если пароль обновлен успешно
     """
-    try:
-        # Сначала проверяем старый пароль
-        if not authenticate_user(username, old_password):
-            st.error("❌ Неверный текущий пароль")
-            return False
-        
-        conn = get_db_connection()
-        
-        # Хэшируем новый пароль
-        new_hash = hash_password(new_password)
-        
-        # Обновляем пароль
-        update_query = "UPDATE users SET password_hash = %s WHERE username = %s"
-        cursor = conn.cursor()
-        cursor.execute(update_query, (new_hash, username))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        st.success("✅ Пароль успешно обновлен")
-        return True
+    # Сначала проверяем старый пароль
+    if not authenticate_user(username, old_password):
+        st.error("❌ Неверный текущий пароль")
+        return False
     
-    except Exception as e:
-        st.error(f"Ошибка обновления пароля: {e}")
+    # Хэшируем новый пароль
+    new_hash = hash_password(new_password)
+    
+    # Обновляем пароль
+    update_query = "UPDATE users SET password_hash = ? WHERE username = ?"
+    if not execute_update(update_query, (new_hash, username)):
         return False
+    
+    st.success("✅ Пароль успешно обновлен")
+    return True
 
 def init_session_state():
     """
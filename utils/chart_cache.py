@@ -0,0 +1,216 @@
+"""
+Кэш отрисованных графиков matplotlib
+
+График описывается функцией рисования draw(ax, data, **params), данными
+и параметрами. Отпечаток графика - SHA-1 от имени функции, содержимого
+данных (pd.util.hash_pandas_object для DataFrame/Series), параметров,
+размера, формата и dpi. Готовое изображение (байты PNG или текст SVG)
+хранится в общем для процесса LRU с ограничением по числу записей и по
+байтам; повторный показ тех же данных не вызывает matplotlib вовсе.
+
+Фигура создаётся напрямую (matplotlib.figure.Figure), а не через pyplot:
+она не попадает в глобальный реестр фигур pyplot, поэтому не копится
+между rerun, и её безопасно рисовать в потоках сессий Streamlit. После
+сохранения фигура очищается.
+
+matplotlib и seaborn импортируются при первой отрисовке, а не при импорте
+модуля: страница входа и страницы без графиков их не загружают. Тогда же
+применяется тема графиков (whitegrid, палитра husl).
+
+draw должна зависеть только от data и params (не от замыканий и
+глобальных переменных) - иначе одинаковый отпечаток даст старую картинку.
+
+Chart - описание графика без отрисовки. Страница строит список Chart
+одной функцией и для показа (show_chart_spec), и для фоновой предзагрузки
+(warm_charts), поэтому предзагруженная картинка совпадает по отпечатку.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+CHART_CACHE_MAX_ENTRIES = int(os.getenv('CHART_CACHE_MAX_ENTRIES', '256'))
+CHART_CACHE_MAX_BYTES = int(os.getenv('CHART_CACHE_MAX_MB', '64')) * 1024 * 1024
+# Как у st.pyplot по умолчанию, чтобы графики выглядели как раньше
+CHART_DPI = 200
+CHART_FORMATS = ('png', 'svg')
+
+# ==================== ОТПЕЧАТОК ====================
+
+def _update(digest, value):
+    """Добавление значения в хэш: данные - по содержимому, остальное - по repr"""
+    if isinstance(value, pd.DataFrame):
+        digest.update(b'frame')
+        digest.update(repr((list(value.columns), [str(t) for t in value.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(b'series')
+        digest.update(repr((value.name, str(value.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(b'array')
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b'dict')
+        for key in sorted(value, key=repr):
+            _update(digest, key)
+            _update(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'list' if isinstance(value, list) else b'tuple')
+        digest.update(str(len(value)).encode())
+        for item in value:
+            _update(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+def fingerprint(draw, data, params, figsize, fmt, dpi) -> str:
+    """Отпечаток графика: функция рисования, данные и все параметры вывода"""
+    digest = hashlib.sha1()
+    _update(digest, (draw.__module__, draw.__qualname__, tuple(figsize), fmt, dpi))
+    _update(digest, data)
+    _update(digest, params)
+    return digest.hexdigest()
+
+# ==================== КЭШ ИЗОБРАЖЕНИЙ ====================
+
+class ChartCache:
+    """LRU готовых изображений с ограничением по числу записей и по байтам"""
+
+    def __init__(self, max_entries=CHART_CACHE_MAX_ENTRIES, max_bytes=CHART_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # отпечаток -> (изображение, размер)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._render_ms = 0.0
+
+    def get(self, key):
+        """Изображение из кэша или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, image, render_ms):
+        nbytes = len(image)
+        with self._lock:
+            self._render_ms += render_ms
+            if nbytes > self.max_bytes:
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (image, nbytes)
+            self._bytes += nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Счётчики попаданий, промахов, вытеснений и время отрисовки"""
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'render_ms': round(self._render_ms, 1),
+            }
+
+_chart_cache = ChartCache()
+
+def get_chart_cache_stats():
+    return _chart_cache.stats()
+
+def clear_chart_cache():
+    _chart_cache.clear()
+
+# ==================== ОТРИСОВКА ====================
+
+_figure_class = None
+_figure_class_lock = threading.Lock()
+
+def _get_figure_class():
+    """matplotlib.figure.Figure; первый вызов импортирует matplotlib и задаёт тему"""
+    global _figure_class
+    if _figure_class is None:
+        with _figure_class_lock:
+            if _figure_class is None:
+                import seaborn as sns
+                from matplotlib.figure import Figure
+                sns.set_theme(style="whitegrid")
+                sns.set_palette("husl")
+                _figure_class = Figure
+    return _figure_class
+
+def _render(draw, data, params, figsize, fmt, dpi):
+    fig = _get_figure_class()(figsize=figsize)
+    try:
+        ax = fig.subplots()
+        draw(ax, data, **params)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight')
+    finally:
+        fig.clear()
+    image = buffer.getvalue()
+    # st.image принимает SVG строкой
+    return image.decode('utf-8') if fmt == 'svg' else image
+
+def render_chart(draw, data, figsize=(8, 6), fmt='png', dpi=CHART_DPI, **params):
+    """
+    Изображение графика: из кэша или новая отрисовка.
+
+    Returns:
+        bytes для PNG, str для SVG
+    """
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Неизвестный формат графика: {fmt}")
+    key = fingerprint(draw, data, params, figsize, fmt, dpi)
+    image = _chart_cache.get(key)
+    if image is None:
+        start = time.perf_counter()
+        image = _render(draw, data, params, figsize, fmt, dpi)
+        _chart_cache.put(key, image, (time.perf_counter() - start) * 1000)
+    return image
+
+def show_chart(draw, data, figsize=(8, 6), fmt='png', dpi=CHART_DPI, **params):
+    """Показ графика вместо st.pyplot: на повторных rerun - готовая картинка"""
+    st.image(render_chart(draw, data, figsize, fmt, dpi, **params), width="stretch")
+
+# ==================== ОПИСАНИЯ ГРАФИКОВ ====================
+
+Chart = namedtuple('Chart', ['draw', 'data', 'figsize', 'params'])
+
+def chart(draw, data, figsize=(8, 6), **params) -> Chart:
+    """Описание графика: те же аргументы, что у show_chart"""
+    return Chart(draw, data, tuple(figsize), params)
+
+def show_chart_spec(spec: Chart):
+    show_chart(spec.draw, spec.data, spec.figsize, **spec.params)
+
+def warm_charts(specs):
+    """Отрисовка графиков в кэш без показа (предзагрузка в фоновом потоке)"""
+    for spec in specs:
+        render_chart(spec.draw, spec.data, spec.figsize, **spec.params)
@@ -9,248 +9,777 @@
 ✅ Быстрее чем Supabase
 ✅ Все работает локально
 ✅ Исправлены проблемы с threading
+✅ Пул соединений: одно соединение на поток, переиспользуется между rerun
+✅ PostgreSQL через DATABASE_URL=postgresql://... (см. utils/db_backend.py)
 """
 
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from functools import lru_cache
+
 import streamlit as st
 import pandas as pd
 import sqlite3
 from pathlib import Path
 import bcrypt
 
-# Путь к БД (в папке проекта)
-DB_PATH = Path('olympic_reserve.db')
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # старые версии Streamlit
+    add_script_run_ctx = get_script_run_ctx = None
+
+from utils import (
+    archive, athlete_rollups, athlete_stats, audit, leaderboards, personal_bests,
+    reference_data, result_values
+)
+from utils.db_backend import (
+    POSTGRESQL, PgConnectionPool, parse_database_url, adapt_ddl,
+    begin_write, execute_batch, insert_returning_id, insert_many, connect_postgres
+)
+from utils.migrations import run_migrations, schema_is_current
+from utils.query_stats import track_query
+
+# Бэкенд БД: без DATABASE_URL - локальный файл SQLite в папке проекта
+DATABASE_URL = os.getenv('DATABASE_URL', '')
+DB_DIALECT, _DB_TARGET = parse_database_url(DATABASE_URL)
+DB_PATH = Path(_DB_TARGET or 'olympic_reserve.db') if DB_DIALECT != POSTGRESQL else None
+
+# Настройки пула соединений
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = 30.0  # сколько секунд поток ждёт свободное соединение
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256  # подготовленных выражений на соединение
+BULK_CHUNK_SIZE = 5000  # строк в одной транзакции массовой вставки
+
+# Настройки кэша результатов запросов
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '512'))
+QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_MB', '64')) * 1024 * 1024
+
+# Потоки для параллельной загрузки данных профиля
+PROFILE_LOADER_WORKERS = int(os.getenv('PROFILE_LOADER_WORKERS', '6'))
+
+# Журнал действий (utils/audit.py): изменения данных пишутся по умолчанию
+# (AUDIT_ENABLED=0 - выключить), чтения - только при AUDIT_READS=1: профиль
+# спортсмена даёт несколько событий READ на каждый показ
+AUDIT_ENABLED = os.getenv('AUDIT_ENABLED', '1') == '1'
+AUDIT_READS = os.getenv('AUDIT_READS', '0') == '1'
+
+# Таблицы, которые триггеры меняют вместе с базовой таблицей
+TABLE_DEPENDENCIES = {
+    'sport_results': (
+        'athlete_stats', 'personal_bests', 'leaderboard_entries',
+        *athlete_rollups.ROLLUP_TABLES.values(), archive.RESULTS_VIEW,
+    ),
+    archive.ARCHIVE_TABLE: (archive.RESULTS_VIEW,),
+}
+
+# PRAGMA, применяемые один раз при открытии каждого соединения
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),            # читатели не блокируют писателя
+    ('busy_timeout', BUSY_TIMEOUT_MS),  # ждать блокировку, а не падать сразу
+    ('synchronous', 'NORMAL'),          # в режиме WAL безопасно и быстрее FULL
+    ('mmap_size', 268435456),           # 256 МБ файла читаются через mmap
+    ('cache_size', -65536),             # 64 МБ страничного кэша на соединение
+)
+
+# ==================== ПУЛ СОЕДИНЕНИЙ ====================
+
+def _open_connection(db_path):
+    """Открывает и настраивает новое соединение SQLite"""
+    conn = sqlite3.connect(
+        str(db_path),
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.row_factory = sqlite3.Row
+    for name, value in SQLITE_PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+class ConnectionPool:
+    """
+    Ограниченный пул соединений SQLite, общий для всех сессий Streamlit.
+
+    Поток получает соединение в монопольное пользование: повторный захват
+    из того же потока (вложенные вызовы) возвращает то же соединение.
+    После освобождения соединение не закрывается, а возвращается в пул
+    и достаётся следующему потоку. Если открыто max_size соединений
+    и все заняты, поток ждёт освобождения не дольше timeout секунд.
+    """
+
+    def __init__(self, db_path, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = str(db_path)
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+
+    def acquire(self):
+        """Захват соединения текущим потоком"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        conn = None
+        with self._cond:
+            if not self._idle and self._open >= self.max_size:
+                self._waits += 1
+                deadline = time.monotonic() + self.timeout
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            f"Нет свободных соединений с БД за {self.timeout} с "
+                            f"(открыто {self._open})"
+                        )
+                    self._cond.wait(remaining)
+
+            if self._idle:
+                conn = self._idle.pop()
+                self._hits += 1
+            else:
+                # Резервируем место под новое соединение, открываем вне блокировки
+                self._open += 1
+                self._misses += 1
+
+        if conn is None:
+            try:
+                conn = _open_connection(self.db_path)
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """Возврат соединения в пул (с учётом вложенных захватов)"""
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Соединение испорчено - закрываем и освобождаем место в пуле
+            conn.close()
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер: захват и гарантированный возврат соединения"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Статистика пула: попадания, ожидания, число открытых соединений"""
+        with self._cond:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'waits': self._waits,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'max_size': self.max_size,
+            }
+
+    def close_all(self):
+        """Закрывает простаивающие соединения (занятые вернутся в пул позже)"""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+            self._cond.notify_all()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Пул соединений процесса (создаётся при первом обращении)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if DB_DIALECT == POSTGRESQL:
+                    _pool = PgConnectionPool(_DB_TARGET, POOL_MAX_SIZE, POOL_TIMEOUT)
+                else:
+                    _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+def db_connection():
+    """Соединение из пула: with db_connection() as conn: ..."""
+    return get_pool().connection()
+
+def get_pool_stats():
+    """Статистика пула соединений"""
+    return get_pool().stats()
 
 def get_db_connection():
-    """Получение подключения к SQLite (БЕЗ кэширования!)"""
+    """
+    Отдельное соединение вне пула (вызывающий код сам закрывает его).
+    Внутри модуля используйте db_connection().
+    """
     try:
-        # ВАЖНО: Не используем @st.cache_resource для sqlite3
-        # так как это вызывает проблемы с threading
-        conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        return conn
+        if DB_DIALECT == POSTGRESQL:
+            return connect_postgres(_DB_TARGET)
+        return _open_connection(DB_PATH)
     except Exception as e:
         st.error(f"❌ Ошибка подключения к БД: {e}")
         return None
 
+# ==================== КЭШ ЗАПРОСОВ ====================
+
+_READ_TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)', re.IGNORECASE)
+_WRITE_TABLE_RE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)'
+    r'\s+([A-Za-z_]\w*)',
+    re.IGNORECASE
+)
+
+def _read_tables(query: str):
+    """Таблицы, из которых читает SELECT"""
+    return tuple(sorted({name.lower() for name in _READ_TABLES_RE.findall(query)}))
+
+def _write_table(query: str):
+    """Таблица, которую меняет INSERT/UPDATE/DELETE (None, если не распознана)"""
+    match = _WRITE_TABLE_RE.match(query)
+    return match.group(1).lower() if match else None
+
+class QueryCache:
+    """
+    Общий для процесса кэш результатов SELECT.
+
+    Ключ - текст запроса и параметры. Каждая запись помечена таблицами,
+    из которых она прочитана, и их версиями на момент чтения. Запись в
+    таблицу увеличивает её версию и сразу удаляет только зависящие от неё
+    записи. Вытеснение - LRU с ограничением по числу записей и по байтам.
+    Запись с ttl дополнительно устаревает через ttl секунд: так кэшируются
+    данные, которые меняют и другие процессы (их запись этот кэш не видит).
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, max_bytes=QUERY_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # ключ -> (значение, таблицы, размер, срок или None)
+        self._by_table = {}            # таблица -> ключи зависящих записей
+        self._versions = {}            # таблица -> версия
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._expirations = 0
+
+    def get(self, key):
+        """Значение из кэша или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] is not None and entry[3] <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def versions(self, tables):
+        """Снимок версий таблиц - берётся до выполнения запроса"""
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def put(self, key, value, tables, versions, nbytes, ttl=None):
+        """Сохранение результата, если таблицы не менялись во время чтения"""
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if versions != tuple(self._versions.get(table, 0) for table in tables):
+                return
+            if key in self._entries:
+                self._remove(key)
+            expires = time.monotonic() + ttl if ttl else None
+            self._entries[key] = (value, tables, nbytes, expires)
+            self._bytes += nbytes
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, tables):
+        """Новая версия таблиц и удаление всех записей, прочитанных из них"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in self._by_table.pop(table, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self._invalidations += 1
+
+    def clear(self):
+        """Полная очистка (например, после изменения схемы)"""
+        with self._lock:
+            for table in list(self._by_table):
+                self._versions[table] = self._versions.get(table, 0) + 1
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        value, tables, nbytes, expires = self._entries.pop(key)
+        self._bytes -= nbytes
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    def stats(self):
+        """Счётчики попаданий, промахов, вытеснений и инвалидаций"""
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'expirations': self._expirations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
+
+_query_cache = QueryCache()
+
+def get_query_cache_stats():
+    """Статистика кэша запросов"""
+    return _query_cache.stats()
+
+def invalidate_tables(*tables):
+    """Сброс кэша для изменённых таблиц (и зависящих от них через триггеры)"""
+    affected = set()
+    for table in tables:
+        if table:
+            affected.add(table)
+            affected.update(TABLE_DEPENDENCIES.get(table, ()))
+    if affected:
+        _query_cache.invalidate(sorted(affected))
+
+# ==================== ВЫПОЛНЕНИЕ ЗАПРОСОВ ====================
+
+def _frame(description, rows):
+    """DataFrame из строк курсора (как pd.read_sql: Decimal -> float)"""
+    return pd.DataFrame.from_records(
+        rows, columns=[col[0] for col in description], coerce_float=True
+    )
+
+def _read_frame(query, params=None):
+    """SELECT в DataFrame через соединение из пула (ошибки пробрасываются)"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        with track_query(conn, query, params) as tracked:
+            cursor.execute(query, params or ())
+            rows = cursor.fetchall()
+            tracked.rows = len(rows)
+        df = _frame(cursor.description, rows)
+        cursor.close()
+    return df
+
 def execute_query(query: str, params=None):
     """Выполнение SELECT запроса"""
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return pd.DataFrame()
-        
-        if params:
-            df = pd.read_sql(query, conn, params=params)
-        else:
-            df = pd.read_sql(query, conn)
-        conn.close()
-        return df
+        return _read_frame(query, params)
     except Exception as e:
         st.error(f"❌ Ошибка запроса: {e}")
         return pd.DataFrame()
 
+def cached_query(query: str, params=None, tables=None, ttl=None):
+    """
+    SELECT через кэш запросов. tables - таблицы, от которых зависит
+    результат (по умолчанию берутся из FROM/JOIN запроса); ttl - срок
+    жизни записи в секундах (по умолчанию - до записи в эти таблицы).
+    Возвращается копия, изменять её безопасно.
+    """
+    tables = tuple(sorted(tables)) if tables else _read_tables(query)
+    key = (query, tuple(params) if params else ())
+    
+    cached = _query_cache.get(key)
+    if cached is not None:
+        return cached.copy()
+    
+    versions = _query_cache.versions(tables)
+    try:
+        df = _read_frame(query, params)
+    except Exception as e:
+        st.error(f"❌ Ошибка запроса: {e}")
+        return pd.DataFrame()
+    
+    _query_cache.put(
+        key, df, tables, versions, int(df.memory_usage(index=True, deep=True).sum()), ttl
+    )
+    return df.copy()
+
 def execute_update(query: str, params=None):
     """Выполнение UPDATE/INSERT/DELETE"""
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        
-        cursor = conn.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            with track_query(conn, query, params) as tracked:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                tracked.rows = cursor.rowcount
+            conn.commit()
+        table = _write_table(query)
+        invalidate_tables(table)
+        # Параметры в журнал не попадают: среди них бывают хэши паролей
+        audit_event(_audit_action(query), table, changes={'rows': tracked.rows})
         return True
     except Exception as e:
         st.error(f"❌ Ошибка: {e}")
         return False
 
+# ==================== БЫСТРЫЕ ЗАПРОСЫ (БЕЗ PANDAS) ====================
+# Для точечных выборок (одно значение, одна строка, короткий список)
+# DataFrame не нужен: fetch_* читают курсор напрямую. Подготовленные
+# выражения кэшируются соединением (cached_statements), а соединения
+# живут в пуле, поэтому повторный запрос не компилируется заново.
+
+ROW_TYPES = ('tuple', 'dict', 'row')
+
+@lru_cache(maxsize=256)
+def _row_class(columns: tuple):
+    """Класс строки со __slots__ (namedtuple) для набора колонок"""
+    return namedtuple('Row', columns, rename=True)
+
+def _shape_rows(description, rows, row_type):
+    """Приведение строк курсора к tuple / dict / namedtuple"""
+    if row_type == 'tuple':
+        return rows
+    columns = tuple(col[0] for col in description)
+    if row_type == 'dict':
+        return [dict(zip(columns, row)) for row in rows]
+    if row_type == 'row':
+        row_class = _row_class(columns)
+        return [row_class._make(row) for row in rows]
+    raise ValueError(f"Неизвестный тип строк: {row_type} (ожидается один из {ROW_TYPES})")
+
+def _fetch(query, params, size, row_type):
+    """Выполнение запроса на сыром курсоре (size=None - все строки)"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None  # кортежи без обёртки sqlite3.Row
+        with track_query(conn, query, params) as tracked:
+            cursor.execute(query, params or ())
+            rows = cursor.fetchall() if size is None else cursor.fetchmany(size)
+            tracked.rows = len(rows)
+        description = cursor.description
+        cursor.close()
+    return _shape_rows(description, rows, row_type)
+
+def fetch_scalar(query: str, params=None, default=None):
+    """Первое значение первой строки (COUNT, AVG, id...)"""
+    try:
+        rows = _fetch(query, params, 1, 'tuple')
+        return rows[0][0] if rows else default
+    except Exception as e:
+        st.error(f"❌ Ошибка запроса: {e}")
+        return default
+
+def fetch_one(query: str, params=None, row_type='tuple'):
+    """Первая строка результата или None"""
+    try:
+        rows = _fetch(query, params, 1, row_type)
+        return rows[0] if rows else None
+    except Exception as e:
+        st.error(f"❌ Ошибка запроса: {e}")
+        return None
+
+def fetch_all(query: str, params=None, row_type='tuple'):
+    """Все строки результата списком tuple / dict / namedtuple"""
+    try:
+        return _fetch(query, params, None, row_type)
+    except Exception as e:
+        st.error(f"❌ Ошибка запроса: {e}")
+        return []
+
+def execute_insert(query: str, params=None):
+    """Выполнение INSERT, возвращает id новой строки (None при ошибке)"""
+    try:
+        with db_connection() as conn:
+            with track_query(conn, query, params) as tracked:
+                new_id = insert_returning_id(conn, query, params or ())
+                tracked.rows = 1
+            conn.commit()
+        table = _write_table(query)
+        invalidate_tables(table)
+        audit_event(audit.CREATE, table, new_id)
+        return new_id
+    except Exception as e:
+        st.error(f"❌ Ошибка: {e}")
+        return None
+
+# ==================== МАССОВАЯ ЗАПИСЬ ====================
+
+def _iter_rows(data, columns, defaults):
+    """
+    Кортежи для executemany из DataFrame, словарей или кортежей.
+    Недостающие поля заполняются значениями из defaults.
+    """
+    if isinstance(data, pd.DataFrame):
+        frame = data.reindex(columns=list(columns))
+        for col in columns:
+            if col in defaults:
+                frame[col] = frame[col].fillna(defaults[col])
+            if pd.api.types.is_datetime64_any_dtype(frame[col]):
+                frame[col] = frame[col].dt.strftime('%Y-%m-%d')
+        # object + None вместо NaN: sqlite3 не умеет numpy-типы
+        frame = frame.astype(object).where(frame.notna(), None)
+        yield from frame.itertuples(index=False, name=None)
+        return
+    
+    for row in data:
+        if isinstance(row, dict):
+            yield tuple(row.get(col, defaults.get(col)) for col in columns)
+        else:
+            values = tuple(row)
+            if len(values) < len(columns):
+                values += tuple(defaults.get(col) for col in columns[len(values):])
+            yield values
+
+def _chunks(rows, size):
+    """Разбиение потока строк на списки по size штук"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _insert_many(table, columns, rows, chunk_size=BULK_CHUNK_SIZE, on_chunk=None):
+    """
+    Вставка строк пачками: одна транзакция и один executemany на пачку.
+    on_chunk(conn, chunk, ids) выполняется в той же транзакции после вставки.
+    Возвращает id вставленных строк в порядке входных данных.
+    """
+    query = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+    ids = []
+    with db_connection() as conn:
+        for chunk in _chunks(rows, chunk_size):
+            begin_write(conn)
+            try:
+                with track_query(conn, query, chunk) as tracked:
+                    chunk_ids = insert_many(conn, table, columns, chunk)
+                    tracked.rows = len(chunk)
+                if on_chunk is not None:
+                    on_chunk(conn, chunk, chunk_ids)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            # Версии таблиц растут только после commit: иначе параллельное
+            # чтение успело бы закэшировать старые данные под новой версией
+            invalidate_tables(table)
+            ids.extend(chunk_ids)
+            audit_event(audit.CREATE, table, changes={
+                'rows': len(chunk_ids),
+                'first_id': chunk_ids[0] if chunk_ids else None,
+                'last_id': chunk_ids[-1] if chunk_ids else None,
+            })
+    return ids
+
 def init_database():
     """Инициализация БД - создаёт таблицы и добавляет тестовые данные"""
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        
-        cursor = conn.cursor()
-        
-        # 1. Таблица пользователей
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            role TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
-        
-        # 2. Таблица спортсменов
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS athletes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            birth_date DATE,
-            gender TEXT,
-            program_status TEXT DEFAULT 'active',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
-        
-        # 3. Таблица результатов соревнований
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sport_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            athlete_id INTEGER NOT NULL,
-            competition_name TEXT,
-            competition_date DATE,
-            discipline TEXT,
-            result TEXT,
-            place INTEGER,
-            is_personal_best BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(athlete_id) REFERENCES athletes(id)
-        );
-        """)
-        
-        # 4. Таблица функциональных тестов
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS functional_tests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            athlete_id INTEGER NOT NULL,
-            test_date DATE,
-            vo2_max_relative REAL,
-            pano_threshold REAL,
-            max_hr INTEGER,
-            resting_hr INTEGER,
-            weight_kg REAL,
-            body_fat_percent REAL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(athlete_id) REFERENCES athletes(id)
-        );
-        """)
-        
-        # 5. Таблица медицинских данных
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS medical_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            athlete_id INTEGER NOT NULL,
-            examination_date DATE,
-            hemoglobin_g_l REAL,
-            hematocrit_percent REAL,
-            cleared_for_training BOOLEAN DEFAULT 1,
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(athlete_id) REFERENCES athletes(id)
-        );
-        """)
-        
-        # 6. Таблица планов развития
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS development_plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            athlete_id INTEGER NOT NULL,
-            plan_date DATE,
-            goals TEXT,
-            status TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(athlete_id) REFERENCES athletes(id)
-        );
-        """)
-        
-        # 7. Таблица видов спорта
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT
-        );
-        """)
-        
-        # 8. Таблица регионов
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS regions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL
-        );
-        """)
-        
-        conn.commit()
-        
-        # Проверяем есть ли уже данные
-        cursor.execute("SELECT COUNT(*) FROM users;")
-        user_count = cursor.fetchone()[0]
-        
-        if user_count == 0:
-            # Добавляем тестовые пользователи
-            admin_hash = bcrypt.hashpw(b'admin123', bcrypt.gensalt()).decode()
-            curator_hash = bcrypt.hashpw(b'curator123', bcrypt.gensalt()).decode()
-            athlete_hash = bcrypt.hashpw(b'athlete123', bcrypt.gensalt()).decode()
+        with db_connection() as conn:
+            cursor = conn.cursor()
             
-            cursor.execute(
-                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                ('admin', admin_hash, 'admin')
-            )
-            cursor.execute(
-                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                ('curator_ski', curator_hash, 'curator')
-            )
-            cursor.execute(
-                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                ('ivanov_a', athlete_hash, 'athlete')
-            )
+            # 1. Таблица пользователей
+            cursor.execute(adapt_ddl(conn, """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                role TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """))
             
-            # Добавляем виды спорта
-            sports = [
-                ('Лыжные гонки', 'Циклический зимний вид спорта'),
-                ('Биатлон', 'Циклический вид спорта со стрельбой'),
-                ('Конькобежный спорт', 'Зимний циклический вид спорта'),
-                ('Академическая гребля', 'Водный вид спорта'),
-            ]
+            # 2. Таблица спортсменов
+            cursor.execute(adapt_ddl(conn, """
+            CREATE TABLE IF NOT EXISTS athletes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                birth_date DATE,
+                gender TEXT,
+                program_status TEXT DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """))
             
-            for name, desc in sports:
-                cursor.execute(
-                    "INSERT OR IGNORE INTO sports (name, description) VALUES (?, ?)",
-                    (name, desc)
-                )
+            # 3. Таблица результатов соревнований
+            cursor.execute(adapt_ddl(conn, """
+            CREATE TABLE IF NOT EXISTS sport_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                athlete_id INTEGER NOT NULL,
+                competition_name TEXT,
+                competition_date DATE,
+                discipline TEXT,
+                result TEXT,
+                place INTEGER,
+                is_personal_best BOOLEAN DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(athlete_id) REFERENCES athletes(id)
+            );
+            """))
             
-            # Добавляем регионы
-            regions = ['Московская область', 'Санкт-Петербург', 'Екатеринбург', 'Новосибирск']
+            # 4. Таблица функциональных тестов
+            cursor.execute(adapt_ddl(conn, """
+            CREATE TABLE IF NOT EXISTS functional_tests (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                athlete_id INTEGER NOT NULL,
+                test_date DATE,
+                vo2_max_relative REAL,
+                pano_threshold REAL,
+                max_hr INTEGER,
+                resting_hr INTEGER,
+                weight_kg REAL,
+                body_fat_percent REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(athlete_id) REFERENCES athletes(id)
+            );
+            """))
             
-            for region in regions:
-                cursor.execute(
-                    "INSERT OR IGNORE INTO regions (name) VALUES (?)",
-                    (region,)
-                )
+            # 5. Таблица медицинских данных
+            cursor.execute(adapt_ddl(conn, """
+            CREATE TABLE IF NOT EXISTS medical_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                athlete_id INTEGER NOT NULL,
+                examination_date DATE,
+                hemoglobin_g_l REAL,
+                hematocrit_percent REAL,
+                cleared_for_training BOOLEAN DEFAULT 1,
+                notes TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(athlete_id) REFERENCES athletes(id)
+            );
+            """))
             
-            # Добавляем тестовых спортсменов
-            cursor.execute(
-                """INSERT INTO athletes 
-                   (first_name, last_name, birth_date, gender, program_status) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                ('Иван', 'Иванов', '2005-01-15', 'М', 'active')
-            )
-            cursor.execute(
-                """INSERT INTO athletes 
-                   (first_name, last_name, birth_date, gender, program_status) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                ('Анна', 'Петрова', '2004-03-22', 'Ж', 'active')
-            )
-            cursor.execute(
-                """INSERT INTO athletes 
-                   (first_name, last_name, birth_date, gender, program_status) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                ('Дмитрий', 'Сидоров', '2006-07-10', 'М', 'active')
-            )
+            # 6. Таблица планов развития
+            cursor.execute(adapt_ddl(conn, """
+            CREATE TABLE IF NOT EXISTS development_plans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                athlete_id INTEGER NOT NULL,
+                plan_date DATE,
+                goals TEXT,
+                status TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(athlete_id) REFERENCES athletes(id)
+            );
+            """))
+            
+            # 7. Таблица видов спорта
+            cursor.execute(adapt_ddl(conn, """
+            CREATE TABLE IF NOT EXISTS sports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                description TEXT
+            );
+            """))
+            
+            # 8. Таблица регионов
+            cursor.execute(adapt_ddl(conn, """
+            CREATE TABLE IF NOT EXISTS regions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL
+            );
+            """))
             
             conn.commit()
-        
-        cursor.close()
-        conn.close()
+            
+            # 9. Версионные миграции (индексы и последующие изменения схемы)
+            if run_migrations(conn):
+                _query_cache.clear()
+            
+            # Проверяем есть ли уже данные
+            cursor.execute("SELECT COUNT(*) FROM users;")
+            user_count = cursor.fetchone()[0]
+            
+            if user_count == 0:
+                # Добавляем тестовые пользователи
+                admin_hash = bcrypt.hashpw(b'admin123', bcrypt.gensalt()).decode()
+                curator_hash = bcrypt.hashpw(b'curator123', bcrypt.gensalt()).decode()
+                athlete_hash = bcrypt.hashpw(b'athlete123', bcrypt.gensalt()).decode()
+                
+                cursor.execute(
+                    "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                    ('admin', admin_hash, 'admin')
+                )
+                cursor.execute(
+                    "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                    ('curator_ski', curator_hash, 'curator')
+                )
+                cursor.execute(
+                    "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                    ('ivanov_a', athlete_hash, 'athlete')
+                )
+                
+                # Демо-спортсмены; виды спорта, регионы и тренеры уже
+                # добавлены миграцией из utils/reference_data.py
+                execute_batch(
+                    conn,
+                    """INSERT INTO athletes 
+                       (first_name, last_name, birth_date, gender, program_status) 
+                       VALUES (?, ?, ?, ?, ?)""",
+                    [athlete[:4] + ('active',) for athlete in reference_data.DEMO_ATHLETES]
+                )
+                reference_data.fill_references(conn, reference_data.demo_references())
+                
+                conn.commit()
+                _query_cache.clear()
+            
+            cursor.close()
         
         return True
     
@@ -258,96 +787,1211 @@ def init_database():
         st.error(f"❌ Ошибка инициализации БД: {e}")
         return False
 
+# ==================== ПОДГОТОВКА ПРОЦЕССА ====================
+
+_bootstrap_lock = threading.Lock()
+_bootstrap_info = None  # итог bootstrap() в этом процессе
+
+def bootstrap(seed=None):
+    """
+    Подготовка БД один раз на процесс сервера, а не на каждую сессию:
+    схема, начальные данные (seed) и фоновое архивирование, если оно
+    включено (ARCHIVE_INTERVAL_HOURS > 0). Сессии ждут первую подготовку
+    на блокировке, следующие вызовы возвращают сохранённый итог, не
+    обращаясь к БД.
+
+    Если все миграции уже применены, CREATE TABLE и миграции не
+    выполняются: процесс только читает версию схемы. seed вызывается в
+    каждом новом процессе и сам решает по данным, нужно ли что-то добавить
+    (например, пуст ли реестр спортсменов); запись начальных данных должна
+    быть одной транзакцией (add_athletes_with_results), чтобы оборванный
+    seed не оставил реестр наполовину заполненным. При ошибке схемы или
+    seed итог не запоминается - следующая сессия попробует снова.
+
+    Returns:
+        {'initialized': выполнялась ли инициализация схемы, 'ms': время подготовки}
+        или None, если инициализация не удалась
+    """
+    global _bootstrap_info
+    if _bootstrap_info is not None:
+        return _bootstrap_info
+    with _bootstrap_lock:
+        if _bootstrap_info is not None:
+            return _bootstrap_info
+
+        start = time.perf_counter()
+        with db_connection() as conn:
+            current = schema_is_current(conn)
+        if not current and not init_database():
+            return None
+        if seed is not None:
+            try:
+                seed()
+            except Exception as e:
+                st.error(f"❌ Ошибка добавления начальных данных: {e}")
+                return None
+        start_archive_scheduler()
+
+        _bootstrap_info = {
+            'initialized': not current,
+            'ms': round((time.perf_counter() - start) * 1000, 1),
+        }
+        return _bootstrap_info
+
+def get_bootstrap_info():
+    """Итог подготовки процесса (None, если её ещё не было)"""
+    return _bootstrap_info
+
 # ==================== ФУНКЦИИ ДЛЯ СПОРТСМЕНОВ ====================
 
 def get_athletes(status='active'):
     """Получение списка спортсменов"""
     query = "SELECT * FROM athletes WHERE program_status = ? ORDER BY last_name, first_name"
-    return execute_query(query, [status])
+    return cached_query(query, [status])
 
 def get_athlete_by_id(athlete_id: int):
     """Получение спортсмена по ID"""
+    audit_event(audit.READ, 'athletes', athlete_id)
     query = "SELECT * FROM athletes WHERE id = ?"
-    return execute_query(query, [athlete_id])
+    return cached_query(query, [athlete_id])
+
+def add_athlete(first_name, last_name, birth_date, gender, status='active',
+                sport_id=None, region_id=None, coach_id=None):
+    """Добавление нового спортсмена, возвращает его id"""
+    query = f"""INSERT INTO athletes 
+               ({', '.join(ATHLETE_COLUMNS)})
+               VALUES ({', '.join('?' * len(ATHLETE_COLUMNS))})"""
+    return execute_insert(
+        query, (first_name, last_name, birth_date, gender, status, sport_id, region_id, coach_id)
+    )
+
+# Спортсмен с названиями вида спорта, региона и тренера (соединения по первичным ключам)
+_ATHLETE_DETAILS = """
+    SELECT a.id, a.first_name, a.last_name, a.birth_date, a.gender, a.program_status,
+           a.sport_id, sp.name AS sport, a.region_id, r.name AS region,
+           a.coach_id, c.full_name AS coach{extra_columns}
+    FROM athletes a
+    LEFT JOIN sports sp ON sp.id = a.sport_id
+    LEFT JOIN regions r ON r.id = a.region_id
+    LEFT JOIN coaches c ON c.id = a.coach_id{extra_joins}
+"""
+
+def get_athletes_with_details(status='active'):
+    """Спортсмены с видом спорта, регионом и тренером одним запросом"""
+    query = _ATHLETE_DETAILS.format(extra_columns='', extra_joins='') + """
+        WHERE a.program_status = ? ORDER BY a.last_name, a.first_name"""
+    return cached_query(query, [status])
+
+ATHLETE_FILTER_COLUMNS = ('gender', 'program_status')
+
+# Порядки списка спортсменов: колонки ключа (последняя - уникальный id) и направление
+ATHLETE_SORTS = {
+    'name': (('last_name', 'first_name', 'id'), 'ASC'),
+    'newest': (('id',), 'DESC'),
+}
+
+ATHLETES_PAGE_SIZE = 50
+
+def _athlete_filters(statuses=None, genders=None, name_prefix=None,
+                     sport_ids=None, region_ids=None, coach_ids=None):
+    """Условия WHERE и параметры для фильтров списка спортсменов"""
+    conditions, params = [], []
+    
+    for column, values in (('sport_id', sport_ids), ('region_id', region_ids), ('coach_id', coach_ids)):
+        if values:
+            conditions.append(f"a.{column} IN ({', '.join('?' * len(values))})")
+            params.extend(int(value) for value in values)
+    if statuses:
+        conditions.append(f"a.program_status IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if genders:
+        conditions.append(f"a.gender IN ({', '.join('?' * len(genders))})")
+        params.extend(genders)
+    if name_prefix:
+        # Диапазон вместо LIKE: поиск по префиксу идёт по индексу фамилии
+        conditions.append("a.last_name >= ? AND a.last_name < ?")
+        params.extend([name_prefix, name_prefix + '\uffff'])
+    
+    return conditions, params
+
+def count_athletes(statuses=None, genders=None, name_prefix=None,
+                   sport_ids=None, region_ids=None, coach_ids=None):
+    """Число спортсменов по фильтрам списка"""
+    conditions, params = _athlete_filters(
+        statuses, genders, name_prefix, sport_ids, region_ids, coach_ids
+    )
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return fetch_scalar(f"SELECT COUNT(*) FROM athletes a {where}", params, default=0)
+
+def get_athletes_page(cursor=None, page_size=ATHLETES_PAGE_SIZE, sort='name',
+                      statuses=None, genders=None, name_prefix=None,
+                      sport_ids=None, region_ids=None, coach_ids=None):
+    """
+    Страница списка спортсменов с keyset-пагинацией: фильтры и порядок -
+    в SQL, на странице не больше page_size строк при любом размере реестра.
+    К строкам добавляются вид спорта, регион, тренер и итоги из
+    athlete_stats (все соединения - по первичному ключу).
+
+    Returns:
+        (DataFrame страницы, курсор следующей страницы или None)
+    """
+    if sort not in ATHLETE_SORTS:
+        raise ValueError(f"Сортировка {sort} не поддерживается")
+    key_columns, direction = ATHLETE_SORTS[sort]
+    conditions, params = _athlete_filters(
+        statuses, genders, name_prefix, sport_ids, region_ids, coach_ids
+    )
+    
+    if cursor is not None:
+        # Сравнение кортежей раскрывается в поиск по индексу
+        keys = ', '.join(f"a.{column}" for column in key_columns)
+        marks = ', '.join('?' * len(key_columns))
+        conditions.append(f"({keys}) {'>' if direction == 'ASC' else '<'} ({marks})")
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = ', '.join(f"a.{column} {direction}" for column in key_columns)
+    
+    query = _ATHLETE_DETAILS.format(
+        extra_columns=""",
+           s.total_competitions, s.personal_bests, s.best_place, s.last_competition_date""",
+        extra_joins="""
+    LEFT JOIN athlete_stats s ON s.athlete_id = a.id"""
+    )
+    page = cached_query(f"{query} {where} ORDER BY {order} LIMIT ?", params + [int(page_size) + 1])
+    if len(page) <= page_size:
+        return page, None
+    
+    page = page.iloc[:page_size]
+    last = page.iloc[-1]
+    return page, tuple(
+        int(last[column]) if column == 'id' else last[column] for column in key_columns
+    )
+
+def get_athlete_filter_values(column: str):
+    """Различные значения колонки спортсменов для фильтров"""
+    if column not in ATHLETE_FILTER_COLUMNS:
+        raise ValueError(f"Фильтр по колонке {column} не поддерживается")
+    return cached_query(
+        f"SELECT DISTINCT {column} FROM athletes WHERE {column} IS NOT NULL ORDER BY {column}"
+    )[column].tolist()
+
+ATHLETE_COLUMNS = (
+    'first_name', 'last_name', 'birth_date', 'gender', 'program_status',
+    'sport_id', 'region_id', 'coach_id',
+)
 
-def add_athlete(first_name, last_name, birth_date, gender, status='active'):
-    """Добавление нового спортсмена"""
-    query = """INSERT INTO athletes 
-               (first_name, last_name, birth_date, gender, program_status)
-               VALUES (?, ?, ?, ?, ?)"""
-    return execute_update(query, (first_name, last_name, birth_date, gender, status))
+def add_athletes_bulk(athletes, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Массовое добавление спортсменов.
+
+    athletes - DataFrame, словари или кортежи в порядке ATHLETE_COLUMNS
+    (program_status можно не указывать - будет 'active', справочники - NULL).
+    Возвращает список id новых спортсменов.
+    """
+    rows = _iter_rows(athletes, ATHLETE_COLUMNS, {'program_status': 'active'})
+    try:
+        return _insert_many('athletes', ATHLETE_COLUMNS, rows, chunk_size)
+    except Exception as e:
+        st.error(f"❌ Ошибка массового добавления спортсменов: {e}")
+        return []
 
 # ==================== ФУНКЦИИ ДЛЯ РЕЗУЛЬТАТОВ ====================
 
-def get_sport_results(athlete_id=None, limit=50):
-    """Получение спортивных результатов"""
+RESULT_FILTER_COLUMNS = ('competition_name', 'discipline')
+
+# Порядки результатов: колонки ключа (последняя - уникальный id) и направление.
+# Строки без значения первой колонки (дата, место, спортсмен) идут в конце, по id.
+RESULT_SORTS = {
+    'date': (('competition_date', 'id'), 'DESC'),
+    'place': (('place', 'id'), 'ASC'),
+    'athlete': (('last_name', 'first_name', 'athlete_id', 'id'), 'ASC'),
+}
+
+# Колонка ключа -> выражение в запросе (остальные - колонки результата r).
+# Порядок по спортсмену идёт по индексу ФИО athletes, внутри спортсмена -
+# по индексу (athlete_id, id) результатов
+_RESULT_KEY_SQL = {'last_name': 'a.last_name', 'first_name': 'a.first_name', 'athlete_id': 'a.id'}
+
+# Колонки результата и ФИО спортсмена; LEFT JOIN - результаты без спортсмена не теряются
+_RESULTS_SELECT = """
+    SELECT {columns}, a.last_name, a.first_name
+    FROM {table} r
+    LEFT JOIN athletes a ON a.id = r.athlete_id"""
+
+def _result_key(column):
+    """Выражение SQL для колонки ключа сортировки"""
+    return _RESULT_KEY_SQL.get(column, f"r.{column}")
+
+def _results_filters(athlete_id=None, competitions=None, disciplines=None,
+                     date_from=None, date_to=None, athlete_prefix=None,
+                     place_min=None, place_max=None):
+    """Условия WHERE и параметры для фильтров результатов"""
+    conditions, params = [], []
+    
     if athlete_id:
-        query = f"SELECT * FROM sport_results WHERE athlete_id = ? ORDER BY competition_date DESC LIMIT {limit}"
-        return execute_query(query, [athlete_id])
-    else:
-        query = f"SELECT * FROM sport_results ORDER BY competition_date DESC LIMIT {limit}"
-        return execute_query(query)
+        conditions.append("r.athlete_id = ?")
+        params.append(athlete_id)
+    if competitions:
+        conditions.append(f"r.competition_name IN ({', '.join('?' * len(competitions))})")
+        params.extend(competitions)
+    if disciplines:
+        conditions.append(f"r.discipline IN ({', '.join('?' * len(disciplines))})")
+        params.extend(disciplines)
+    if date_from:
+        conditions.append("r.competition_date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("r.competition_date <= ?")
+        params.append(date_to)
+    if athlete_prefix:
+        # Спортсмены по префиксу фамилии - диапазоном по индексу ФИО, как в списке
+        conditions.append(
+            "r.athlete_id IN (SELECT id FROM athletes WHERE last_name >= ? AND last_name < ?)"
+        )
+        params.extend([athlete_prefix, athlete_prefix + '\uffff'])
+    if place_min is not None:
+        conditions.append("r.place >= ?")
+        params.append(int(place_min))
+    if place_max is not None:
+        conditions.append("r.place <= ?")
+        params.append(int(place_max))
+    
+    return conditions, params
+
+def _select_results(conditions, params, order, limit, include_archive=False):
+    """
+    SELECT результатов с ФИО спортсмена в порядке order - списке пар
+    (колонка ключа, направление).
+    С архивом: по LIMIT строк из горячей и архивной таблицы (каждая - по
+    своему индексу) и слияние, а не сортировка всего представления.
+    """
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order_by = ', '.join(f"{_result_key(column)} {direction}" for column, direction in order)
+    tables = ('sport_results', archive.ARCHIVE_TABLE) if include_archive else ('sport_results',)
+    columns = ', '.join(f"r.{column}" for column in archive.ARCHIVE_COLUMNS)
+    
+    frames = [
+        cached_query(
+            f"{_RESULTS_SELECT.format(columns=columns, table=table)} {where} ORDER BY {order_by} LIMIT ?",
+            params + [int(limit)]
+        )
+        for table in tables
+    ]
+    non_empty = [frame for frame in frames if not frame.empty]
+    if len(non_empty) < 2:
+        return non_empty[0] if non_empty else frames[0]
+    merged = pd.concat(non_empty, ignore_index=True)
+    merged = merged.sort_values(
+        [column for column, _ in order],
+        ascending=[direction == 'ASC' for _, direction in order],
+        na_position='last', ignore_index=True
+    )
+    return merged.head(int(limit))
+
+def _key_value(value):
+    """Значение ключа из строки DataFrame для курсора (NaN -> None, numpy -> python)"""
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+def _results_page(conditions, params, sort, cursor, limit, include_archive):
+    """
+    До limit результатов в порядке sort, начиная сразу за ключом cursor.
+
+    Строки, у которых первая колонка ключа заполнена, выбираются сравнением
+    кортежа ключа с курсором - поиском по индексу этого порядка; строки без
+    неё (курсор с None первым) - после них, по id.
+    """
+    key_columns, direction = RESULT_SORTS[sort]
+    first = _result_key(key_columns[0])
+    op = '>' if direction == 'ASC' else '<'
+    tail_order = [('id', direction)]
+    
+    if cursor is not None and cursor[0] is None:
+        return _select_results(
+            conditions + [f"{first} IS NULL", f"r.id {op} ?"], params + [cursor[-1]],
+            tail_order, limit, include_archive
+        )
+    
+    keyed, keyed_params = conditions + [f"{first} IS NOT NULL"], list(params)
+    if cursor is not None:
+        # Сравнение кортежей раскрывается в поиск по индексу (без OR)
+        keys = ', '.join(_result_key(column) for column in key_columns)
+        keyed.append(f"({keys}) {op} ({', '.join('?' * len(key_columns))})")
+        keyed_params.extend(cursor)
+    page = _select_results(
+        keyed, keyed_params, [(column, direction) for column in key_columns], limit, include_archive
+    )
+    if len(page) < limit:
+        # Строки с ключом закончились: дальше идут строки без него
+        tail = _select_results(
+            conditions + [f"{first} IS NULL"], params, tail_order, limit - len(page), include_archive
+        )
+        if not tail.empty:
+            page = pd.concat([page, tail], ignore_index=True) if not page.empty else tail
+    return page
+
+def get_sport_results(athlete_id=None, limit=50, include_archive=True):
+    """Получение спортивных результатов (новые первыми, по умолчанию - с архивом)"""
+    conditions, params = _results_filters(athlete_id)
+    return _results_page(conditions, params, 'date', None, limit, include_archive)
+
+def get_sport_results_page(athlete_id=None, cursor=None, page_size=50,
+                           competitions=None, disciplines=None, include_archive=False,
+                           sort='date', date_from=None, date_to=None, athlete_prefix=None,
+                           place_min=None, place_max=None):
+    """
+    Страница результатов с keyset-пагинацией по ключу порядка sort
+    (RESULT_SORTS): фильтры, порядок и LIMIT - в SQL, по всей таблице.
+
+    В отличие от OFFSET, стоимость страницы не зависит от её номера:
+    выборка начинается сразу за ключом cursor поиском по индексу.
+    include_archive - листать и архив (id в обеих таблицах уникальны).
+    К строкам добавляются фамилия и имя спортсмена (last_name, first_name).
+
+    Returns:
+        (DataFrame страницы, курсор следующей страницы или None, если это последняя)
+    """
+    if sort not in RESULT_SORTS:
+        raise ValueError(f"Сортировка {sort} не поддерживается")
+    conditions, params = _results_filters(
+        athlete_id, competitions, disciplines, date_from, date_to, athlete_prefix,
+        place_min, place_max
+    )
+    # Лишняя строка показывает, есть ли следующая страница
+    page = _results_page(conditions, params, sort, cursor, int(page_size) + 1, include_archive)
+    
+    if len(page) <= page_size:
+        return page, None
+    
+    page = page.iloc[:page_size]
+    last = page.iloc[-1]
+    return page, tuple(_key_value(last[column]) for column in RESULT_SORTS[sort][0])
+
+def get_result_facets(include_archive=False) -> dict:
+    """
+    Значения всех фильтров страницы результатов одним запросом через кэш:
+    {колонка RESULT_FILTER_COLUMNS: отсортированный список значений}.
+    DISTINCT каждой колонки читается по её индексу; запись результата
+    сбрасывает кэш.
+    """
+    source = archive.RESULTS_VIEW if include_archive else 'sport_results'
+    query = ' UNION ALL '.join(
+        f"""SELECT '{column}' AS facet, value
+            FROM (SELECT DISTINCT {column} AS value FROM {source} WHERE {column} IS NOT NULL) f"""
+        for column in RESULT_FILTER_COLUMNS
+    )
+    facets = cached_query(f"{query} ORDER BY facet, value", tables=(source,))
+    if facets.empty:
+        return {column: [] for column in RESULT_FILTER_COLUMNS}
+    return {
+        column: facets.loc[facets['facet'] == column, 'value'].tolist()
+        for column in RESULT_FILTER_COLUMNS
+    }
+
+def get_result_filter_values(column: str, include_archive=False):
+    """Различные значения колонки результатов для фильтров"""
+    if column not in RESULT_FILTER_COLUMNS:
+        raise ValueError(f"Фильтр по колонке {column} не поддерживается")
+    return get_result_facets(include_archive)[column]
+
+RESULT_COLUMNS = ('athlete_id', 'competition_name', 'competition_date', 'discipline', 'result', 'place')
+# В БД к результату дописывается его числовое значение и единица
+STORED_RESULT_COLUMNS = RESULT_COLUMNS + ('result_value', 'result_unit')
+
+def _with_result_values(rows, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Дописывает к строкам RESULT_COLUMNS (result_value, result_unit).
+    Разбор идёт пачками: один векторный parse_results на пачку.
+    """
+    units = get_discipline_units()
+    result_idx = RESULT_COLUMNS.index('result')
+    discipline_idx = RESULT_COLUMNS.index('discipline')
+    for chunk in _chunks(rows, chunk_size):
+        values = result_values.parse_results(
+            [row[result_idx] for row in chunk],
+            [units.get(row[discipline_idx]) for row in chunk]
+        )
+        for row, value in zip(chunk, result_values.result_value_rows(values)):
+            yield tuple(row) + value
 
 def add_sport_result(athlete_id, competition_name, competition_date, discipline, result, place):
-    """Добавление результата"""
-    query = """INSERT INTO sport_results 
-               (athlete_id, competition_name, competition_date, discipline, result, place)
-               VALUES (?, ?, ?, ?, ?, ?)"""
-    return execute_update(query, (athlete_id, competition_name, competition_date, discipline, result, place))
+    """
+    Добавление результата, возвращает его id.
+    В той же транзакции результат проверяется на личный рекорд,
+    обновляются рейтинги его дисциплины и итоги спортсмена за месяц и сезон.
+    """
+    query = f"""INSERT INTO sport_results 
+               ({', '.join(STORED_RESULT_COLUMNS)})
+               VALUES ({', '.join('?' * len(STORED_RESULT_COLUMNS))})"""
+    row = next(_with_result_values([
+        (athlete_id, competition_name, competition_date, discipline, result, place)
+    ]))
+    result_value, result_unit = row[-2:]
+    lower_is_better = get_discipline_directions().get(discipline, True)
+    try:
+        with db_connection() as conn:
+            begin_write(conn)
+            try:
+                with track_query(conn, query, row) as tracked:
+                    new_id = insert_returning_id(conn, query, row)
+                    tracked.rows = 1
+                for derived in (personal_bests, leaderboards):
+                    derived.record(
+                        conn, new_id, athlete_id, discipline, result_value, result_unit,
+                        competition_date, lower_is_better
+                    )
+                athlete_rollups.record(
+                    conn, athlete_id, discipline, place, result_value, result_unit,
+                    competition_date, lower_is_better
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        invalidate_tables('sport_results')
+        audit_event(audit.CREATE, 'sport_results', new_id, {
+            'athlete_id': athlete_id, 'competition_date': competition_date,
+            'discipline': discipline, 'result': result, 'place': place,
+        })
+        return new_id
+    except Exception as e:
+        st.error(f"❌ Ошибка: {e}")
+        return None
+
+def _record_bests(conn, chunk, ids):
+    """Личные рекорды, рейтинги и итоги для пачки массовой вставки (векторно)"""
+    frame = pd.DataFrame(chunk, columns=STORED_RESULT_COLUMNS)
+    frame['id'] = ids
+    directions = get_discipline_directions()
+    personal_bests.record_bulk(conn, frame, directions)
+    leaderboards.record_bulk(conn, frame, directions)
+    athlete_rollups.record_bulk(conn, frame, directions)
+
+def add_sport_results_bulk(results, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Массовое добавление результатов (например, протоколов за сезон).
+
+    results - DataFrame, словари или кортежи в порядке RESULT_COLUMNS.
+    Пишется пачками по chunk_size строк, каждая пачка - одна транзакция.
+    Возвращает список id новых результатов.
+    """
+    rows = _with_result_values(_iter_rows(results, RESULT_COLUMNS, {}), chunk_size)
+    try:
+        return _insert_many(
+            'sport_results', STORED_RESULT_COLUMNS, rows, chunk_size,
+            on_chunk=_record_bests
+        )
+    except Exception as e:
+        st.error(f"❌ Ошибка массового добавления результатов: {e}")
+        return []
+
+def add_athletes_with_results(athletes, results):
+    """
+    Спортсмены вместе с их результатами одной транзакцией (например,
+    начальные данные): записывается либо всё, либо ничего.
+
+    athletes - кортежи или словари в порядке ATHLETE_COLUMNS; results - в
+    порядке RESULT_COLUMNS, но вместо athlete_id - номер спортсмена в athletes.
+    Ошибка пробрасывается вызывающему коду. Возвращает id новых спортсменов.
+    """
+    athlete_rows = list(_iter_rows(athletes, ATHLETE_COLUMNS, {'program_status': 'active'}))
+    # Значения результатов разбираются до транзакции (справочник дисциплин - через кэш)
+    result_rows = list(_with_result_values(_iter_rows(results, RESULT_COLUMNS, {})))
+    
+    with db_connection() as conn:
+        begin_write(conn)
+        try:
+            athlete_ids = insert_many(conn, 'athletes', ATHLETE_COLUMNS, athlete_rows)
+            result_rows = [(athlete_ids[row[0]],) + row[1:] for row in result_rows]
+            result_ids = insert_many(conn, 'sport_results', STORED_RESULT_COLUMNS, result_rows)
+            _record_bests(conn, result_rows, result_ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_tables('athletes', 'sport_results')
+    for table, ids in (('athletes', athlete_ids), ('sport_results', result_ids)):
+        audit_event(audit.CREATE, table, changes={
+            'rows': len(ids),
+            'first_id': ids[0] if ids else None,
+            'last_id': ids[-1] if ids else None,
+        })
+    return athlete_ids
+
+def fill_athlete_references(rows):
+    """
+    Заполняет пустые вид спорта, регион и тренера спортсменов по названиям
+    (reference_data.fill_references) одной транзакцией. Нужно начальным
+    данным, записанным до внешних ключей; заполненные ссылки не меняются.
+    Ошибка пробрасывается вызывающему коду.
+    """
+    with db_connection() as conn:
+        begin_write(conn)
+        try:
+            reference_data.fill_references(conn, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_tables('athletes')
+
+def get_disciplines():
+    """Справочник дисциплин: единица и направление (lower_is_better)"""
+    return cached_query("SELECT * FROM disciplines ORDER BY sport, name")
+
+def get_discipline_units():
+    """Дисциплина -> единица результата по умолчанию"""
+    catalog = get_disciplines()
+    return dict(zip(catalog['name'], catalog['unit'])) if not catalog.empty else {}
+
+def get_discipline_directions():
+    """Дисциплина -> True, если меньший результат лучше"""
+    catalog = get_disciplines()
+    if catalog.empty:
+        return {}
+    return dict(zip(catalog['name'], catalog['lower_is_better'].astype(bool)))
+
+def get_best_results(discipline: str, limit=10):
+    """
+    Лучший результат каждого спортсмена в дисциплине: MIN для времени,
+    MAX для метров и очков (по lower_is_better из справочника)
+    """
+    lower_is_better = fetch_scalar(
+        "SELECT lower_is_better FROM disciplines WHERE name = ?", [discipline], default=1
+    )
+    best, direction = ('MIN', 'ASC') if lower_is_better else ('MAX', 'DESC')
+    query = f"""
+        SELECT r.athlete_id, a.first_name, a.last_name,
+               {best}(r.result_value) AS best_value, COUNT(*) AS starts
+        FROM {archive.RESULTS_VIEW} r
+        JOIN athletes a ON a.id = r.athlete_id
+        WHERE r.discipline = ? AND r.result_value IS NOT NULL
+        GROUP BY r.athlete_id, a.first_name, a.last_name
+        ORDER BY best_value {direction}
+        LIMIT ?
+    """
+    return cached_query(query, [discipline, int(limit)])
 
 # ==================== ФУНКЦИИ ДЛЯ МЕДИЦИНСКИХ ДАННЫХ ====================
 
 def get_medical_data(athlete_id: int):
     """Получение медицинских данных"""
+    audit_event(audit.READ, 'medical_data', athlete_id)
     query = "SELECT * FROM medical_data WHERE athlete_id = ? ORDER BY examination_date DESC"
-    return execute_query(query, [athlete_id])
+    return cached_query(query, [athlete_id])
 
 def get_functional_tests(athlete_id: int):
     """Получение функциональных тестов"""
+    audit_event(audit.READ, 'functional_tests', athlete_id)
     query = "SELECT * FROM functional_tests WHERE athlete_id = ? ORDER BY test_date DESC"
-    return execute_query(query, [athlete_id])
+    return cached_query(query, [athlete_id])
+
+def get_development_plans(athlete_id: int):
+    """Получение планов развития"""
+    audit_event(audit.READ, 'development_plans', athlete_id)
+    query = "SELECT * FROM development_plans WHERE athlete_id = ? ORDER BY plan_date DESC"
+    return cached_query(query, [athlete_id])
 
 # ==================== ФУНКЦИИ ДЛЯ СПРАВОЧНИКОВ ====================
 
 def get_sports():
     """Получение видов спорта"""
     query = "SELECT * FROM sports ORDER BY name"
-    return execute_query(query)
+    return cached_query(query)
 
 def get_regions():
     """Получение регионов"""
     query = "SELECT * FROM regions ORDER BY name"
-    return execute_query(query)
+    return cached_query(query)
+
+def get_coaches(sport_id=None):
+    """Тренеры (всех видов спорта или одного) с названием вида спорта"""
+    query = """SELECT c.id, c.full_name, c.sport_id, sp.name AS sport
+               FROM coaches c
+               LEFT JOIN sports sp ON sp.id = c.sport_id"""
+    if sport_id is None:
+        return cached_query(query + " ORDER BY sp.name, c.full_name")
+    return cached_query(query + " WHERE c.sport_id = ? ORDER BY c.full_name", [int(sport_id)])
 
 # ==================== ФУНКЦИИ ДЛЯ СТАТИСТИКИ ====================
 
 def get_athlete_statistics(athlete_id: int):
-    """Получение статистики спортсмена"""
-    stats = {}
-    
-    comps = execute_query("SELECT COUNT(*) as count FROM sport_results WHERE athlete_id = ?", [athlete_id])
-    stats['total_competitions'] = comps['count'][0] if not comps.empty else 0
+    """Статистика спортсмена из athlete_stats (одна строка по ключу)"""
+    row = fetch_one(
+        """SELECT total_competitions, personal_bests, avg_place, best_place,
+                  last_place, last_competition_date
+           FROM athlete_stats WHERE athlete_id = ?""",
+        [athlete_id]
+    )
+    total, personal_bests, avg_place, best_place, last_place, last_date = (
+        row if row else (0, 0, None, None, None, None)
+    )
     
-    pbs = execute_query("SELECT COUNT(*) as count FROM sport_results WHERE athlete_id = ? AND is_personal_best = 1", [athlete_id])
-    stats['personal_bests'] = pbs['count'][0] if not pbs.empty else 0
-    
-    places = execute_query("SELECT AVG(place) as avg_place FROM sport_results WHERE athlete_id = ?", [athlete_id])
-    stats['avg_place'] = round(places['avg_place'][0], 2) if not places.empty and places['avg_place'][0] else None
-    
-    return stats
+    return {
+        'total_competitions': total,
+        'personal_bests': personal_bests,
+        'avg_place': round(avg_place, 2) if avg_place else None,
+        'best_place': best_place,
+        'last_place': last_place,
+        'last_competition_date': last_date,
+    }
+
+def get_athlete_dynamics(athlete_id: int, granularity='month'):
+    """
+    Итоги спортсмена по периодам за всю карьеру (granularity: month / season):
+    число стартов, среднее, лучшее и худшее место по всем дисциплинам
+    """
+    table = athlete_rollups.ROLLUP_TABLES[granularity]
+    query = f"""
+        SELECT period,
+               SUM(competitions) AS competitions,
+               CASE WHEN SUM(place_count) > 0
+                    THEN SUM(place_sum) * 1.0 / SUM(place_count) END AS avg_place,
+               MIN(best_place) AS best_place,
+               MAX(worst_place) AS worst_place
+        FROM {table}
+        WHERE athlete_id = ?
+        GROUP BY period
+        ORDER BY period
+    """
+    return cached_query(query, [athlete_id])
+
+def get_athlete_discipline_progress(athlete_id: int, granularity='season'):
+    """Лучший результат спортсмена в каждой дисциплине по периодам"""
+    table = athlete_rollups.ROLLUP_TABLES[granularity]
+    query = f"""
+        SELECT period, discipline, competitions, best_value, result_unit
+        FROM {table}
+        WHERE athlete_id = ? AND best_value IS NOT NULL
+        ORDER BY discipline, period
+    """
+    return cached_query(query, [athlete_id])
+
+def rebuild_athlete_rollups():
+    """Полный пересчёт помесячных и посезонных итогов спортсменов"""
+    with db_connection() as conn:
+        begin_write(conn)
+        try:
+            count = athlete_rollups.rebuild(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_tables(*athlete_rollups.ROLLUP_TABLES.values())
+    return count
+
+def get_stats_leaderboard(order_by='total_competitions', limit=10):
+    """Рейтинг спортсменов по полю athlete_stats (чтение по индексу)"""
+    if order_by not in athlete_stats.LEADERBOARD_ORDER:
+        raise ValueError(f"Рейтинг по полю {order_by} не поддерживается")
+    direction = athlete_stats.LEADERBOARD_ORDER[order_by]
+    query = f"""
+        SELECT s.*, a.first_name, a.last_name
+        FROM athlete_stats s
+        JOIN athletes a ON a.id = s.athlete_id
+        WHERE s.{order_by} IS NOT NULL
+        ORDER BY s.{order_by} {direction}
+        LIMIT ?
+    """
+    return cached_query(query, [int(limit)])
+
+def rebuild_athlete_stats():
+    """Полный пересчёт athlete_stats (разовая команда для заполнения)"""
+    with db_connection() as conn:
+        begin_write(conn)
+        try:
+            count = athlete_stats.rebuild(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_tables('athlete_stats')
+    return count
+
+def get_personal_bests(athlete_id: int):
+    """Действующие личные рекорды спортсмена по дисциплинам"""
+    query = """
+        SELECT discipline, best_value, result_unit, result_id, competition_date
+        FROM personal_bests WHERE athlete_id = ? ORDER BY discipline
+    """
+    return cached_query(query, [athlete_id])
+
+def rebuild_personal_bests():
+    """Полный пересчёт personal_bests и флагов is_personal_best"""
+    with db_connection() as conn:
+        begin_write(conn)
+        try:
+            count = personal_bests.rebuild(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_tables('sport_results')
+    return count
+
+# ==================== РЕЙТИНГИ ДИСЦИПЛИН ====================
+
+def get_leaderboard_seasons(discipline: str):
+    """Сезоны, по которым есть рейтинг дисциплины (новые первыми)"""
+    query = """
+        SELECT DISTINCT season FROM leaderboard_entries
+        WHERE discipline = ? AND season <> ?
+        ORDER BY season DESC
+    """
+    seasons = cached_query(query, [discipline, leaderboards.SEASON_ALL])
+    return seasons['season'].tolist() if not seasons.empty else []
+
+def count_leaderboard(discipline: str, season=leaderboards.SEASON_ALL, gender=None):
+    """Число мест в рейтинге (для постраничного вывода)"""
+    if gender:
+        query = """SELECT COUNT(*) FROM leaderboard_entries
+                   WHERE discipline = ? AND season = ? AND gender = ? AND gender_place IS NOT NULL"""
+        return fetch_scalar(query, [discipline, season, gender], default=0)
+    query = """SELECT COUNT(*) FROM leaderboard_entries
+               WHERE discipline = ? AND season = ? AND place IS NOT NULL"""
+    return fetch_scalar(query, [discipline, season], default=0)
+
+def get_leaderboard(discipline: str, season=leaderboards.SEASON_ALL, gender=None,
+                    offset=0, limit=100):
+    """
+    Страница рейтинга дисциплины: общий зачёт или зачёт пола (gender).
+    Читает готовые места по индексу (дисциплина, сезон, место).
+    """
+    place_column = 'gender_place' if gender else 'place'
+    filters = [discipline, season] + ([gender] if gender else [])
+    query = f"""
+        SELECT l.{place_column} AS place, l.athlete_id, a.last_name, a.first_name,
+               l.gender, COALESCE(r.result, ra.result) AS result, l.best_value, l.result_unit,
+               l.competition_date, COALESCE(r.competition_name, ra.competition_name) AS competition_name
+        FROM leaderboard_entries l
+        LEFT JOIN athletes a ON a.id = l.athlete_id
+        -- Рекорд сезона может лежать в архиве: две выборки по ключу вместо представления
+        LEFT JOIN sport_results r ON r.id = l.result_id
+        LEFT JOIN {archive.ARCHIVE_TABLE} ra ON ra.id = l.result_id
+        WHERE l.discipline = ? AND l.season = ?{' AND l.gender = ?' if gender else ''}
+          AND l.{place_column} IS NOT NULL
+        ORDER BY l.{place_column}, l.athlete_id
+        LIMIT ? OFFSET ?
+    """
+    return cached_query(query, filters + [int(limit), int(offset)])
+
+def rebuild_leaderboards(discipline=None):
+    """Полный пересчёт рейтингов (всех или одной дисциплины)"""
+    with db_connection() as conn:
+        begin_write(conn)
+        try:
+            count = leaderboards.rebuild(conn, discipline)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_tables('leaderboard_entries')
+    return count
 
 def get_user_by_username(username: str):
     """Получение пользователя по логину"""
-    query = "SELECT * FROM users WHERE username = ?"
-    result = execute_query(query, [username])
-    return result.to_dict('records')[0] if not result.empty else None
+    return fetch_one("SELECT * FROM users WHERE username = ?", [username], row_type='dict')
 
 def get_total_athletes():
     """Общее количество спортсменов"""
-    result = execute_query("SELECT COUNT(*) as count FROM athletes WHERE program_status = 'active'")
-    return result['count'][0] if not result.empty else 0
+    return fetch_scalar("SELECT COUNT(*) FROM athletes WHERE program_status = 'active'", default=0)
 
 def get_total_competitions():
-    """Общее количество соревнований"""
-    result = execute_query("SELECT COUNT(*) as count FROM sport_results")
-    return result['count'][0] if not result.empty else 0
+    """Общее количество соревнований (с архивом)"""
+    return fetch_scalar(
+        f"""SELECT (SELECT COUNT(*) FROM sport_results)
+                 + (SELECT COUNT(*) FROM {archive.ARCHIVE_TABLE})""",
+        default=0
+    )
+
+# ==================== СВОДКА ДЛЯ ДАШБОРДОВ ====================
+
+# Срок жизни сводки в кэше: запись в этом процессе сбрасывает её сразу,
+# запись других процессов (импорт, архивирование) - через DASHBOARD_TTL секунд
+DASHBOARD_TTL = float(os.getenv('DASHBOARD_TTL', '300'))
+DASHBOARD_NEW_DAYS = 30  # "новые" спортсмены - добавленные за столько дней
+DASHBOARD_PLACES = 10    # распределение мест - места с 1 по DASHBOARD_PLACES
+UNKNOWN_LABEL = 'Не указан'
+
+@dataclass(frozen=True)
+class DashboardAggregates:
+    """
+    Сводка для главной и аналитики. Счётчики спортсменов - по активным,
+    результаты - из athlete_stats (вся история, включая архив).
+    """
+    by_sport: pd.DataFrame   # sport (индекс), athletes, male, female, results, coaches
+    by_region: pd.DataFrame  # region (индекс), athletes, results
+    by_gender: pd.Series     # пол -> число спортсменов
+    places: pd.Series        # место -> число результатов
+    total_athletes: int
+    new_athletes: int
+    total_results: int
+    total_coaches: int
+
+# Один проход по athletes: счётчики по всем сочетаниям вида спорта, региона,
+# пола и статуса; разрезы для интерфейса складываются из этого куба в pandas
+_DASHBOARD_CUBE = """
+    SELECT a.sport_id, a.region_id, a.gender, a.program_status,
+           COUNT(*) AS athletes,
+           SUM(CASE WHEN a.created_at >= ? THEN 1 ELSE 0 END) AS new_athletes,
+           COALESCE(SUM(s.total_competitions), 0) AS results
+    FROM athletes a
+    LEFT JOIN athlete_stats s ON s.athlete_id = a.id
+    GROUP BY a.sport_id, a.region_id, a.gender, a.program_status
+"""
+
+_DASHBOARD_COACHES = "SELECT sport_id, COUNT(*) AS coaches FROM coaches GROUP BY sport_id"
+
+# Все результаты, в том числе спортсменов, которых уже нет в реестре
+_DASHBOARD_RESULTS = "SELECT COALESCE(SUM(total_competitions), 0) AS results FROM athlete_stats"
+
+def _dashboard_places():
+    """Число результатов по местам 1..DASHBOARD_PLACES за всю историю"""
+    df = cached_query(
+        f"""SELECT place, COUNT(*) AS results FROM {archive.RESULTS_VIEW}
+            WHERE place BETWEEN 1 AND ? GROUP BY place ORDER BY place""",
+        [DASHBOARD_PLACES], ttl=DASHBOARD_TTL
+    )
+    return pd.Series(df['results'].astype(int).values, index=df['place'].astype(int).values)
+
+def _named(ids: pd.Series, names: pd.DataFrame) -> pd.Series:
+    """id справочника -> название; пустой или неизвестный id - UNKNOWN_LABEL"""
+    mapping = dict(zip(names['id'], names['name']))
+    return ids.map(mapping).fillna(UNKNOWN_LABEL)
+
+# Таблицы, из которых строится сводка: запись в любую сбрасывает готовую сводку
+_DASHBOARD_TABLES = tuple(sorted((
+    'athletes', 'athlete_stats', 'coaches', 'sports', 'regions', archive.RESULTS_VIEW,
+)))
+
+def get_dashboard_aggregates() -> DashboardAggregates:
+    """
+    Сводка по видам спорта, регионам и полу: один GROUP BY по athletes
+    (с athlete_stats) плюс маленькие запросы к справочникам.
+
+    Готовая сводка хранится в кэше запросов под версиями _DASHBOARD_TABLES
+    и с TTL, как и сами запросы: повторный показ не обращается к БД и не
+    пересобирает разрезы в pandas. Возвращается копия, изменять её безопасно.
+    """
+    # Порог с точностью до дня - иначе ключ кэша менялся бы на каждом вызове
+    since = (datetime.now() - timedelta(days=DASHBOARD_NEW_DAYS)).strftime('%Y-%m-%d')
+    key = ('dashboard_aggregates', since)
+    
+    aggregates = _query_cache.get(key)
+    if aggregates is None:
+        versions = _query_cache.versions(_DASHBOARD_TABLES)
+        aggregates = _build_dashboard_aggregates(since)
+        nbytes = sum(
+            int(frame.memory_usage(index=True, deep=True).sum())
+            for frame in (aggregates.by_sport, aggregates.by_region)
+        ) + sum(
+            series.memory_usage(index=True, deep=True)
+            for series in (aggregates.by_gender, aggregates.places)
+        )
+        _query_cache.put(key, aggregates, _DASHBOARD_TABLES, versions, nbytes, DASHBOARD_TTL)
+    
+    return replace(
+        aggregates,
+        by_sport=aggregates.by_sport.copy(), by_region=aggregates.by_region.copy(),
+        by_gender=aggregates.by_gender.copy(), places=aggregates.places.copy(),
+    )
+
+def _build_dashboard_aggregates(since: str) -> DashboardAggregates:
+    """Сводка из запросов (каждый - через кэш с TTL)"""
+    cube = cached_query(_DASHBOARD_CUBE, [since], ttl=DASHBOARD_TTL)
+    coaches = cached_query(_DASHBOARD_COACHES, ttl=DASHBOARD_TTL)
+    sports, regions = get_sports(), get_regions()
+
+    total_results = int(cached_query(_DASHBOARD_RESULTS, ttl=DASHBOARD_TTL)['results'].iloc[0])
+    active = cube[cube['program_status'] == 'active'].assign(
+        sport=lambda df: _named(df['sport_id'], sports),
+        region=lambda df: _named(df['region_id'], regions),
+        male=lambda df: df['athletes'].where(df['gender'] == 'М', 0),
+        female=lambda df: df['athletes'].where(df['gender'] == 'Ж', 0),
+    )
+
+    # Все виды спорта справочника, даже без спортсменов; "Не указан" - только если есть
+    by_sport = (
+        active.groupby('sport')[['athletes', 'male', 'female', 'results']].sum()
+        .reindex(sports['name'].tolist()
+                 + ([UNKNOWN_LABEL] if (active['sport'] == UNKNOWN_LABEL).any() else []),
+                 fill_value=0)
+    )
+    coach_counts = (
+        coaches.assign(sport=_named(coaches['sport_id'], sports)).groupby('sport')['coaches'].sum()
+    )
+    by_sport['coaches'] = coach_counts.reindex(by_sport.index, fill_value=0)
+    by_sport = by_sport.astype(int).rename_axis('sport')
+
+    by_region = (
+        active.groupby('region')[['athletes', 'results']].sum()
+        .astype(int).sort_values('athletes', ascending=False).rename_axis('region')
+    )
+    by_gender = active.groupby('gender')['athletes'].sum().astype(int)
+
+    return DashboardAggregates(
+        by_sport=by_sport,
+        by_region=by_region,
+        by_gender=by_gender,
+        places=_dashboard_places(),
+        total_athletes=int(active['athletes'].sum()),
+        new_athletes=int(active['new_athletes'].sum()),
+        total_results=total_results,
+        total_coaches=int(coaches['coaches'].sum()) if not coaches.empty else 0,
+    )
+
+# ==================== АРХИВ РЕЗУЛЬТАТОВ ====================
+
+# Интервал фонового архивирования в процессе приложения. По умолчанию 0 -
+# выключено: перенос запускает оператор (scripts/db_maintenance.py archive по
+# cron или кнопка в настройках). Включать только в одном процессе сервера.
+ARCHIVE_INTERVAL_HOURS = float(os.getenv('ARCHIVE_INTERVAL_HOURS', '0'))
+ARCHIVE_FIRST_RUN_DELAY = 60  # секунд после старта процесса
+ARCHIVE_BATCH_PAUSE = 0.05  # пауза между пачками, чтобы не держать запись
+# Номер advisory-блокировки PostgreSQL для пачек архивирования
+ARCHIVE_LOCK_KEY = 7_241_002
+
+_archive_logger = logging.getLogger('olympic_reserve.archive')
+
+def archive_old_results(horizon_days=None, batch_size=archive.ARCHIVE_BATCH_SIZE, max_batches=None):
+    """
+    Перенос результатов старше horizon_days в архив пачками по batch_size
+    (каждая - своя транзакция). Незавершённый запуск продолжается с его
+    порогом даты; max_batches ограничивает работу за один вызов.
+
+    Returns:
+        dict: run_id, moved (за этот вызов), finished
+    """
+    with db_connection() as conn:
+        begin_write(conn, lock_key=ARCHIVE_LOCK_KEY)
+        try:
+            run_id = archive.current_run(conn)
+            if run_id is None:
+                run_id = archive.start_run(conn, archive.cutoff_for(horizon_days))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        moved_total, batches, more = 0, 0, True
+        while more and (max_batches is None or batches < max_batches):
+            begin_write(conn, lock_key=ARCHIVE_LOCK_KEY)
+            try:
+                moved, more = archive.move_batch(conn, run_id, batch_size)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            moved_total += moved
+            batches += 1
+            if moved:
+                invalidate_tables('sport_results', archive.ARCHIVE_TABLE)
+            if more:
+                time.sleep(ARCHIVE_BATCH_PAUSE)
+        
+        if moved_total:
+            # Горячая таблица уменьшилась - обновляем статистику планировщика
+            conn.execute("ANALYZE sport_results")
+            conn.commit()
+    invalidate_tables('archive_runs')
+    return {'run_id': run_id, 'moved': moved_total, 'finished': not more}
+
+def get_archive_status():
+    """Размеры горячей таблицы и архива, последние запуски архивирования"""
+    hot = fetch_scalar("SELECT COUNT(*) FROM sport_results", default=0)
+    cold = fetch_scalar(f"SELECT COUNT(*) FROM {archive.ARCHIVE_TABLE}", default=0)
+    runs = cached_query(
+        """SELECT id, cutoff_date, status, moved, last_id, started_at, finished_at
+           FROM archive_runs ORDER BY id DESC LIMIT 10"""
+    )
+    return {'hot': hot, 'archived': cold, 'runs': runs}
+
+_archive_thread = None
+_archive_thread_lock = threading.Lock()
+
+def _archive_loop(interval_hours):
+    time.sleep(ARCHIVE_FIRST_RUN_DELAY)
+    while True:
+        try:
+            result = archive_old_results()
+            _archive_logger.info("archive run %(run_id)s: moved %(moved)s", result)
+        except Exception:
+            _archive_logger.exception("archive run failed")
+        time.sleep(interval_hours * 3600)
+
+def start_archive_scheduler(interval_hours=ARCHIVE_INTERVAL_HOURS):
+    """
+    Фоновый поток архивирования: первый запуск через минуту после старта,
+    затем раз в interval_hours. Не запускается, пока ARCHIVE_INTERVAL_HOURS
+    не задан явно (> 0) - переменную выставляют одному выделенному процессу.
+    Один поток на процесс; если процессов с планировщиком всё же несколько,
+    пачки сериализуются блокировкой записи.
+    """
+    global _archive_thread
+    if interval_hours <= 0:
+        return None
+    with _archive_thread_lock:
+        if _archive_thread is None or not _archive_thread.is_alive():
+            _archive_thread = threading.Thread(
+                target=_archive_loop, args=(interval_hours,),
+                name='results-archiver', daemon=True
+            )
+            _archive_thread.start()
+    return _archive_thread
+
+# ==================== ЖУРНАЛ ДЕЙСТВИЙ ====================
+
+# Глагол запроса -> действие журнала
+_AUDIT_ACTIONS = {'INSERT': audit.CREATE, 'UPDATE': audit.UPDATE, 'DELETE': audit.DELETE}
+
+AUDIT_PAGE_SIZE = 50
+
+def _audit_action(query: str) -> str:
+    verb = query.lstrip().split(None, 1)[0].upper()
+    return _AUDIT_ACTIONS.get(verb, audit.UPDATE)
+
+def _audit_actor():
+    """(id, логин, IP) пользователя текущей сессии; вне сессии Streamlit - пусто"""
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+    if ctx is None:
+        return None, None, None
+    user = st.session_state.get('user') or {}
+    try:
+        ip_address = st.context.ip_address
+    except AttributeError:  # старые версии Streamlit
+        ip_address = None
+    if not isinstance(ip_address, str):  # нет адреса (тестовый запуск, не веб-сессия)
+        ip_address = None
+    return user.get('id'), user.get('username'), ip_address
+
+def _write_audit_batch(rows):
+    """Пачка событий журнала - одна транзакция (вызывается потоком записи)"""
+    with db_connection() as conn:
+        begin_write(conn)
+        try:
+            with track_query(conn, audit.INSERT, rows) as tracked:
+                execute_batch(conn, audit.INSERT, rows)
+                tracked.rows = len(rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_tables('audit_logs')
+
+_audit_writer = audit.AuditWriter(_write_audit_batch)
+
+def audit_event(action, table_name, record_id=None, changes=None):
+    """
+    Событие в журнал действий. Запись идёт в фоне пачками, вызывающий
+    код её не ждёт. Для чтений по спортсмену record_id - id спортсмена.
+
+    Returns:
+        False, если журнал выключен или событие отброшено из-за переполнения
+    """
+    if not AUDIT_ENABLED or (action == audit.READ and not AUDIT_READS):
+        return False
+    user_id, username, ip_address = _audit_actor()
+    row = audit.make_row(action, table_name, record_id, changes, user_id, username, ip_address)
+    # Чтения при переполнении не тормозят страницу, изменения - ждут места
+    return _audit_writer.enqueue(row, block=action != audit.READ)
+
+def flush_audit_log(timeout=audit.AUDIT_SHUTDOWN_TIMEOUT):
+    """Дописать очередь журнала в БД (True - успели за timeout секунд)"""
+    return _audit_writer.flush(timeout)
+
+def get_audit_stats():
+    """Состояние очереди журнала: длина, записано, отброшено, ошибки"""
+    return _audit_writer.stats()
+
+def get_audit_log_page(cursor=None, page_size=AUDIT_PAGE_SIZE, action=None, table_name=None,
+                       username=None, record_id=None):
+    """
+    Страница журнала (новые первыми) с keyset-пагинацией по id.
+    Фильтры совпадают с индексами audit_logs; cursor - id последней
+    строки предыдущей страницы.
+
+    Returns:
+        (DataFrame страницы, курсор следующей страницы или None)
+    """
+    conditions, params = [], []
+    for column, value in (('action', action), ('table_name', table_name),
+                          ('username', username), ('record_id', record_id)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if cursor is not None:
+        conditions.append("id < ?")
+        params.append(int(cursor))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    # Журнал пополняется каждую секунду - читаем мимо кэша запросов
+    page = execute_query(
+        f"""SELECT id, timestamp, username, user_id, action, table_name, record_id,
+                   changes, ip_address
+            FROM audit_logs {where}
+            ORDER BY id DESC LIMIT ?""",
+        params + [int(page_size) + 1]
+    )
+    if len(page) <= page_size:
+        return page, None
+    page = page.iloc[:page_size]
+    return page, int(page.iloc[-1]['id'])
+
+# ==================== ПРОФИЛЬ СПОРТСМЕНА ====================
+
+_profile_executor = None
+_profile_executor_lock = threading.Lock()
+
+def _get_profile_executor():
+    """Общий для процесса пул потоков загрузки профилей"""
+    global _profile_executor
+    if _profile_executor is None:
+        with _profile_executor_lock:
+            if _profile_executor is None:
+                _profile_executor = ThreadPoolExecutor(
+                    max_workers=PROFILE_LOADER_WORKERS,
+                    thread_name_prefix='profile-loader'
+                )
+    return _profile_executor
+
+def submit_with_context(func, *args, executor=None):
+    """
+    Запуск функции в пуле потоков (по умолчанию - в общем пуле загрузки
+    профилей). Контекст скрипта Streamlit передаётся в поток, чтобы
+    st.error из слоя данных попадал на страницу.
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    
+    def run():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args)
+    
+    return (executor or _get_profile_executor()).submit(run)
+
+def _profile_loaders(athlete_id, results_limit):
+    """Часть профиля -> (функция, аргументы)"""
+    return {
+        'athlete': (get_athlete_by_id, athlete_id),
+        'results': (get_sport_results, athlete_id, results_limit),
+        'statistics': (get_athlete_statistics, athlete_id),
+        'monthly': (get_athlete_dynamics, athlete_id, 'month'),
+        'seasons': (get_athlete_dynamics, athlete_id, 'season'),
+        'progress': (get_athlete_discipline_progress, athlete_id),
+        'medical_data': (get_medical_data, athlete_id),
+        'functional_tests': (get_functional_tests, athlete_id),
+        'development_plans': (get_development_plans, athlete_id),
+    }
+
+def load_profile_parts(athlete_id: int, parts, results_limit=100) -> dict:
+    """
+    Параллельная загрузка частей профиля, нужных открытой вкладке: каждый
+    запрос идёт в своём потоке на своём соединении из пула, поэтому время
+    загрузки определяется самым медленным запросом, а не суммой всех.
+    parts - имена из _profile_loaders (athlete, results, statistics, ...);
+    возвращается словарь имя -> данные.
+    """
+    loaders = _profile_loaders(athlete_id, results_limit)
+    futures = {name: submit_with_context(*loaders[name]) for name in parts}
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,48 @@
+"""
+Фрагменты страниц: панели фильтров с таблицами
+
+Изменение виджета обычно перезапускает весь скрипт: боковую панель,
+заголовки, запросы и графики всей страницы. Функция, обёрнутая в
+fragment(), перезапускается одна (st.fragment): панель фильтров вместе с
+таблицей, которую она строит, пересчитывает только эту таблицу.
+
+Ввод в панели фильтров собирается формой (filter_panel): правка
+нескольких фильтров, набор фамилии и т.п. не запускают запрос на каждое
+изменение - значения применяются вместе кнопкой или Enter.
+
+Переход по страницам таблицы внутри фрагмента - rerun_fragment(), а не
+st.rerun(): иначе перезапустится весь скрипт. Переход на другую страницу
+приложения (например, открыть профиль) - по-прежнему st.rerun().
+
+Streamlit без st.fragment: функция выполняется как обычно, с полным
+перезапуском; поведение страницы то же.
+"""
+
+from contextlib import contextmanager
+
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+def fragment(func):
+    """Функция-фрагмент: её виджеты перезапускают только её"""
+    return _fragment(func) if _fragment else func
+
+def rerun_fragment():
+    """Перезапуск текущего фрагмента (без st.fragment - всего скрипта)"""
+    if getattr(st, 'fragment', None):
+        try:
+            st.rerun(scope='fragment')
+        except StreamlitAPIException:
+            # Фрагмент выполняется в составе полного перезапуска скрипта
+            # (первая отрисовка страницы), а не своего: перезапуск - целиком
+            pass
+    st.rerun()
+
+@contextmanager
+def filter_panel(key: str, submit_label="🔍 Применить"):
+    """Форма фильтров: значения виджетов внутри применяются одним перезапуском"""
+    with st.form(key, border=False):
+        yield
+        st.form_submit_button(submit_label)
@@ -0,0 +1,113 @@
+"""
+Ленивые вкладки страниц
+
+st.tabs выполняет тела всех вкладок на каждом rerun, хотя видна одна.
+lazy_tabs рисует переключатель (горизонтальный st.radio) и вызывает
+render только у активной вкладки: загрузка данных и графики остальных
+не выполняются. Выбор хранится в st.session_state['<key>_active'] и
+сохраняется при переходе на другие страницы (состояние самого виджета
+Streamlit удаляет, если виджет не был показан на очередном rerun).
+
+После отрисовки активной вкладки соседние (слева и справа) предзагружаются
+в фоне: их prefetch() прогревает кэш запросов и кэш графиков, поэтому
+переход на соседнюю вкладку не ждёт БД и matplotlib. prefetch выполняется
+без контекста скрипта Streamlit: к её завершению сессия может выполнять уже
+другой rerun, поэтому st.* в ней ничего не показывает (st.error из слоя
+данных только попадает в лог), а ошибки самой prefetch пишутся в лог
+olympic_reserve.lazy_tabs. Каждая вкладка предзагружается один раз для
+данного token (например, id спортсмена); в сессии хранятся только вкладки
+текущего token, поэтому состояние не растёт с числом открытых профилей.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import streamlit as st
+
+LAZY_TABS_PREFETCH_WORKERS = int(os.getenv('LAZY_TABS_PREFETCH_WORKERS', '2'))
+
+_logger = logging.getLogger('olympic_reserve.lazy_tabs')
+
+@dataclass(frozen=True)
+class LazyTab:
+    """Вкладка: подпись, отрисовка и (необязательно) фоновая предзагрузка"""
+    label: str
+    render: Callable[[], None]
+    prefetch: Optional[Callable[[], None]] = None
+
+# Отдельный пул: предзагрузка сама загружает профиль через общий пул
+# database.py и ждёт его, поэтому в одном пуле они могли бы заблокировать
+# друг друга
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+
+def _get_prefetch_executor():
+    global _prefetch_executor
+    if _prefetch_executor is None:
+        with _prefetch_executor_lock:
+            if _prefetch_executor is None:
+                _prefetch_executor = ThreadPoolExecutor(
+                    max_workers=LAZY_TABS_PREFETCH_WORKERS,
+                    thread_name_prefix='tab-prefetch'
+                )
+    return _prefetch_executor
+
+def _log_failure(future):
+    """Ошибка фоновой предзагрузки - в лог (результат future никто не ждёт)"""
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        _logger.error("Ошибка предзагрузки вкладки", exc_info=error)
+
+def _prefetch(tab: LazyTab, key: str, token):
+    """Фоновая предзагрузка вкладки, если для token её ещё не было"""
+    state_key = f"{key}_prefetched"
+    # (token, подписи вкладок): при смене token набор начинается заново
+    prefetched = st.session_state.get(state_key)
+    if prefetched is None or prefetched[0] != token:
+        prefetched = st.session_state[state_key] = (token, set())
+    done = prefetched[1]
+    if tab.prefetch is None or tab.label in done:
+        return
+    done.add(tab.label)
+    # Без submit_with_context: prefetch ничего не рисует, а контекст
+    # запустившего её rerun к этому времени может быть уже чужим
+    future = _get_prefetch_executor().submit(tab.prefetch)
+    future.add_done_callback(_log_failure)
+
+def lazy_tabs(tabs, key: str, token=None) -> str:
+    """
+    Переключатель вкладок; выполняется только активная вкладка.
+
+    Args:
+        tabs: список LazyTab
+        key: ключ виджета и состояния в st.session_state
+        token: значение, при смене которого соседние вкладки
+            предзагружаются заново (например, id спортсмена)
+
+    Returns:
+        Подпись активной вкладки
+    """
+    labels = [tab.label for tab in tabs]
+    state_key = f"{key}_active"
+    saved = st.session_state.get(state_key)
+
+    active = st.radio(
+        "Раздел", labels,
+        index=labels.index(saved) if saved in labels else 0,
+        key=key, horizontal=True, label_visibility='collapsed'
+    )
+    st.session_state[state_key] = active
+
+    position = labels.index(active)
+    tabs[position].render()
+
+    for neighbour in (position + 1, position - 1):
+        if 0 <= neighbour < len(tabs):
+            _prefetch(tabs[neighbour], key, token)
+    return active
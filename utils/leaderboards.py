@@ -0,0 +1,246 @@
+"""
+Рейтинги дисциплин (таблица leaderboard_entries)
+
+Партиция рейтинга - пара (дисциплина, сезон); сезон - календарный год
+даты соревнования, SEASON_ALL - за всё время. В партиции хранится лучший
+результат каждого спортсмена, попавшего в топ LEADERBOARD_DEPTH общего
+зачёта (place) или зачёта своего пола (gender_place). Место вне топа
+хранится как NULL, строка без обоих мест удаляется.
+
+score - результат, приведённый к "меньше - лучше" (для дисциплин, где
+больше - лучше, со знаком минус); места считаются RANK() по score,
+равные результаты делят место.
+
+Новый результат затрагивает только две партиции: свой сезон и SEASON_ALL.
+Строка спортсмена обновляется, только если результат строго лучше, после
+чего места пересчитываются по строкам этой партиции (их не больше
+нескольких LEADERBOARD_DEPTH), а не по всем результатам дисциплины.
+Так можно: чужие лучшие результаты не менялись, значит в топ мог войти
+только этот спортсмен, а выпасть - только те, кто уже в таблице.
+
+Удаление и правка результатов, смена пола спортсмена - через rebuild().
+
+Функции модуля принимают открытое соединение и работают внутри
+транзакции вызывающего кода.
+"""
+
+import pandas as pd
+
+from utils import archive
+from utils.db_backend import execute_batch
+
+# Глубина рейтинга; после изменения нужен rebuild()
+LEADERBOARD_DEPTH = 1000
+
+SEASON_ALL = 'all'
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS leaderboard_entries (
+    discipline TEXT NOT NULL,
+    season TEXT NOT NULL,
+    athlete_id INTEGER NOT NULL,
+    gender TEXT NOT NULL DEFAULT '',
+    score REAL NOT NULL,
+    best_value REAL NOT NULL,
+    result_unit TEXT,
+    result_id INTEGER NOT NULL,
+    competition_date DATE,
+    place INTEGER,
+    gender_place INTEGER,
+    PRIMARY KEY (discipline, season, athlete_id)
+);
+"""
+
+CREATE_INDEXES = [
+    """CREATE INDEX IF NOT EXISTS idx_leaderboard_place
+       ON leaderboard_entries (discipline, season, place)""",
+    """CREATE INDEX IF NOT EXISTS idx_leaderboard_gender_place
+       ON leaderboard_entries (discipline, season, gender, gender_place)""",
+]
+
+# Пол берётся из athletes в момент записи
+_UPSERT_IF_BETTER = """
+INSERT INTO leaderboard_entries
+    (discipline, season, athlete_id, gender, score, best_value, result_unit,
+     result_id, competition_date)
+VALUES (?, ?, ?, COALESCE((SELECT gender FROM athletes WHERE id = ?), ''), ?, ?, ?, ?, ?)
+ON CONFLICT (discipline, season, athlete_id) DO UPDATE SET
+    score = excluded.score,
+    best_value = excluded.best_value,
+    result_unit = excluded.result_unit,
+    result_id = excluded.result_id,
+    competition_date = excluded.competition_date
+WHERE excluded.score < leaderboard_entries.score
+"""
+
+_RERANK = """
+UPDATE leaderboard_entries SET
+    place = CASE WHEN ranked.place <= ? THEN ranked.place END,
+    gender_place = CASE WHEN ranked.gender_place <= ? THEN ranked.gender_place END
+FROM (
+    SELECT athlete_id,
+           RANK() OVER (ORDER BY score) AS place,
+           RANK() OVER (PARTITION BY gender ORDER BY score) AS gender_place
+    FROM leaderboard_entries
+    WHERE discipline = ? AND season = ?
+) AS ranked
+WHERE leaderboard_entries.discipline = ? AND leaderboard_entries.season = ?
+  AND leaderboard_entries.athlete_id = ranked.athlete_id
+"""
+
+_TRIM = """
+DELETE FROM leaderboard_entries
+WHERE discipline = ? AND season = ? AND place IS NULL AND gender_place IS NULL
+"""
+
+def season_of(competition_date):
+    """Сезон результата: год даты ('2024-03-01' -> '2024'), None без даты"""
+    if competition_date is None or pd.isna(competition_date):
+        return None
+    return str(competition_date)[:4]
+
+def _score(value, lower_is_better):
+    return value if lower_is_better else -value
+
+def _rerank(conn, discipline, season):
+    """Места внутри одной партиции и удаление выпавших из топа"""
+    conn.execute(_RERANK, (LEADERBOARD_DEPTH, LEADERBOARD_DEPTH, discipline, season, discipline, season))
+    conn.execute(_TRIM, (discipline, season))
+
+# ==================== ОДИН РЕЗУЛЬТАТ ====================
+
+def record(conn, result_id, athlete_id, discipline, value, unit, competition_date,
+           lower_is_better=True) -> int:
+    """
+    Учёт нового результата в рейтингах его сезона и за всё время.
+
+    Returns:
+        Число пересчитанных партиций (0 - результат ничего не улучшил)
+    """
+    if value is None or discipline is None:
+        return 0
+
+    refreshed = 0
+    score = _score(value, lower_is_better)
+    for season in (season_of(competition_date), SEASON_ALL):
+        if season is None:
+            continue
+        row = conn.execute(
+            _UPSERT_IF_BETTER + " RETURNING athlete_id",
+            (discipline, season, athlete_id, athlete_id, score, value, unit,
+             result_id, competition_date)
+        ).fetchone()
+        if row is not None:
+            _rerank(conn, discipline, season)
+            refreshed += 1
+    return refreshed
+
+# ==================== ПАЧКА РЕЗУЛЬТАТОВ ====================
+
+def record_bulk(conn, results: pd.DataFrame, directions: dict) -> int:
+    """
+    Учёт пачки новых результатов: лучший результат спортсмена в каждой
+    партиции выбирается в pandas, записывается одним executemany, затем
+    пересчитываются места только затронутых партиций.
+
+    results - колонки id, athlete_id, discipline, result_value, result_unit,
+    competition_date; directions - дисциплина -> lower_is_better.
+
+    Returns:
+        Число пересчитанных партиций
+    """
+    frame = results.dropna(subset=['result_value', 'discipline'])
+    if frame.empty:
+        return 0
+
+    lower = frame['discipline'].map(directions).fillna(1).astype(bool)
+    frame = frame.assign(score=frame['result_value'].where(lower, -frame['result_value']))
+    seasons = frame['competition_date'].map(season_of)
+    frame = pd.concat([
+        frame.assign(season=seasons).dropna(subset=['season']),
+        frame.assign(season=SEASON_ALL),
+    ], ignore_index=True)
+    best = (
+        frame.sort_values(['score', 'id'])
+        .drop_duplicates(['discipline', 'season', 'athlete_id'])
+    )
+
+    def values(column):
+        return best[column].astype(object).where(best[column].notna(), None).tolist()
+
+    athlete_ids = [int(x) for x in best['athlete_id']]
+    execute_batch(conn, _UPSERT_IF_BETTER, list(zip(
+        values('discipline'), values('season'), athlete_ids, athlete_ids,
+        values('score'), values('result_value'), values('result_unit'),
+        [int(x) for x in best['id']], values('competition_date')
+    )))
+
+    partitions = best[['discipline', 'season']].drop_duplicates()
+    for discipline, season in partitions.itertuples(index=False):
+        _rerank(conn, discipline, season)
+    return len(partitions)
+
+# ==================== ПОЛНЫЙ ПЕРЕСЧЁТ ====================
+
+# Лучший результат спортсмена в партиции (ROW_NUMBER), затем места (RANK);
+# {source} - вся история результатов, {where} ограничивает дисциплину
+_RECOMPUTE = """
+INSERT INTO leaderboard_entries
+    (discipline, season, athlete_id, gender, score, best_value, result_unit,
+     result_id, competition_date, place, gender_place)
+SELECT discipline, season, athlete_id, gender, score, result_value, result_unit,
+       id, competition_date,
+       CASE WHEN place <= {depth} THEN place END,
+       CASE WHEN gender_place <= {depth} THEN gender_place END
+FROM (
+    SELECT best.*,
+           RANK() OVER (PARTITION BY discipline, season ORDER BY score) AS place,
+           RANK() OVER (PARTITION BY discipline, season, gender ORDER BY score) AS gender_place
+    FROM (
+        SELECT scored.*,
+               ROW_NUMBER() OVER (
+                   PARTITION BY discipline, season, athlete_id ORDER BY score, id
+               ) AS rn
+        FROM (
+            SELECT r.discipline,
+                   CASE WHEN k.all_time = 1 THEN '{season_all}'
+                        ELSE SUBSTR(CAST(r.competition_date AS TEXT), 1, 4) END AS season,
+                   r.athlete_id, COALESCE(a.gender, '') AS gender,
+                   CASE WHEN COALESCE(d.lower_is_better, 1) = 1
+                        THEN r.result_value ELSE -r.result_value END AS score,
+                   r.result_value, r.result_unit, r.id, r.competition_date
+            FROM {source} r
+            -- каждый результат попадает в свой сезон и в партицию за всё время
+            JOIN (SELECT 0 AS all_time UNION ALL SELECT 1) k
+              ON k.all_time = 1 OR r.competition_date IS NOT NULL
+            LEFT JOIN athletes a ON a.id = r.athlete_id
+            LEFT JOIN disciplines d ON d.name = r.discipline
+            WHERE r.result_value IS NOT NULL AND r.discipline IS NOT NULL {where}
+        ) scored
+    ) best
+    WHERE rn = 1
+) ranked
+WHERE place <= {depth} OR gender_place <= {depth}
+"""
+
+def rebuild(conn, discipline=None) -> int:
+    """
+    Полный пересчёт рейтингов (всех или одной дисциплины).
+
+    Returns:
+        Число строк рейтингов
+    """
+    where, params = '', ()
+    if discipline is not None:
+        where, params = 'AND r.discipline = ?', (discipline,)
+        conn.execute("DELETE FROM leaderboard_entries WHERE discipline = ?", params)
+    else:
+        conn.execute("DELETE FROM leaderboard_entries")
+    conn.execute(
+        _RECOMPUTE.format(
+            depth=LEADERBOARD_DEPTH, season_all=SEASON_ALL, where=where,
+            source=archive.results_source(conn)
+        ),
+        params
+    )
+    return conn.execute("SELECT COUNT(*) FROM leaderboard_entries").fetchone()[0]
@@ -0,0 +1,222 @@
+"""
+Версионные миграции схемы БД
+
+Каждая миграция применяется ровно один раз и записывается в таблицу
+schema_version. Миграции накатываются по возрастанию версии, каждая -
+в своей транзакции, поэтому их безопасно запускать на уже существующем
+olympic_reserve.db: применятся только недостающие.
+
+Шаг миграции - строка SQL или функция, принимающая соединение.
+DDL пишется в диалекте SQLite и переводится для PostgreSQL
+(utils/db_backend.adapt_ddl); шаги, которые так не перевести,
+оформляются функциями и сами смотрят на диалект соединения.
+"""
+
+from utils import (
+    archive, athlete_rollups, athlete_stats, audit, leaderboards, personal_bests,
+    reference_data, result_values
+)
+from utils.db_backend import adapt_ddl, begin_write, column_exists, relation_exists
+
+# Номер advisory-блокировки PostgreSQL, сериализующей миграции процессов
+MIGRATION_LOCK_KEY = 7_241_001
+
+def add_column(table, column, declaration):
+    """Шаг миграции: ADD COLUMN, если колонки ещё нет"""
+    def step(conn):
+        if not column_exists(conn, table, column):
+            conn.execute(adapt_ddl(conn, f"ALTER TABLE {table} ADD COLUMN {column} {declaration}"))
+    return step
+
+# ==================== СПИСОК МИГРАЦИЙ ====================
+
+MIGRATIONS = [
+    (1, 'Вторичные индексы для профиля, списков и статистики', [
+        # Результаты спортсмена по дате (профиль, динамика)
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_athlete_date
+           ON sport_results (athlete_id, competition_date DESC, id DESC)""",
+        # Покрывающий индекс для COUNT / SUM(is_personal_best) / AVG(place)
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_athlete_stats
+           ON sport_results (athlete_id, is_personal_best, place)""",
+        # Лента последних результатов
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_date
+           ON sport_results (competition_date DESC, id DESC)""",
+        # Личные рекорды - малая доля строк, поэтому частичный индекс
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_personal_best
+           ON sport_results (athlete_id, competition_date DESC)
+           WHERE is_personal_best = 1""",
+        # Список спортсменов: фильтр по статусу + сортировка по ФИО
+        """CREATE INDEX IF NOT EXISTS idx_athletes_status_name
+           ON athletes (program_status, last_name, first_name)""",
+        """CREATE INDEX IF NOT EXISTS idx_athletes_name
+           ON athletes (last_name, first_name)""",
+        """CREATE INDEX IF NOT EXISTS idx_medical_data_athlete_date
+           ON medical_data (athlete_id, examination_date DESC)""",
+        """CREATE INDEX IF NOT EXISTS idx_functional_tests_athlete_date
+           ON functional_tests (athlete_id, test_date DESC)""",
+        """CREATE INDEX IF NOT EXISTS idx_development_plans_athlete_date
+           ON development_plans (athlete_id, plan_date DESC)""",
+    ]),
+    (2, 'Материализованная статистика спортсменов athlete_stats', [
+        athlete_stats.CREATE_TABLE,
+        *athlete_stats.CREATE_INDEXES,
+        athlete_stats.create_triggers,
+        athlete_stats.rebuild,
+    ]),
+    (3, 'Вид спорта куратора в users', [
+        add_column('users', 'sport_id', 'INTEGER REFERENCES sports(id)'),
+    ]),
+    (4, 'Числовые результаты (result_value, result_unit) и справочник дисциплин', [
+        result_values.CREATE_TABLE,
+        add_column('sport_results', 'result_value', 'REAL'),
+        add_column('sport_results', 'result_unit', 'TEXT'),
+        result_values.seed_catalog,
+        result_values.backfill,
+        # Лучшие результаты и рейтинги внутри дисциплины
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_discipline_value
+           ON sport_results (discipline, result_value)""",
+    ]),
+    (5, 'Личные рекорды personal_bests', [
+        personal_bests.CREATE_TABLE,
+        # Перенос флага рекорда больше не пересчитывает athlete_stats целиком
+        athlete_stats.recreate_triggers,
+        personal_bests.rebuild,
+    ]),
+    (6, 'Рейтинги дисциплин leaderboard_entries', [
+        leaderboards.CREATE_TABLE,
+        *leaderboards.CREATE_INDEXES,
+        leaderboards.rebuild,
+    ]),
+    (7, 'Помесячные и посезонные итоги спортсменов', [
+        *athlete_rollups.CREATE_TABLES,
+        athlete_rollups.rebuild,
+    ]),
+    (8, 'Архив результатов sport_results_archive и представление sport_results_all', [
+        archive.CREATE_TABLE,
+        *archive.CREATE_INDEXES,
+        archive.CREATE_RUNS_TABLE,
+        archive.create_view,
+        # Пересчёт статистики - по всей истории, перенос в архив - не удаление
+        athlete_stats.recreate_triggers,
+    ]),
+    (9, 'Журнал действий audit_logs', [
+        audit.CREATE_TABLE,
+        *audit.CREATE_INDEXES,
+    ]),
+    (10, 'Вид спорта, регион и тренер спортсмена; справочник тренеров', [
+        reference_data.CREATE_COACHES_TABLE,
+        add_column('athletes', 'sport_id', 'INTEGER REFERENCES sports(id)'),
+        add_column('athletes', 'region_id', 'INTEGER REFERENCES regions(id)'),
+        add_column('athletes', 'coach_id', 'INTEGER REFERENCES coaches(id)'),
+        *reference_data.CREATE_INDEXES,
+        reference_data.seed,
+    ]),
+    (11, 'Индексы фильтров и порядков страницы результатов', [
+        # Фильтр по соревнованию + порядок по дате; DISTINCT для фильтров
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_competition_date
+           ON sport_results (competition_name, competition_date DESC, id DESC)""",
+        # Порядок и диапазон по месту
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_place
+           ON sport_results (place, id)""",
+        # Порядок по спортсмену: внешний цикл - idx_athletes_name
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_athlete_id
+           ON sport_results (athlete_id, id)""",
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_archive_competition_date
+           ON sport_results_archive (competition_name, competition_date DESC, id DESC)""",
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_archive_place
+           ON sport_results_archive (place, id)""",
+        """CREATE INDEX IF NOT EXISTS idx_sport_results_archive_athlete_id
+           ON sport_results_archive (athlete_id, id)""",
+    ]),
+    (12, 'Единый справочник видов спорта и регионов; ссылки старых спортсменов', [
+        reference_data.seed,
+        reference_data.merge_legacy_catalog,
+        reference_data.backfill_athletes,
+    ]),
+    (13, 'Действующие личные рекорды - только в горячей таблице', [
+        personal_bests.repair_archive,
+    ]),
+    (14, 'Документы спортсменов documents', [
+        # Таблицу создавал прежний scripts/init_database.py (только PostgreSQL)
+        """CREATE TABLE IF NOT EXISTS documents (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+               document_type VARCHAR(100),
+               file_path VARCHAR(255),
+               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )""",
+        """CREATE INDEX IF NOT EXISTS idx_documents_athlete
+           ON documents (athlete_id, created_at DESC)""",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# ==================== ЗАПУСК МИГРАЦИЙ ====================
+
+def _ensure_version_table(conn):
+    """Создаёт таблицу schema_version, если её ещё нет"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    conn.commit()
+
+def get_schema_version(conn) -> int:
+    """Текущая версия схемы (0 - миграции ещё не применялись)"""
+    _ensure_version_table(conn)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def schema_is_current(conn) -> bool:
+    """Применены ли все миграции (только чтение: таблицу версий не создаёт)"""
+    if not relation_exists(conn, 'schema_version'):
+        return False
+    version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    return version >= LATEST_VERSION
+
+def run_migrations(conn) -> list:
+    """
+    Применяет недостающие миграции и обновляет статистику планировщика.
+
+    Returns:
+        Список применённых версий (пустой, если схема актуальна)
+    """
+    if get_schema_version(conn) >= LATEST_VERSION:
+        return []
+
+    applied = []
+    for version, name, steps in MIGRATIONS:
+        # Блокировка записи сериализует миграции из разных процессов;
+        # версию перечитываем уже под блокировкой
+        begin_write(conn, lock_key=MIGRATION_LOCK_KEY)
+        try:
+            current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+            if version <= current:
+                conn.rollback()
+                continue
+
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(adapt_ddl(conn, step))
+
+            conn.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (version, name)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+
+    if applied:
+        # Новые индексы бесполезны, пока планировщик не знает их селективность
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    return applied
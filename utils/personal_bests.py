@@ -0,0 +1,238 @@
+"""
+Личные рекорды (таблица personal_bests и флаг sport_results.is_personal_best)
+
+personal_bests - индекс "(спортсмен, дисциплина) -> лучший результат".
+Новый результат сравнивается с рекордом одним поиском по первичному ключу
+(O(log n)); если он лучше, рекорд переписывается, флаг is_personal_best
+ставится новому результату и снимается с прежнего. Флаг стоит ровно у
+одного результата на пару (спортсмен, дисциплина) - у действующего рекорда.
+Равный результат рекордом не считается: рекорд остаётся за первым.
+
+Действующий рекорд всегда лежит в горячей таблице sport_results (архив
+рекорды не переносит), поэтому _DEMOTE и _PROMOTE меняют только её.
+Полный пересчёт сохраняет это правило: рекорд, оказавшийся в архиве,
+возвращается в горячую таблицу.
+
+Направление сравнения - lower_is_better из справочника дисциплин
+(для неизвестной дисциплины меньше - лучше, как для времени).
+
+Функции модуля принимают открытое соединение и работают внутри
+транзакции вызывающего кода.
+"""
+
+import pandas as pd
+
+from utils import archive, athlete_stats
+from utils.db_backend import execute_batch
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS personal_bests (
+    athlete_id INTEGER NOT NULL,
+    discipline TEXT NOT NULL,
+    best_value REAL NOT NULL,
+    result_unit TEXT,
+    result_id INTEGER NOT NULL,
+    competition_date DATE,
+    PRIMARY KEY (athlete_id, discipline)
+);
+"""
+
+# Обновление срабатывает, только если новый результат строго лучше
+_UPSERT_IF_BETTER = """
+INSERT INTO personal_bests
+    (athlete_id, discipline, best_value, result_unit, result_id, competition_date)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (athlete_id, discipline) DO UPDATE SET
+    best_value = excluded.best_value,
+    result_unit = excluded.result_unit,
+    result_id = excluded.result_id,
+    competition_date = excluded.competition_date
+WHERE CASE WHEN ? = 1
+           THEN excluded.best_value < personal_bests.best_value
+           ELSE excluded.best_value > personal_bests.best_value
+      END
+"""
+
+# Снятие флага с прежнего рекорда - по частичному индексу is_personal_best = 1
+_DEMOTE = """
+UPDATE sport_results SET is_personal_best = 0
+WHERE athlete_id = ? AND discipline = ? AND is_personal_best = 1 AND id <> ?
+"""
+
+_PROMOTE = "UPDATE sport_results SET is_personal_best = 1 WHERE id = ?"
+
+# ==================== ОДИН РЕЗУЛЬТАТ ====================
+
+def record(conn, result_id, athlete_id, discipline, value, unit, competition_date,
+           lower_is_better=True) -> bool:
+    """
+    Проверка нового результата на личный рекорд.
+
+    Returns:
+        True, если результат стал личным рекордом
+    """
+    if value is None or discipline is None:
+        return False
+
+    # RETURNING отдаёт строку, только если INSERT или UPDATE действительно сработал
+    row = conn.execute(
+        _UPSERT_IF_BETTER + " RETURNING result_id",
+        (athlete_id, discipline, value, unit, result_id, competition_date, int(bool(lower_is_better)))
+    ).fetchone()
+    if row is None:
+        return False
+
+    conn.execute(_DEMOTE, (athlete_id, discipline, result_id))
+    conn.execute(_PROMOTE, (result_id,))
+    return True
+
+# ==================== ПАЧКА РЕЗУЛЬТАТОВ ====================
+
+_BEST_COLUMNS = ['athlete_id', 'discipline', 'best_value', 'result_id']
+
+def _current_bests(conn, athlete_ids):
+    """Действующие рекорды спортсменов пачки (по первичному ключу)"""
+    frames = []
+    athlete_ids = list(athlete_ids)
+    # Ограничение числа параметров в одном запросе SQLite
+    for start in range(0, len(athlete_ids), 500):
+        part = athlete_ids[start:start + 500]
+        rows = conn.execute(
+            f"""SELECT athlete_id, discipline, best_value, result_id FROM personal_bests
+                WHERE athlete_id IN ({', '.join('?' * len(part))})""",
+            part
+        ).fetchall()
+        frames.append(pd.DataFrame([tuple(row) for row in rows], columns=_BEST_COLUMNS))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=_BEST_COLUMNS)
+
+def record_bulk(conn, results: pd.DataFrame, directions: dict) -> int:
+    """
+    Личные рекорды для пачки новых результатов без цикла по строкам.
+
+    results - колонки id, athlete_id, discipline, result_value, result_unit,
+    competition_date; directions - дисциплина -> lower_is_better.
+    Внутри пачки рекордом становится лучший результат пары (при равенстве -
+    с меньшим id), затем он сравнивается с действующим рекордом.
+
+    Returns:
+        Число новых личных рекордов
+    """
+    frame = results.dropna(subset=['result_value', 'discipline'])
+    if frame.empty:
+        return 0
+
+    lower = frame['discipline'].map(directions).fillna(1).astype(bool)
+    # Ключ "чем меньше, тем лучше" для обоих направлений
+    frame = frame.assign(lower=lower, score=frame['result_value'].where(lower, -frame['result_value']))
+    candidates = (
+        frame.sort_values(['score', 'id'])
+        .drop_duplicates(['athlete_id', 'discipline'])
+    )
+
+    current = _current_bests(conn, candidates['athlete_id'].unique().tolist())
+    merged = candidates.merge(current, on=['athlete_id', 'discipline'], how='left')
+    # Пары без рекорда сравниваются с +inf, то есть всегда выигрывают
+    current_score = merged['best_value'].where(merged['lower'], -merged['best_value'])
+    winners = merged[merged['score'] < current_score.fillna(float('inf'))]
+    if winners.empty:
+        return 0
+
+    def values(column):
+        return winners[column].astype(object).where(winners[column].notna(), None).tolist()
+
+    result_ids = [int(x) for x in winners['id']]
+    athlete_ids = [int(x) for x in winners['athlete_id']]
+    disciplines = values('discipline')
+    lowers = [int(x) for x in winners['lower']]
+
+    execute_batch(conn, _UPSERT_IF_BETTER, list(zip(
+        athlete_ids, disciplines, values('result_value'), values('result_unit'),
+        result_ids, values('competition_date'), lowers
+    )))
+    execute_batch(conn, _DEMOTE, list(zip(athlete_ids, disciplines, result_ids)))
+    execute_batch(conn, _PROMOTE, [(result_id,) for result_id in result_ids])
+    return len(winners)
+
+# ==================== ПОЛНЫЙ ПЕРЕСЧЁТ ====================
+
+_RECOMPUTE = """
+INSERT INTO personal_bests
+    (athlete_id, discipline, best_value, result_unit, result_id, competition_date)
+SELECT athlete_id, discipline, result_value, result_unit, id, competition_date
+FROM (
+    SELECT r.athlete_id, r.discipline, r.result_value, r.result_unit, r.id, r.competition_date,
+           ROW_NUMBER() OVER (
+               PARTITION BY r.athlete_id, r.discipline
+               ORDER BY CASE WHEN COALESCE(d.lower_is_better, 1) = 1
+                             THEN r.result_value ELSE -r.result_value END,
+                        r.id
+           ) AS rn
+    FROM {source} r
+    LEFT JOIN disciplines d ON d.name = r.discipline
+    WHERE r.result_value IS NOT NULL AND r.discipline IS NOT NULL
+) ranked
+WHERE rn = 1
+"""
+
+def _restore_archived_bests(conn):
+    """
+    Возвращает в горячую таблицу рекорды, которые пересчёт нашёл в архиве
+    (например, после удаления прежнего рекорда), и снимает флаги с
+    остальных строк архива. Затронутым спортсменам athlete_stats
+    пересчитывается: вставка в sport_results прибавила бы старт ещё раз.
+    """
+    athlete_ids = [row[0] for row in conn.execute(f"""
+        SELECT DISTINCT athlete_id FROM {archive.ARCHIVE_TABLE}
+        WHERE id IN (SELECT result_id FROM personal_bests) OR is_personal_best = 1
+    """).fetchall()]
+    if not athlete_ids:
+        return []
+
+    columns = ', '.join(archive.ARCHIVE_COLUMNS)
+    conn.execute(f"""
+        INSERT INTO sport_results ({columns})
+        SELECT {columns} FROM {archive.ARCHIVE_TABLE}
+        WHERE id IN (SELECT result_id FROM personal_bests)
+    """)
+    conn.execute(f"""
+        DELETE FROM {archive.ARCHIVE_TABLE}
+        WHERE id IN (SELECT result_id FROM personal_bests)
+    """)
+    conn.execute(f"UPDATE {archive.ARCHIVE_TABLE} SET is_personal_best = 0 WHERE is_personal_best = 1")
+    return athlete_ids
+
+def rebuild(conn) -> int:
+    """
+    Полный пересчёт рекордов по всем результатам, включая архив (оконная
+    функция ROW_NUMBER по паре спортсмен/дисциплина) и расстановка флагов
+    в горячей таблице.
+
+    Returns:
+        Число личных рекордов
+    """
+    conn.execute("DELETE FROM personal_bests")
+    conn.execute(_RECOMPUTE.format(source=archive.results_source(conn)))
+    restored = []
+    if archive.ARCHIVE_TABLE in archive.result_tables(conn):
+        restored = _restore_archived_bests(conn)
+
+    conn.execute("""
+        UPDATE sport_results SET is_personal_best = 0
+        WHERE is_personal_best = 1
+          AND id NOT IN (SELECT result_id FROM personal_bests)
+    """)
+    conn.execute("""
+        UPDATE sport_results SET is_personal_best = 1
+        WHERE id IN (SELECT result_id FROM personal_bests)
+          AND (is_personal_best IS NULL OR is_personal_best <> 1)
+    """)
+    athlete_stats.refresh(conn, restored)
+    return conn.execute("SELECT COUNT(*) FROM personal_bests").fetchone()[0]
+
+def repair_archive(conn):
+    """Пересчёт рекордов, если в архиве остались флаги (после прежних пересчётов)"""
+    flagged = conn.execute(
+        f"SELECT 1 FROM {archive.ARCHIVE_TABLE} WHERE is_personal_best = 1 LIMIT 1"
+    ).fetchone()
+    if flagged:
+        rebuild(conn)
@@ -0,0 +1,234 @@
+"""
+Инструментирование запросов к БД
+
+Для каждого выражения (текст запроса с нормализованными пробелами и
+списками IN) копится число вызовов, суммарное и максимальное время,
+гистограмма задержек, число строк, ошибки и места вызова в коде.
+Запросы дольше порога пишутся в ротируемый лог медленных запросов
+вместе с EXPLAIN QUERY PLAN.
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from utils.db_backend import POSTGRESQL, dialect_of
+
+QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', '1') == '1'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_LOG = Path(os.getenv('SLOW_QUERY_LOG', 'logs/slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+
+# Верхние границы корзин гистограммы, мс (последняя корзина - всё, что дольше)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Кадры этих файлов пропускаются при поиске места вызова
+_INTERNAL_FILES = ('database.py', 'query_stats.py')
+_INTERNAL_PACKAGES = (os.sep + 'pandas' + os.sep, os.sep + 'concurrent' + os.sep,
+                      'threading.py', 'contextlib.py')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_IN_LIST_RE = re.compile(r'IN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+
+# ==================== СТАТИСТИКА ВЫРАЖЕНИЙ ====================
+
+def normalize_statement(query: str) -> str:
+    """Ключ выражения: одна строка, списки IN (?, ?, ...) свёрнуты"""
+    statement = _WHITESPACE_RE.sub(' ', query).strip()
+    return _IN_LIST_RE.sub('IN (...)', statement)
+
+class StatementStats:
+    """Накопленная статистика одного выражения"""
+
+    __slots__ = ('calls', 'errors', 'total_ms', 'max_ms', 'rows', 'histogram', 'call_sites')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.call_sites = Counter()
+
+    def add(self, elapsed_ms, rows, call_site, error):
+        self.calls += 1
+        self.errors += int(error)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows or 0
+        bucket = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound),
+            len(LATENCY_BUCKETS_MS)
+        )
+        self.histogram[bucket] += 1
+        self.call_sites[call_site] += 1
+
+    def percentile_ms(self, share):
+        """Приближённый перцентиль по гистограмме (верхняя граница корзины)"""
+        threshold = share * self.calls
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if seen >= threshold:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _call_site():
+    """Первый кадр стека за пределами слоя данных: файл:строка функция"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not (filename.endswith(_INTERNAL_FILES) or any(p in filename for p in _INTERNAL_PACKAGES)):
+            return f"{Path(filename).name}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+def record(query, elapsed_ms, rows=0, call_site='unknown', error=False):
+    """Учёт одного выполнения выражения"""
+    key = normalize_statement(query)
+    with _stats_lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = StatementStats()
+        stats.add(elapsed_ms, rows, call_site, error)
+
+def top_statements(limit=10, order_by='total_ms'):
+    """Топ выражений по суммарному времени (или calls / max_ms / avg_ms)"""
+    with _stats_lock:
+        rows = [
+            {
+                'statement': statement,
+                'calls': stats.calls,
+                'errors': stats.errors,
+                'total_ms': round(stats.total_ms, 2),
+                'avg_ms': round(stats.total_ms / stats.calls, 3),
+                'p95_ms': stats.percentile_ms(0.95),
+                'max_ms': round(stats.max_ms, 2),
+                'rows': stats.rows,
+                'call_sites': ', '.join(site for site, _ in stats.call_sites.most_common(3)),
+            }
+            for statement, stats in _stats.items()
+        ]
+    rows.sort(key=lambda row: row[order_by], reverse=True)
+    return rows[:limit]
+
+def latency_histogram(statement):
+    """Гистограмма задержек выражения: [(граница корзины, мс, число вызовов)]"""
+    with _stats_lock:
+        stats = _stats.get(statement)
+        counts = list(stats.histogram) if stats else []
+    bounds = [f"≤{bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+    return list(zip(bounds, counts))
+
+def reset():
+    """Сброс накопленной статистики"""
+    with _stats_lock:
+        _stats.clear()
+
+# ==================== ЛОГ МЕДЛЕННЫХ ЗАПРОСОВ ====================
+
+_slow_logger = None
+_slow_logger_lock = threading.Lock()
+
+def _get_slow_logger():
+    """Логгер медленных запросов с ротацией файла (создаётся при первом запросе)"""
+    global _slow_logger
+    if _slow_logger is None:
+        with _slow_logger_lock:
+            if _slow_logger is None:
+                logger = logging.getLogger('olympic_reserve.slow_queries')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                SLOW_QUERY_LOG.parent.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    SLOW_QUERY_LOG,
+                    maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                    backupCount=SLOW_QUERY_LOG_BACKUPS,
+                    encoding='utf-8'
+                )
+                handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                logger.addHandler(handler)
+                _slow_logger = logger
+    return _slow_logger
+
+def _explain(conn, query, params):
+    """
+    План запроса на том же соединении (для executemany - по первой строке):
+    EXPLAIN QUERY PLAN в SQLite, EXPLAIN в PostgreSQL
+    """
+    if isinstance(params, list) and params and isinstance(params[0], (list, tuple, dict)):
+        params = params[0]
+    try:
+        if dialect_of(conn) == POSTGRESQL:
+            # Ошибка в PostgreSQL прерывает всю транзакцию - изолируем EXPLAIN
+            conn.execute("SAVEPOINT explain_slow_query")
+            try:
+                plan = conn.execute(f"EXPLAIN {query}", params or ()).fetchall()
+            except Exception:
+                conn.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+                raise
+            conn.execute("RELEASE SAVEPOINT explain_slow_query")
+            return '\n'.join(f"    {row[0]}" for row in plan)
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+        return '\n'.join(f"    {row[3]}" for row in plan)
+    except Exception as e:
+        return f"    (план недоступен: {e})"
+
+def log_slow_query(conn, query, params, elapsed_ms, rows, call_site):
+    """Запись медленного запроса и его плана в лог"""
+    _get_slow_logger().info(
+        "%.1f ms, rows=%s, %s\n  %s\n  plan:\n%s",
+        elapsed_ms, rows, call_site, normalize_statement(query), _explain(conn, query, params)
+    )
+
+# ==================== ОБЁРТКА ВЫПОЛНЕНИЯ ====================
+
+class _Tracked:
+    """Результат выполнения, который заполняет вызывающий код"""
+    __slots__ = ('rows',)
+
+    def __init__(self):
+        self.rows = 0
+
+@contextmanager
+def track_query(conn, query, params=None):
+    """
+    Замер выполнения запроса:
+
+        with track_query(conn, query, params) as tracked:
+            rows = conn.execute(query, params).fetchall()
+            tracked.rows = len(rows)
+    """
+    tracked = _Tracked()
+    if not QUERY_STATS_ENABLED:
+        yield tracked
+        return
+
+    start = time.perf_counter()
+    error = False
+    try:
+        yield tracked
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        site = _call_site()
+        record(query, elapsed_ms, tracked.rows, site, error)
+        if elapsed_ms >= SLOW_QUERY_MS and not error:
+            try:
+                log_slow_query(conn, query, params, elapsed_ms, tracked.rows, site)
+            except OSError:
+                pass  # недоступный лог не должен ломать запросы
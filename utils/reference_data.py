@@ -0,0 +1,201 @@
+"""
+Справочники видов спорта, регионов и тренеров (sports, regions, coaches)
+
+Вид спорта, регион и тренер спортсмена хранятся внешними ключами
+athletes.sport_id / region_id / coach_id. Начальные значения справочников -
+SPORTS_LIST, REGIONS и COACHES (раньше были константами app.py);
+seed() добавляет недостающие и не трогает существующие строки.
+Тренер привязан к виду спорта.
+
+Справочник один: виды спорта и регионы, которые раньше добавляла
+init_database() (LEGACY_SPORTS, LEGACY_REGIONS), сливаются с ним миграцией,
+а спортсмены, заведённые до внешних ключей, получают ссылки backfill-шагами.
+
+Функции, принимающие соединение, работают внутри транзакции вызывающего кода.
+"""
+
+from utils import archive
+from utils.db_backend import execute_batch
+
+# Вид спорта -> значок для интерфейса
+SPORTS_LIST = {
+    "Лыжные гонки": "🎿",
+    "Гребля": "🚣",
+    "Биатлон": "🎯"
+}
+
+REGIONS = [
+    "Республика Карелия",
+    "Архангельская область",
+    "Мурманская область",
+    "Ненецкий АО",
+    "Вологодская область",
+    "Тверская область",
+    "Костромская область",
+    "Кировская область",
+    "Удмуртия",
+    "Республика Татарстан"
+]
+
+COACHES = {
+    "Лыжные гонки": [
+        "Иван Петров", "Сергей Смирнов", "Дмитрий Морозов",
+        "Алексей Волков", "Николай Соколов"
+    ],
+    "Гребля": [
+        "Владимир Кузнецов", "Олег Лебедев", "Борис Орлов",
+        "Виктор Комаров", "Игорь Новиков"
+    ],
+    "Биатлон": [
+        "Анатолий Зайцев", "Павел Ивановский", "Юрий Константинов",
+        "Геннадий Лаврентьев", "Валентин Макаров"
+    ]
+}
+
+# Старые названия из init_database() -> вид спорта справочника
+# (None - аналога нет, строка удаляется, если на неё никто не ссылается)
+LEGACY_SPORTS = {
+    "Академическая гребля": "Гребля",
+    "Конькобежный спорт": None,
+}
+
+LEGACY_REGIONS = [
+    "Московская область",
+    "Санкт-Петербург",
+    "Екатеринбург",
+    "Новосибирск",
+]
+
+# Демо-спортсмены init_database(): (имя, фамилия, дата рождения, пол,
+# вид спорта, регион, тренер)
+DEMO_ATHLETES = [
+    ("Иван", "Иванов", "2005-01-15", "М", "Лыжные гонки", "Республика Карелия", "Иван Петров"),
+    ("Анна", "Петрова", "2004-03-22", "Ж", "Биатлон", "Архангельская область", "Анатолий Зайцев"),
+    ("Дмитрий", "Сидоров", "2006-07-10", "М", "Гребля", "Вологодская область", "Владимир Кузнецов"),
+]
+
+CREATE_COACHES_TABLE = """
+CREATE TABLE IF NOT EXISTS coaches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name TEXT NOT NULL,
+    sport_id INTEGER REFERENCES sports(id),
+    UNIQUE (full_name, sport_id)
+);
+"""
+
+# Фильтр по справочнику + порядок по фамилии, как у idx_athletes_status_name
+CREATE_INDEXES = [
+    """CREATE INDEX IF NOT EXISTS idx_athletes_sport_name
+       ON athletes (sport_id, last_name, first_name)""",
+    """CREATE INDEX IF NOT EXISTS idx_athletes_region_name
+       ON athletes (region_id, last_name, first_name)""",
+    """CREATE INDEX IF NOT EXISTS idx_athletes_coach
+       ON athletes (coach_id)""",
+    """CREATE INDEX IF NOT EXISTS idx_coaches_sport
+       ON coaches (sport_id, full_name)""",
+]
+
+def seed(conn):
+    """Начальные виды спорта, регионы и тренеры (существующие строки не меняются)"""
+    execute_batch(
+        conn, "INSERT INTO sports (name) VALUES (?) ON CONFLICT DO NOTHING",
+        [(name,) for name in SPORTS_LIST]
+    )
+    execute_batch(
+        conn, "INSERT INTO regions (name) VALUES (?) ON CONFLICT DO NOTHING",
+        [(name,) for name in REGIONS]
+    )
+    execute_batch(
+        conn,
+        """INSERT INTO coaches (full_name, sport_id)
+           SELECT ?, id FROM sports WHERE name = ?
+           ON CONFLICT DO NOTHING""",
+        [(coach, sport) for sport, coaches in COACHES.items() for coach in coaches]
+    )
+
+# ==================== ЕДИНЫЙ СПРАВОЧНИК ====================
+
+# Таблицы со ссылкой на вид спорта
+_SPORT_REFERENCES = ('athletes', 'users', 'coaches')
+
+def merge_legacy_catalog(conn):
+    """
+    Сливает старые виды спорта и регионы init_database() со справочником:
+    ссылки переводятся на вид спорта справочника, строки без аналога
+    удаляются, если на них никто не ссылается.
+    """
+    sport_ids = dict(conn.execute("SELECT name, id FROM sports").fetchall())
+    for legacy, name in LEGACY_SPORTS.items():
+        legacy_id = sport_ids.get(legacy)
+        if legacy_id is None:
+            continue
+        if name is not None:
+            for table in _SPORT_REFERENCES:
+                conn.execute(f"UPDATE {table} SET sport_id = ? WHERE sport_id = ?",
+                             (sport_ids[name], legacy_id))
+        referenced = any(
+            conn.execute(f"SELECT 1 FROM {table} WHERE sport_id = ? LIMIT 1", (legacy_id,)).fetchone()
+            for table in _SPORT_REFERENCES
+        )
+        if not referenced:
+            conn.execute("DELETE FROM sports WHERE id = ?", (legacy_id,))
+
+    execute_batch(
+        conn,
+        """DELETE FROM regions
+           WHERE name = ? AND NOT EXISTS (SELECT 1 FROM athletes WHERE region_id = regions.id)""",
+        [(name,) for name in LEGACY_REGIONS]
+    )
+
+def fill_references(conn, rows):
+    """
+    Заполняет пустые sport_id / region_id / coach_id спортсменов по названиям.
+
+    Args:
+        rows: (вид спорта, регион, тренер, имя, фамилия, дата рождения);
+            спортсмен ищется по ФИО и дате рождения, заполненные ссылки
+            не меняются
+    """
+    execute_batch(conn, """
+        UPDATE athletes SET
+            sport_id = COALESCE(sport_id, (SELECT id FROM sports WHERE name = ?)),
+            region_id = COALESCE(region_id, (SELECT id FROM regions WHERE name = ?)),
+            coach_id = COALESCE(coach_id, (
+                SELECT c.id FROM coaches c JOIN sports s ON s.id = c.sport_id
+                WHERE s.name = ? AND c.full_name = ?
+            ))
+        WHERE first_name = ? AND last_name = ? AND birth_date = ?
+          AND (sport_id IS NULL OR region_id IS NULL OR coach_id IS NULL)
+    """, [
+        (sport, region, sport, coach, first_name, last_name, birth_date)
+        for sport, region, coach, first_name, last_name, birth_date in rows
+    ])
+
+def demo_references():
+    """Строки fill_references() для демо-спортсменов init_database()"""
+    return [
+        (sport, region, coach, first_name, last_name, birth_date)
+        for first_name, last_name, birth_date, _, sport, region, coach in DEMO_ATHLETES
+    ]
+
+def backfill_athletes(conn):
+    """
+    Ссылки спортсменов, заведённых до внешних ключей: демо-спортсмены -
+    по DEMO_ATHLETES, остальным вид спорта - самый частый среди дисциплин
+    их результатов (disciplines.sport). Региона и тренера в старой схеме
+    не было, их взять неоткуда.
+    """
+    fill_references(conn, demo_references())
+    conn.execute(f"""
+        UPDATE athletes SET sport_id = (
+            SELECT s.id
+            FROM {archive.RESULTS_VIEW} r
+            JOIN disciplines d ON d.name = r.discipline
+            JOIN sports s ON s.name = d.sport
+            WHERE r.athlete_id = athletes.id
+            GROUP BY s.id
+            ORDER BY COUNT(*) DESC, s.id
+            LIMIT 1
+        )
+        WHERE sport_id IS NULL
+    """)
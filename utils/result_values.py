@@ -0,0 +1,190 @@
+"""
+Числовые значения результатов и справочник дисциплин
+
+sport_results.result хранит результат так, как его ввели ("5:07",
+"1:02:03.4", "12,45 м", "85 очков"). Для сортировки, индексов и агрегатов
+в SQL рядом хранится result_value (секунды, метры или очки) и result_unit.
+
+Разбор векторный (pandas.Series.str): одна регулярка на всю пачку строк,
+без цикла Python по каждому результату. Справочник disciplines задаёт
+единицу по умолчанию и направление: lower_is_better = 1 для времени.
+
+Функции, принимающие соединение, работают внутри транзакции вызывающего кода.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.db_backend import execute_batch
+
+# Канонические единицы
+UNIT_SECONDS = 's'
+UNIT_METRES = 'm'
+UNIT_POINTS = 'pt'
+UNITS = (UNIT_SECONDS, UNIT_METRES, UNIT_POINTS)
+
+# Единицы, в которых меньше - лучше
+LOWER_IS_BETTER_UNITS = (UNIT_SECONDS,)
+
+# Написания единиц во вводе -> каноническая единица
+UNIT_ALIASES = {
+    's': UNIT_SECONDS, 'sec': UNIT_SECONDS, 'с': UNIT_SECONDS, 'сек': UNIT_SECONDS,
+    'm': UNIT_METRES, 'м': UNIT_METRES, 'метр': UNIT_METRES, 'метра': UNIT_METRES,
+    'метров': UNIT_METRES,
+    'pt': UNIT_POINTS, 'pts': UNIT_POINTS, 'points': UNIT_POINTS, 'очк': UNIT_POINTS,
+    'очко': UNIT_POINTS, 'очка': UNIT_POINTS, 'очков': UNIT_POINTS,
+    'балл': UNIT_POINTS, 'балла': UNIT_POINTS, 'баллов': UNIT_POINTS,
+}
+
+# [ч:]мм:сс[.доли] | число[,доли] [единица]
+_RESULT_PATTERN = (
+    r'^\s*'
+    r'(?:(?P<hours>\d+):(?=\d+:))?'
+    r'(?:(?P<minutes>\d+):)?'
+    r'(?P<number>\d+(?:[.,]\d+)?)'
+    r'\s*(?P<unit>[^\d\s][^\d]*?)?\s*$'
+)
+
+# ==================== РАЗБОР РЕЗУЛЬТАТОВ ====================
+
+def parse_results(results, default_units=None) -> pd.DataFrame:
+    """
+    Разбор строк результатов в числа.
+
+    Args:
+        results: последовательность результатов (строки или числа)
+        default_units: единицы для результатов без единицы и без ":"
+            (скаляр или последовательность той же длины), обычно - из
+            справочника дисциплин
+
+    Returns:
+        DataFrame с колонками result_value (float, NaN - не разобран)
+        и result_unit (None - не разобран), в порядке входа
+    """
+    text = pd.Series(results, dtype=object).astype('string')
+    parts = text.str.extract(_RESULT_PATTERN)
+
+    value = pd.to_numeric(parts['number'].str.replace(',', '.', regex=False), errors='coerce')
+    minutes = pd.to_numeric(parts['minutes'], errors='coerce')
+    hours = pd.to_numeric(parts['hours'], errors='coerce')
+    value = value + minutes.fillna(0) * 60 + hours.fillna(0) * 3600
+
+    suffix = parts['unit'].str.lower().str.rstrip('.')
+    unit = suffix.map(UNIT_ALIASES)
+    # Время с ":" - всегда секунды
+    unit = unit.mask(minutes.notna(), UNIT_SECONDS)
+    if default_units is not None:
+        if not np.isscalar(default_units):
+            default_units = pd.Series(list(default_units), index=text.index, dtype=object)
+        unit = unit.where(unit.notna() | suffix.notna(), default_units)
+
+    # Неизвестная единица хуже пропуска: такие значения не сравнимы с остальными
+    value = value.where(unit.notna())
+    unit = unit.where(value.notna())
+
+    return pd.DataFrame({
+        'result_value': value.astype(float),
+        'result_unit': unit.astype(object).where(unit.notna(), None),
+    })
+
+def result_value_rows(values: pd.DataFrame):
+    """Пары (result_value, result_unit) с None вместо NaN - для записи в БД"""
+    result_value = values['result_value'].astype(object).where(values['result_value'].notna(), None)
+    return list(zip(result_value, values['result_unit']))
+
+# ==================== СПРАВОЧНИК ДИСЦИПЛИН ====================
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS disciplines (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    sport TEXT,
+    unit TEXT NOT NULL DEFAULT 's',
+    lower_is_better BOOLEAN NOT NULL DEFAULT 1
+);
+"""
+
+# (дисциплина, вид спорта, единица)
+DISCIPLINE_CATALOG = [
+    ('Спринт 1км', 'Лыжные гонки', UNIT_SECONDS),
+    ('Классический стиль 5км', 'Лыжные гонки', UNIT_SECONDS),
+    ('Свободный стиль 5км', 'Лыжные гонки', UNIT_SECONDS),
+    ('Длинная дистанция 10км', 'Лыжные гонки', UNIT_SECONDS),
+    ('Одиночка 2км', 'Гребля', UNIT_SECONDS),
+    ('Двойка 2км', 'Гребля', UNIT_SECONDS),
+    ('Четвёрка 2км', 'Гребля', UNIT_SECONDS),
+    ('Командная эстафета', 'Гребля', UNIT_SECONDS),
+    ('Спринт 7.5км', 'Биатлон', UNIT_SECONDS),
+    ('Гонка преследования', 'Биатлон', UNIT_SECONDS),
+    ('Индивидуальная 15км', 'Биатлон', UNIT_SECONDS),
+    ('Эстафета', 'Биатлон', UNIT_SECONDS),
+]
+
+_INSERT_DISCIPLINE = """
+INSERT INTO disciplines (name, sport, unit, lower_is_better)
+VALUES (?, ?, ?, ?)
+ON CONFLICT DO NOTHING
+"""
+
+def seed_catalog(conn):
+    """Справочник дисциплин + дисциплины, уже встречающиеся в результатах"""
+    execute_batch(conn, _INSERT_DISCIPLINE, [
+        (name, sport, unit, int(unit in LOWER_IS_BETTER_UNITS))
+        for name, sport, unit in DISCIPLINE_CATALOG
+    ])
+    # Неизвестные дисциплины: единица - самая частая среди разобранных результатов
+    known = {row[0] for row in conn.execute("SELECT name FROM disciplines")}
+    rows = conn.execute(
+        "SELECT DISTINCT discipline FROM sport_results WHERE discipline IS NOT NULL"
+    ).fetchall()
+    for (discipline,) in rows:
+        if discipline in known:
+            continue
+        sample = conn.execute(
+            "SELECT result FROM sport_results WHERE discipline = ? LIMIT 200", (discipline,)
+        ).fetchall()
+        units = parse_results([row[0] for row in sample])['result_unit'].dropna()
+        unit = units.mode().iloc[0] if not units.empty else UNIT_SECONDS
+        conn.execute(_INSERT_DISCIPLINE, (discipline, None, unit, int(unit in LOWER_IS_BETTER_UNITS)))
+
+def discipline_units(conn) -> dict:
+    """Дисциплина -> единица по умолчанию"""
+    return {name: unit for name, unit in conn.execute("SELECT name, unit FROM disciplines")}
+
+# ==================== ЗАПОЛНЕНИЕ СУЩЕСТВУЮЩИХ ДАННЫХ ====================
+
+BACKFILL_CHUNK_SIZE = 10000
+
+def backfill(conn, chunk_size=BACKFILL_CHUNK_SIZE) -> int:
+    """
+    Заполнение result_value / result_unit у результатов, где они пусты.
+    Читает по id пачками (keyset), каждую пачку разбирает одним вызовом
+    parse_results и пишет одним executemany.
+
+    Returns:
+        Число разобранных результатов
+    """
+    units = discipline_units(conn)
+    last_id = 0
+    parsed = 0
+    while True:
+        rows = conn.execute(
+            """SELECT id, result, discipline FROM sport_results
+               WHERE id > ? AND result_value IS NULL AND result IS NOT NULL
+               ORDER BY id LIMIT ?""",
+            (last_id, chunk_size)
+        ).fetchall()
+        if not rows:
+            return parsed
+        ids, results, disciplines = zip(*rows)
+        values = parse_results(results, [units.get(d) for d in disciplines])
+        updates = [
+            (value, unit, result_id)
+            for (value, unit), result_id in zip(result_value_rows(values), ids)
+            if value is not None
+        ]
+        execute_batch(
+            conn, "UPDATE sport_results SET result_value = ?, result_unit = ? WHERE id = ?", updates
+        )
+        parsed += len(updates)
+        last_id = ids[-1]